@@ -0,0 +1,102 @@
+"""
+Benchmark for the minimal DICOM header reader.
+Writes synthetic single-slice DICOM files (explicit VR little endian with a
+256x256 16-bit pixel block) and compares readDicomHeaders against reading
+every file in full before parsing.
+
+Usage:
+    python benchmarks/bench_dicom_header.py
+    python benchmarks/bench_dicom_header.py --files 100000 --workers 32
+"""
+
+import argparse
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.dicom_header import parseHeader, readDicomHeaders
+
+
+def element(group: int, elem: int, vr: bytes, value: bytes) -> bytes:
+    """Encode one explicit VR little endian data element."""
+    if len(value) % 2:
+        value += b"\x00" if vr == b"UI" else b" "
+    if vr in (b"OB", b"OW", b"SQ", b"UN", b"UT"):
+        return struct.pack("<HH2s2xI", group, elem, vr, len(value)) + value
+    return struct.pack("<HH2sH", group, elem, vr, len(value)) + value
+
+
+def make_dicom(subject: str, series_uid: str, instance: int, size: int = 256) -> bytes:
+    """Build a minimal DICOM file with a preamble, meta group and pixel data."""
+    syntax = element(0x0002, 0x0010, b"UI", b"1.2.840.10008.1.2.1")
+    meta = element(0x0002, 0x0000, b"UL", struct.pack("<I", len(syntax))) + syntax
+    body = b"".join([
+        element(0x0008, 0x0060, b"CS", b"MR"),
+        element(0x0010, 0x0020, b"LO", subject.encode()),
+        element(0x0020, 0x000E, b"UI", series_uid.encode()),
+        element(0x0020, 0x0013, b"IS", str(instance).encode()),
+        element(0x0020, 0x0032, b"DS", f"-120.0\\-110.5\\{instance * 1.2:.1f}".encode()),
+        element(0x0028, 0x0010, b"US", struct.pack("<H", size)),
+        element(0x0028, 0x0011, b"US", struct.pack("<H", size)),
+        element(0x7FE0, 0x0010, b"OW", bytes(size * size * 2)),
+    ])
+    return b"\x00" * 128 + b"DICM" + meta + body
+
+
+def write_files(root: Path, n_files: int):
+    """Write n_files synthetic slices, 100 per series."""
+    paths = []
+    for i in range(n_files):
+        series = i // 100
+        path = root / f"series_{series:05d}" / f"slice_{i % 100:03d}.dcm"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(make_dicom(f"{series % 1000:03d}_S_{series:04d}",
+                                    f"1.2.826.0.1.3680043.{series}", i % 100 + 1))
+        paths.append(path)
+    return paths
+
+
+def read_full(path) -> dict:
+    """Reference: read the whole file, then parse."""
+    with open(path, "rb") as f:
+        return parseHeader(f.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DICOM header reading")
+    parser.add_argument("--files", type=int, default=20000,
+                        help="Number of synthetic DICOM files")
+    parser.add_argument("--workers", type=int, default=16,
+                        help="Reader threads")
+    parser.add_argument("--dir", type=str, default=None,
+                        help="Directory for the synthetic files (temporary by default)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        paths = write_files(Path(tmp), args.files)
+        total_mb = sum(p.stat().st_size for p in paths) / 1e6
+        print(f"{len(paths)} files, {total_mb:.0f} MB")
+
+        start = time.perf_counter()
+        headers = readDicomHeaders(paths, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        errors = int(headers["error"].notna().sum())
+        print(f"{'mmap headers':<16} {elapsed:>8.3f}s {elapsed / len(paths) * 1e6:>8.1f} us/file  "
+              f"series: {headers['SeriesInstanceUID'].nunique()}, errors: {errors}")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(read_full, paths, chunksize=256))
+        elapsed = time.perf_counter() - start
+        print(f"{'full read':<16} {elapsed:>8.3f}s {elapsed / len(paths) * 1e6:>8.1f} us/file")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Scaling benchmark for the metadata × files matcher.
+Generates synthetic ADNI filenames and times StreamMatcher, the hash join
+behind movePreprocessed and move2preprocess, at growing sizes; a flat
+"us/file" column shows linear scaling.
+
+Usage:
+    python benchmarks/bench_matching.py
+    python benchmarks/bench_matching.py --max-files 1000000 --rows 3000 --nested
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.streaming import StreamMatcher
+from libs.parsing import parseFilename
+
+
+def make_files(n_files: int, divider: str = "raw_"):
+    """Build synthetic preprocessed filenames with unique image IDs."""
+    return [
+        Path(f"preprocessed_old/T1/AD/wmADNI_{i % 1000:03d}_S_{i:04d}_MR_MPRAGE_br_{divider}"
+             f"2007032911073878{i % 10}_1_S{100000 + i}_I{200000 + i}.nii")
+        for i in range(n_files)
+    ]
+
+
+def make_meta(n_rows: int, n_files: int) -> pd.DataFrame:
+    """Build a metadata frame whose rows hit every other file."""
+    step = max(1, n_files // max(1, n_rows))
+    ids = [i * step for i in range(n_rows)]
+    return pd.DataFrame({
+        "Subject": [f"{i % 1000:03d}_S_{i:04d}" for i in ids],
+        "Image Data ID": [f"I{200000 + i + (i % 2)}" for i in ids],
+    })
+
+
+def nested_match(meta_df: pd.DataFrame, files, divider: str = "raw_") -> int:
+    """Reference implementation of the old rows × files loop."""
+    keys = (meta_df["Subject"] + "-I" + meta_df["Image Data ID"].str.lstrip("I")).tolist()
+    hits = 0
+    for key in keys:
+        for f in files:
+            name = parseFilename(f, divider)
+            if name is not None and name.key == key:
+                hits += 1
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metadata/file matching")
+    parser.add_argument("--max-files", type=int, default=1_000_000,
+                        help="Largest number of files to benchmark")
+    parser.add_argument("--rows", type=int, default=3000,
+                        help="Number of metadata rows")
+    parser.add_argument("--nested", action="store_true",
+                        help="Also time the old nested loop on small inputs")
+    args = parser.parse_args()
+
+    sizes = []
+    n = 1000
+    while n <= args.max_files:
+        sizes.append(n)
+        n *= 10
+
+    print(f"{'files':>10} {'rows':>6} {'matched':>8} {'seconds':>9} {'us/file':>8}")
+    for n_files in sizes:
+        files = make_files(n_files)
+        meta_df = make_meta(args.rows, n_files)
+        start = time.perf_counter()
+        matcher = StreamMatcher(meta_df)
+        for _ in matcher.matches(files):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"{n_files:>10} {len(meta_df):>6} {len(matcher.matched):>8} "
+              f"{elapsed:>9.3f} {elapsed / n_files * 1e6:>8.2f}")
+
+    if args.nested:
+        print("\nNested loop reference (rows x files):")
+        for n_files in (100, 1000):
+            files = make_files(n_files)
+            meta_df = make_meta(min(args.rows, 300), n_files)
+            start = time.perf_counter()
+            nested_match(meta_df, files)
+            elapsed = time.perf_counter() - start
+            print(f"{n_files:>10} {len(meta_df):>6} {'':>8} {elapsed:>9.3f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Benchmark for metadata queries.
+Builds a synthetic ADNI export and times the old copy-and-mask
+filterMetadata against MetadataIndex, both built per call and reused.
+Range and membership queries have no old equivalent and are timed with
+pandas masks instead.
+
+Usage:
+    python benchmarks/bench_metadata_query.py
+    python benchmarks/bench_metadata_query.py --rows 500000 --repeat 20 --typed
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.metadata_query import MetadataIndex, between
+from libs.metadata_store import typeMetadata
+
+
+def make_export(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Build a synthetic full ADNI export with realistic cardinalities."""
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, 6000, n_rows)
+    dates = pd.Timestamp("2005-09-01") + pd.to_timedelta(days, unit="D")
+    return pd.DataFrame({
+        "Image Data ID": [f"I{100000 + i}" for i in range(n_rows)],
+        "Subject": [f"{i % 900:03d}_S_{i % 7000:04d}" for i in range(n_rows)],
+        "Group": rng.choice(["AD", "CN", "MCI", "EMCI", "LMCI", "SMC"], n_rows),
+        "Sex": rng.choice(["M", "F"], n_rows),
+        "Age": rng.normal(74, 7, n_rows).round(1),
+        "Visit": rng.choice(["bl", "sc", "m06", "m12", "m24", "m36", "m48"], n_rows),
+        "Modality": rng.choice(["MRI", "PET"], n_rows, p=[0.8, 0.2]),
+        "Description": rng.choice(["MPRAGE", "Axial T2-FLAIR", "Accelerated Sagittal MPRAGE",
+                                   "Field Mapping", "Axial DTI"], n_rows),
+        "Type": rng.choice(["Original", "Processed"], n_rows),
+        "Acq Date": dates.strftime("%m/%d/%Y"),
+        "Format": rng.choice(["DCM", "NiFTI"], n_rows),
+    })
+
+
+def old_filter(meta_df: pd.DataFrame, **filters) -> pd.DataFrame:
+    """Reference implementation of the previous filterMetadata."""
+    result = meta_df.copy()
+    for col, value in filters.items():
+        if col in result.columns:
+            result = result[result[col] == value]
+    return result
+
+
+def timed(fn, repeat: int) -> float:
+    """Best wall time of fn over repeat runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metadata queries")
+    parser.add_argument("--rows", type=int, default=500_000,
+                        help="Rows in the synthetic export")
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="Runs per query (best time is reported)")
+    parser.add_argument("--typed", action="store_true",
+                        help="Use the typed frame of metadata_store instead of object columns")
+    args = parser.parse_args()
+
+    meta_df = make_export(args.rows)
+    if args.typed:
+        meta_df = typeMetadata(meta_df)
+    print(f"{len(meta_df)} rows ({'typed' if args.typed else 'as read from CSV'})\n")
+
+    index = MetadataIndex(meta_df)
+    start = time.perf_counter()
+    for col in ("Group", "Sex", "Visit", "Modality"):
+        index.select({col: meta_df[col].iloc[0]})
+    index.select(Age=between(0, 0))
+    index.select({"Acq Date": between("2000-01-01", "2000-01-01")})
+    print(f"Index warm-up (4 discrete + 2 range columns): {(time.perf_counter() - start) * 1e3:.1f} ms\n")
+
+    equality = {"Group": "AD", "Sex": "F", "Modality": "MRI", "Visit": "bl"}
+    print(f"{'query':<34} {'old ms':>9} {'new ms':>9} {'reused ms':>10} {'rows':>8}")
+
+    old = timed(lambda: old_filter(meta_df, **equality), args.repeat)
+    new = timed(lambda: MetadataIndex(meta_df).select(equality).frame(), args.repeat)
+    reused = timed(lambda: index.select(equality).positions, args.repeat)
+    rows = len(index.select(equality))
+    assert rows == len(old_filter(meta_df, **equality))
+    print(f"{'4x equality':<34} {old:>9.2f} {new:>9.2f} {reused:>10.3f} {rows:>8}")
+
+    ages = pd.to_numeric(meta_df["Age"])
+    dates = pd.to_datetime(meta_df["Acq Date"], format="%m/%d/%Y")
+    queries = [
+        ("Visit in {bl, sc}", {"Visit": ["bl", "sc"]},
+         lambda: meta_df[meta_df["Visit"].isin(["bl", "sc"])]),
+        ("Age 70-80", {"Age": between(70, 80)},
+         lambda: meta_df[ages.between(70, 80)]),
+        ("Acq Date 2010-2012", {"Acq Date": between("2010-01-01", "2012-12-31")},
+         lambda: meta_df[dates.between("2010-01-01", "2012-12-31")]),
+        ("Group in {AD,MCI} & Age>=75 & 2010+",
+         {"Group": ["AD", "MCI"], "Age": between(75), "Acq Date": between("2010-01-01")},
+         lambda: meta_df[meta_df["Group"].isin(["AD", "MCI"]) & (ages >= 75) & (dates >= "2010-01-01")]),
+    ]
+    for name, criteria, mask_fn in queries:
+        old = timed(mask_fn, args.repeat)
+        new = timed(lambda: MetadataIndex(meta_df).select(criteria).frame(), args.repeat)
+        reused = timed(lambda: index.select(criteria).positions, args.repeat)
+        rows = len(index.select(criteria))
+        assert rows == len(mask_fn())
+        print(f"{name:<34} {old:>9.2f} {new:>9.2f} {reused:>10.3f} {rows:>8}")
+
+    print("\nold: previous filterMetadata (equality) or a pandas mask on pre-parsed columns;")
+    print("new: filterMetadata with a fresh index; reused: positions from a warm MetadataIndex")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
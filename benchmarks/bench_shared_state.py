@@ -0,0 +1,96 @@
+"""
+Contention benchmark for the SQLite state shared by a pipeline fan-out.
+Starts several processes that, like run_pipeline.py --parallel, each refresh
+their own subtree in one inventory and copy files recorded in one manifest,
+then reports lock errors and throughput. Exits non-zero on any error.
+
+Usage:
+    python benchmarks/bench_shared_state.py
+    python benchmarks/bench_shared_state.py --processes 6 --files 5000 --workers 16
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.executor import CopyExecutor
+from libs.inventory import Inventory
+from libs.manifest import CopyManifest
+
+
+def make_tree(root: Path, n_files: int, per_dir: int = 100) -> None:
+    """Write n_files small ADNI-named files spread over directories."""
+    for i in range(n_files):
+        d = root / f"{i // per_dir:04d}"
+        if i % per_dir == 0:
+            d.mkdir(parents=True)
+        (d / f"wmADNI_{i % 1000:03d}_S_{i:04d}_MR_x_br_raw_1_S{i}_I{i}.nii").write_bytes(b"x" * 512)
+
+
+def run_combination(work: str, k: int, workers: int):
+    """One fan-out process: refresh its tree, then stage every file."""
+    work = Path(work)
+    start = time.perf_counter()
+    inventory = Inventory(work / "inventory.sqlite")
+    try:
+        source = work / f"src{k}"
+        inventory.refresh(source)
+        files = inventory.glob(source, "**/*.nii", refresh=False)
+    finally:
+        inventory.close()
+    target = work / f"dst{k}"
+    with CopyExecutor(workers=workers, manifest=CopyManifest(work / "manifest.sqlite")) as executor:
+        for f in files:
+            directory = target / f.parent.name
+            executor.prepareDir(directory)
+            executor.submit(f, directory / f.name)
+        stats = executor.wait()
+    return len(files), stats.files, stats.errors[:3], len(stats.errors), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark shared manifest/inventory contention")
+    parser.add_argument("--processes", type=int, default=3,
+                        help="Concurrent combinations (run_pipeline.py --parallel)")
+    parser.add_argument("--files", type=int, default=3000,
+                        help="Files per combination")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Copy threads per combination")
+    parser.add_argument("--dir", type=str, default=None,
+                        help="Working directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    work = Path(args.dir or tempfile.mkdtemp(prefix="bench_shared_state-"))
+    for k in range(args.processes):
+        make_tree(work / f"src{k}", args.files)
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.starmap(run_combination, [(str(work), k, args.workers) for k in range(args.processes)])
+    elapsed = time.perf_counter() - start
+
+    print(f"{'proc':>4} {'listed':>7} {'copied':>7} {'errors':>7} {'seconds':>8}")
+    errors = 0
+    for k, (listed, copied, sample, n_errors, seconds) in enumerate(results):
+        errors += n_errors + (listed != args.files)
+        print(f"{k:>4} {listed:>7} {copied:>7} {n_errors:>7} {seconds:>8.2f}")
+        for src, _, message in sample:
+            print(f"     {src}: {message}")
+    manifest = CopyManifest(work / "manifest.sqlite")
+    recorded = len(manifest)
+    manifest.close()
+    print(f"\n{recorded} manifest rows for {args.processes * args.files} copies in {elapsed:.2f}s")
+
+    if args.dir is None:
+        shutil.rmtree(work)
+    return 1 if errors or recorded != args.processes * args.files else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
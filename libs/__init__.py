@@ -18,6 +18,7 @@ from .metadata import (
     createMetaCombinedString,
     exportCSV,
 )
+from .dataset import NiftiDataset
 
 __all__ = [
     "movePreprocessed",
@@ -28,4 +29,5 @@ __all__ = [
     "move2separate",
     "createMetaCombinedString",
     "exportCSV",
+    "NiftiDataset",
 ]
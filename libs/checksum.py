@@ -0,0 +1,101 @@
+"""
+Chunked blake2b hashing of files on a thread pool.
+hashlib releases the GIL while hashing large buffers, so several threads
+keep both the disks and the CPU busy.
+"""
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from .config import CHECKSUM_CHUNK_SIZE, DEFAULT_HASH_WORKERS
+
+
+def _hashMapped(path, chunk_size: int, limit: Optional[int]) -> str:
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if limit is None else min(size, limit)
+        if end == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for start in range(0, end, chunk_size):
+                    h.update(view[start:min(start + chunk_size, end)])
+            finally:
+                view.release()
+    return h.hexdigest()
+
+
+def hashFile(
+    path,
+    chunk_size: int = CHECKSUM_CHUNK_SIZE,
+    limit: Optional[int] = None,
+    use_mmap: bool = False
+) -> str:
+    """
+    Compute the blake2b checksum of a file.
+
+    The file is read into one reusable buffer, so large files do not
+    allocate a new bytes object per chunk; with use_mmap it is hashed
+    straight from a read-only memory map instead.
+
+    Args:
+        path: File path
+        chunk_size: Read size in bytes
+        limit: Only hash the first `limit` bytes (None for the whole file)
+        use_mmap: Hash from a memory map instead of read() calls
+
+    Returns:
+        Hex digest
+    """
+    if use_mmap:
+        return _hashMapped(path, chunk_size, limit)
+    h = hashlib.blake2b()
+    buf = bytearray(chunk_size if limit is None else min(chunk_size, max(limit, 1)))
+    view = memoryview(buf)
+    remaining = limit
+    with open(path, "rb", buffering=0) as f:
+        while remaining is None or remaining > 0:
+            want = len(buf) if remaining is None else min(len(buf), remaining)
+            n = f.readinto(view[:want])
+            if not n:
+                break
+            h.update(view[:n])
+            if remaining is not None:
+                remaining -= n
+    return h.hexdigest()
+
+
+def hashFiles(
+    paths: Iterable,
+    workers: int = DEFAULT_HASH_WORKERS,
+    chunk_size: int = CHECKSUM_CHUNK_SIZE,
+    limit: Optional[int] = None,
+    use_mmap: bool = False
+) -> Dict[str, Optional[str]]:
+    """
+    Hash many files in a thread pool.
+
+    Args:
+        paths: Iterable of file paths
+        workers: Number of hashing threads
+        chunk_size: Read size in bytes
+        limit: Only hash the first `limit` bytes of each file
+        use_mmap: Hash from memory maps instead of read() calls
+
+    Returns:
+        Dictionary of path string to hex digest (None if the file could not be read)
+    """
+    def one(path: str) -> Optional[str]:
+        try:
+            return hashFile(path, chunk_size, limit, use_mmap)
+        except (OSError, ValueError):
+            return None
+
+    paths = [str(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="hash") as pool:
+        return dict(zip(paths, pool.map(one, paths)))
@@ -0,0 +1,272 @@
+"""
+Block-parallel gzip compression of NIfTI files.
+Files are split into blocks that are deflated independently in a process
+pool (each primed with the previous 32 KB as dictionary) and joined into one
+standard gzip member, so the output reads with gzip, nibabel or zcat.
+Decompression runs in parallel across files.
+"""
+
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from .config import DEFAULT_COMPRESS_WORKERS, GZIP_BLOCK_SIZE, GZIP_LEVEL
+from .inventory import walkFiles
+
+# Bytes of history handed to each block as deflate dictionary
+DICT_SIZE = 32 << 10
+
+# Read size for streaming decompression
+READ_SIZE = 1 << 20
+
+
+class CompressStats(NamedTuple):
+    """Aggregate result of compressing or decompressing a set of files."""
+
+    files: int
+    bytes_in: int
+    bytes_out: int
+    elapsed: float
+    errors: List[Tuple[str, str]]
+
+    def summary(self) -> str:
+        ratio = self.bytes_in / self.bytes_out if self.bytes_out else 0.0
+        rate = self.bytes_in / self.elapsed / 1e6 if self.elapsed > 0 else 0.0
+        return (f"Processed {self.files} files: {self.bytes_in / 1e9:.2f} GB -> "
+                f"{self.bytes_out / 1e9:.2f} GB (ratio {ratio:.1f}x) in {self.elapsed:.1f}s "
+                f"({rate:.1f} MB/s), errors: {len(self.errors)}")
+
+
+def _deflateBlock(data: bytes, history: bytes, level: int, last: bool) -> bytes:
+    """Deflate one block as raw deflate, ending on a byte boundary unless last."""
+    if history:
+        c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=history)
+    else:
+        c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return c.compress(data) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _gzipHeader(mtime: float) -> bytes:
+    # ID1 ID2 CM FLG MTIME XFL OS (255 = unknown)
+    return struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, 0, int(mtime) & 0xFFFFFFFF, 0, 255)
+
+
+def _replaceAtomic(tmp: Path, dst: Path, mtime_ns: int) -> None:
+    os.utime(tmp, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp, dst)
+
+
+def compressFile(
+    src,
+    dst=None,
+    pool: Optional[Executor] = None,
+    level: int = GZIP_LEVEL,
+    block_size: int = GZIP_BLOCK_SIZE,
+    keep: bool = True,
+    in_flight: int = 8
+) -> Tuple[int, int]:
+    """
+    Gzip one file, deflating its blocks in parallel.
+
+    At most `in_flight` blocks are queued at once, so memory stays bounded
+    for large files. The output is written to a temporary file
+    and renamed, and takes over the source's mtime.
+
+    Args:
+        src: File to compress
+        dst: Output path (default: src + ".gz")
+        pool: Executor for the blocks (runs serially when None)
+        level: zlib compression level
+        block_size: Uncompressed bytes per block
+        keep: Keep the source file
+        in_flight: Blocks submitted ahead of the writer
+
+    Returns:
+        Tuple of (input bytes, output bytes)
+    """
+    src = Path(src)
+    dst = Path(dst) if dst is not None else src.with_name(src.name + ".gz")
+    st = src.stat()
+    size = st.st_size
+    tmp = dst.with_name(dst.name + ".part")
+
+    crc = 0
+    try:
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            fout.write(_gzipHeader(st.st_mtime))
+            pending = []
+            history = b""
+            offset = 0
+            while True:
+                data = fin.read(block_size)
+                offset += len(data)
+                last = offset >= size or not data
+                crc = zlib.crc32(data, crc)
+                if pool is None:
+                    pending.append(_deflateBlock(data, history, level, last))
+                else:
+                    pending.append(pool.submit(_deflateBlock, data, history, level, last))
+                history = data[-DICT_SIZE:] if data else history
+                while len(pending) >= in_flight or (last and pending):
+                    block = pending.pop(0)
+                    fout.write(block if pool is None else block.result())
+                if last:
+                    break
+            fout.write(struct.pack("<II", crc & 0xFFFFFFFF, offset & 0xFFFFFFFF))
+        _replaceAtomic(tmp, dst, st.st_mtime_ns)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    if not keep:
+        src.unlink()
+    return size, dst.stat().st_size
+
+
+def decompressFile(src, dst=None, keep: bool = True) -> Tuple[int, int]:
+    """
+    Gunzip one file with a streaming decompressor.
+
+    Args:
+        src: .gz file
+        dst: Output path (default: src without ".gz")
+        keep: Keep the compressed file
+
+    Returns:
+        Tuple of (output bytes, input bytes)
+    """
+    src = Path(src)
+    if dst is None:
+        if src.suffix != ".gz":
+            raise ValueError(f"Cannot derive an output name for {src}")
+        dst = src.with_name(src.name[:-3])
+    dst = Path(dst)
+    st = src.stat()
+    tmp = dst.with_name(dst.name + ".part")
+    written = 0
+    try:
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            while True:
+                chunk = fin.read(READ_SIZE)
+                if not chunk:
+                    break
+                # Concatenated members are valid gzip too
+                while chunk:
+                    out = d.decompress(chunk)
+                    fout.write(out)
+                    written += len(out)
+                    chunk = d.unused_data
+                    if d.eof:
+                        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    else:
+                        break
+            out = d.flush()
+            fout.write(out)
+            written += len(out)
+        _replaceAtomic(tmp, dst, st.st_mtime_ns)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    if not keep:
+        src.unlink()
+    return written, st.st_size
+
+
+def _run(jobs, fn, workers: Optional[int]) -> CompressStats:
+    start = time.perf_counter()
+    files = bytes_in = bytes_out = 0
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, outcome in fn(jobs, pool):
+            if isinstance(outcome, Exception):
+                errors.append((path, str(outcome)))
+                continue
+            files += 1
+            bytes_in += outcome[0]
+            bytes_out += outcome[1]
+    return CompressStats(files, bytes_in, bytes_out, time.perf_counter() - start, errors)
+
+
+def compressFiles(
+    paths: Iterable,
+    workers: Optional[int] = DEFAULT_COMPRESS_WORKERS,
+    level: int = GZIP_LEVEL,
+    block_size: int = GZIP_BLOCK_SIZE,
+    keep: bool = True
+) -> CompressStats:
+    """
+    Compress files to .gz one after another, each block-parallel across the pool.
+
+    The uncompressed files are kept by default: the manifest records them as
+    the copy destinations, so removing them makes --resume copy them again and
+    verify_files.py report them missing.
+
+    Args:
+        paths: Files to compress
+        workers: Worker processes (default: CPU count)
+        level: zlib compression level
+        block_size: Uncompressed bytes per block
+        keep: Keep the uncompressed files
+
+    Returns:
+        CompressStats (bytes_in is uncompressed, bytes_out compressed)
+    """
+    in_flight = (workers or os.cpu_count() or 1) * 2
+
+    def each(jobs, pool):
+        for path in jobs:
+            try:
+                yield str(path), compressFile(path, pool=pool, level=level, block_size=block_size,
+                                              keep=keep, in_flight=in_flight)
+            except (OSError, zlib.error) as e:
+                yield str(path), e
+
+    return _run(paths, each, workers)
+
+
+def _decompressOne(path: str, keep: bool):
+    try:
+        return decompressFile(path, keep=keep)
+    except (OSError, ValueError, zlib.error) as e:
+        return e
+
+
+def decompressFiles(
+    paths: Iterable,
+    workers: Optional[int] = DEFAULT_COMPRESS_WORKERS,
+    keep: bool = True
+) -> CompressStats:
+    """
+    Decompress .gz files in parallel, one file per worker process.
+
+    Args:
+        paths: .gz files
+        workers: Worker processes (default: CPU count)
+        keep: Keep the compressed files
+
+    Returns:
+        CompressStats (bytes_in is uncompressed, bytes_out compressed)
+    """
+    def each(jobs, pool):
+        jobs = [str(p) for p in jobs]
+        futures = [pool.submit(_decompressOne, path, keep) for path in jobs]
+        for path, future in zip(jobs, futures):
+            yield path, future.result()
+
+    return _run(paths, each, workers)
+
+
+def compressTrees(roots: Iterable, pattern: str = "**/*.nii", **kwargs) -> CompressStats:
+    """Compress every file matching pattern below the given roots."""
+    return compressFiles([p for root in roots for p in walkFiles(root, pattern)], **kwargs)
+
+
+def decompressTrees(roots: Iterable, pattern: str = "**/*.nii.gz", **kwargs) -> CompressStats:
+    """Decompress every file matching pattern below the given roots."""
+    return decompressFiles([p for root in roots for p in walkFiles(root, pattern)], **kwargs)
@@ -22,6 +22,8 @@ PREPROCESSED_DIR = BASE_DIR / "preprocessed"
 CONVERT_DIR = BASE_DIR / "2convert"
 CONVERTED_DIR = BASE_DIR / "Converted"
 FINAL_DIR = BASE_DIR / "final"
+VOLUME_STORE_DIR = BASE_DIR / "VolumeStore"
+NORMALIZED_DIR = BASE_DIR / "normalized"
 
 # MRI sequences and conditions
 SEQUENCES = ["T1", "T2"]
@@ -32,6 +34,7 @@ TESLA_STRENGTHS = [1.5, 3]
 DICOM_PATTERN = "**/*.dcm"
 NIFTI_PATTERN = "**/*.nii"
 NIFTI_GZ_PATTERN = "**/*.nii.gz"
+NIFTI_ANY_PATTERN = "**/*.{nii,nii.gz}"
 PREPROCESSED_PATTERN = "**/wm*.nii"
 
 # Filename delimiters
@@ -56,10 +59,70 @@ METADATA_COLUMNS = [
     "Format"
 ]
 
+# Metadata columns stored as categoricals
+CATEGORICAL_COLUMNS = ["Group", "Sex", "Visit", "Modality"]
+
+# Visit values counted as baseline by move2separate(ONLY_BASELINE=True):
+# ADNI visit codes bl/sc/scmri/init, visit number 1, or a description
+# containing "baseline"/"screening" (matched case-insensitively)
+BASELINE_VISIT_PATTERN = r"^(?:bl|sc|scmri|init|1)$|baseline|screening"
+
+# Unified typed store of all Balanced_Meta CSVs (see metadata_store.py)
+METADATA_STORE = OUTPUT_DIR / "metadata.parquet"
+STORE_CATEGORICAL_COLUMNS = ["Group", "Sex", "Visit", "Modality", "Type", "Format", "seq", "cond", "source"]
+ACQ_DATE_FORMAT = "%m/%d/%Y"
+
+# Sidecar cache written next to each metadata CSV: the typed frame as
+# Parquet and its validation info as JSON
+META_CACHE_SUFFIX = ".cache.parquet"
+META_CACHE_INFO_SUFFIX = ".cache.json"
+
+# File formats exportCSV can write, with their extensions; Parquet and
+# Feather keep dtypes (categoricals, dates) and need pyarrow
+META_EXPORT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+DEFAULT_META_FORMAT = "csv"
+
 # Default parameters
 DEFAULT_TESLA = 3
 DEFAULT_DIVIDER = "raw_"
 DEFAULT_FORMAT = "Br_"
+DEFAULT_COPY_WORKERS = 8
+DEFAULT_PARALLEL_COMBINATIONS = 3
+DEFAULT_HEADER_WORKERS = 16
+
+# Streaming scan -> parse -> match -> copy stages (see streaming.py)
+STREAM_CHUNK_SIZE = 1024
+STREAM_QUEUE_SIZE = 16
+
+# How staged files are materialized (see executor.materializeFile)
+MATERIALIZE_MODES = ["copy", "hardlink", "symlink", "reflink", "auto"]
+DEFAULT_MATERIALIZE = "copy"
+
+# SQLite inventory of the data trees (see inventory.py)
+INVENTORY_DB = OUTPUT_DIR / "inventory.sqlite"
+
+# SQLite manifest of completed copies (see manifest.py)
+MANIFEST_DB = OUTPUT_DIR / "manifest.sqlite"
+
+# Content hashing (see checksum.py and dedup.py)
+CHECKSUM_CHUNK_SIZE = 4 << 20
+DEFAULT_HASH_WORKERS = 8
+DEDUP_MODES = ["hardlink", "manifest"]
+
+# Block-parallel gzip of NIfTI files (see compression.py);
+# None workers means one process per CPU
+GZIP_BLOCK_SIZE = 1 << 20
+GZIP_LEVEL = 6
+DEFAULT_COMPRESS_WORKERS = None
+
+# Intensity normalization and downsampling (see intensity.py); volumes are
+# processed in slabs of this many z-slices, None workers means one per CPU
+NORMALIZE_METHODS = ["zscore", "minmax", "none"]
+NORMALIZE_CHUNK_SLICES = 16
+DEFAULT_NORMALIZE_WORKERS = None
+
+# Throughput assumed by dry-run plans before any copy has been measured
+DEFAULT_THROUGHPUT_MBPS = 150
 
 # Logging
 LOG_DIR = OUTPUT_DIR / "logs"
@@ -0,0 +1,145 @@
+"""
+Lazy NIfTI dataset over final/.
+Indexes final/{seq}/{cond} by metadata row from the volume headers alone and
+hands out memory-mapped voxel data, so crops and slices only read the bytes
+they touch. A thread-pool iterator keeps the next batches loaded.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .config import CONDITIONS, DEFAULT_HEADER_WORKERS, FINAL_DIR, SEQUENCES, TEMP_META_DIR
+from .nifti import loadVolume, scaleVoxels
+from .volume_store import finalVolumes
+
+
+class NiftiDataset:
+    """
+    Volumes of final/ with their labels, in metadata row order.
+
+    dataset[i] returns (volume, label) where volume is a read-only memmap of
+    the raw stored voxel data starting at the header's vox_offset (indexed
+    [x, y, z]) and label is the position of the volume's Group in `classes`.
+    Nothing is read from disk until the memmap is sliced or converted.
+    read() and batches() apply scl_slope/scl_inter, so they return the same
+    values as VolumeStore and the intensity stage. .nii.gz volumes cannot be
+    mapped and are decompressed on access.
+    """
+
+    def __init__(
+        self,
+        root=FINAL_DIR,
+        seqs: List[str] = SEQUENCES,
+        conds: List[str] = CONDITIONS,
+        meta_dir=TEMP_META_DIR,
+        classes: Optional[List[str]] = None,
+        workers: int = DEFAULT_HEADER_WORKERS
+    ):
+        """
+        Args:
+            root: Stage directory holding {seq}/{cond}/ volumes
+            seqs: Sequences to include
+            conds: Conditions to include
+            meta_dir: Directory of the Balanced_Meta CSVs
+            classes: Label names in class-index order (default: the sorted
+                labels present, e.g. ADNI Groups such as EMCI/LMCI/SMC)
+            workers: Header reading threads while indexing
+        """
+        volumes = finalVolumes(root, seqs, conds, meta_dir, workers)
+        if len(volumes):
+            volumes = volumes[volumes["error"].isna()]
+            volumes = volumes.sort_values(["seq", "cond", "row", "path"], na_position="last")
+        self.index = volumes.reset_index(drop=True)
+        present = self.index["label"].astype(str) if len(self.index) else []
+        self.classes = list(classes) if classes else sorted(set(present))
+        labels = pd.Categorical(self.index.get("label", pd.Series(dtype=object)), categories=self.classes)
+        if len(self.index) and (labels.codes < 0).any():
+            unknown = sorted(set(self.index["label"][labels.codes < 0]))
+            raise ValueError(f"Labels {unknown} are not in classes {self.classes}")
+        self.labels = labels.codes.astype(np.int64)
+        self._headers = self.index.to_dict("records")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, int]:
+        return self.volume(i), int(self.labels[i])
+
+    def volume(self, i: int) -> np.ndarray:
+        """Lazy raw voxel data of volume i, without scl_slope/scl_inter applied."""
+        header = self._headers[i]
+        return loadVolume(header["path"], header)
+
+    def read(self, i: int, crop: Optional[tuple] = None, dtype=np.float32) -> np.ndarray:
+        """
+        Load volume i (or only crop of it) into memory, with header scaling applied.
+
+        Args:
+            i: Volume position
+            crop: Index applied before reading, e.g. np.s_[:, :, 40:60]
+            dtype: Output dtype
+
+        Returns:
+            In-memory array
+        """
+        data = self.volume(i)
+        if crop is not None:
+            data = data[crop]
+        header = self._headers[i]
+        return scaleVoxels(data, header["scl_slope"], header["scl_inter"], np.dtype(dtype).type)
+
+    def batches(
+        self,
+        batch_size: int,
+        shuffle: bool = False,
+        crop: Optional[tuple] = None,
+        workers: int = 4,
+        prefetch: int = 2,
+        drop_last: bool = False,
+        seed: Optional[int] = None,
+        dtype=np.float32
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Iterate over (volumes, labels) batches loaded ahead on a thread pool.
+
+        Up to `prefetch` batches beyond the one being consumed are read in
+        the background, so training does not wait on disk as long as reading
+        keeps up.
+
+        Args:
+            batch_size: Volumes per batch
+            shuffle: Visit volumes in random order
+            crop: Index applied to every volume before reading
+            workers: Reading threads
+            prefetch: Batches loaded ahead
+            drop_last: Skip a final batch smaller than batch_size
+            seed: Seed for shuffling
+            dtype: Output dtype
+
+        Yields:
+            Tuple of (array of shape (batch, ...), int64 labels)
+        """
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        stop = len(order) - len(order) % batch_size if drop_last else len(order)
+        groups = [order[start:min(start + batch_size, stop)] for start in range(0, stop, batch_size)]
+
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="dataset") as pool:
+            pending = deque()
+            groups = iter(groups)
+
+            def submitNext() -> None:
+                group = next(groups, None)
+                if group is not None:
+                    pending.append((group, [pool.submit(self.read, int(i), crop, dtype) for i in group]))
+
+            for _ in range(max(1, prefetch) + 1):
+                submitNext()
+            while pending:
+                group, futures = pending.popleft()
+                submitNext()
+                yield np.stack([f.result() for f in futures]), self.labels[group]
@@ -0,0 +1,248 @@
+"""
+Content-hash deduplication of staged files.
+ADNI downloads contain the same scan in several folders, so preprocessed/
+and final/ end up holding byte-identical copies. Files are grouped by size,
+then by a hash of their first block and finally by a full blake2b hash; each
+set of identical files is reduced to one stored copy, referenced either by
+hardlinks or by manifest entries.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+import pandas as pd
+
+from .checksum import hashFiles
+from .config import DEDUP_MODES, DEFAULT_HASH_WORKERS
+from .executor import materializeFile
+from .inventory import walkFiles
+from .manifest import CopyManifest
+
+# Bytes hashed per file before committing to a full hash
+PREFIX_BYTES = 64 << 10
+
+REPORT_COLUMNS = ["seq", "cond", "duplicates", "bytes_saved"]
+
+
+class DuplicateGroup(NamedTuple):
+    """Byte-identical files; the first path is kept as the canonical copy."""
+
+    checksum: str
+    size: int
+    paths: List[str]
+
+
+class DedupResult(NamedTuple):
+    """Outcome of a dedup run."""
+
+    groups: List[DuplicateGroup]
+    replaced: List[Tuple[str, str]]
+    skipped: List[Tuple[str, str]]
+    report: pd.DataFrame
+
+
+def _statFiles(paths: Iterable) -> pd.DataFrame:
+    rows = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        rows.append((str(path), st.st_size, st.st_dev, st.st_ino))
+    return pd.DataFrame(rows, columns=["path", "size", "dev", "ino"])
+
+
+def findDuplicates(paths: Iterable, workers: int = DEFAULT_HASH_WORKERS) -> List[DuplicateGroup]:
+    """
+    Find sets of byte-identical files.
+
+    Only files sharing a size are read at all, and only those whose first
+    PREFIX_BYTES also match are hashed in full. Paths that are already
+    hardlinks of each other count as one file.
+
+    Args:
+        paths: Iterable of file paths
+        workers: Number of hashing threads
+
+    Returns:
+        List of DuplicateGroup, each with at least two distinct files, sorted
+        by size descending
+    """
+    files = _statFiles(paths)
+    files = files[files["size"] > 0].drop_duplicates(["dev", "ino"])
+    files = files[files.duplicated("size", keep=False)]
+    if files.empty:
+        return []
+
+    prefix = hashFiles(files["path"], workers, limit=PREFIX_BYTES)
+    files = files.assign(prefix=files["path"].map(prefix)).dropna(subset=["prefix"])
+    files = files[files.duplicated(["size", "prefix"], keep=False)]
+
+    # Files no longer than the prefix are already fully hashed
+    small = files["size"] <= PREFIX_BYTES
+    full = hashFiles(files.loc[~small, "path"], workers)
+    files = files.assign(checksum=files["prefix"].where(small, files["path"].map(full)))
+    files = files.dropna(subset=["checksum"])
+
+    groups = []
+    for (size, checksum), group in files.groupby(["size", "checksum"], sort=False):
+        if len(group) > 1:
+            groups.append(DuplicateGroup(checksum, int(size), sorted(group["path"])))
+    groups.sort(key=lambda g: (-g.size, g.paths[0]))
+    return groups
+
+
+def _linkOver(canonical: str, path: str) -> None:
+    """Atomically replace path with a hardlink to canonical."""
+    tmp = path + ".dedup"
+    os.link(canonical, tmp)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        os.unlink(tmp)
+        raise
+
+
+def dedupeGroups(
+    groups: List[DuplicateGroup],
+    mode: str = "hardlink",
+    manifest: Optional[CopyManifest] = None,
+    dry_run: bool = False
+) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Keep one stored copy per duplicate group.
+
+    In hardlink mode every duplicate is replaced by a hardlink to the group's
+    canonical file; duplicates on another filesystem are skipped. In manifest
+    mode duplicates are deleted and recorded in the manifest so that
+    restoreDuplicates() can bring them back; a resumed copy step counts a
+    removed duplicate as up to date while its canonical file is, instead of
+    copying it again.
+
+    Args:
+        groups: Groups from findDuplicates
+        mode: One of config.DEDUP_MODES
+        manifest: CopyManifest (required for manifest mode)
+        dry_run: Only report what would be done
+
+    Returns:
+        Tuple of ((duplicate, canonical) pairs replaced, (duplicate, reason) pairs skipped)
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {mode}")
+    if mode == "manifest" and manifest is None:
+        raise ValueError("manifest mode needs a CopyManifest")
+
+    replaced = []
+    skipped = []
+    for group in groups:
+        canonical = group.paths[0]
+        canonical_dev = os.stat(canonical).st_dev
+        for path in group.paths[1:]:
+            try:
+                if mode == "hardlink" and os.stat(path).st_dev != canonical_dev:
+                    skipped.append((path, "different filesystem"))
+                    continue
+                if not dry_run:
+                    if mode == "hardlink":
+                        _linkOver(canonical, path)
+                    else:
+                        manifest.recordDuplicate(path, canonical, group.size, group.checksum)
+                        os.unlink(path)
+            except OSError as e:
+                skipped.append((path, str(e)))
+                continue
+            replaced.append((path, canonical))
+    if manifest is not None and not dry_run:
+        manifest.flush()
+    return replaced, skipped
+
+
+def restoreDuplicates(manifest: CopyManifest, materialize: str = "copy") -> int:
+    """
+    Recreate the duplicates removed in manifest mode from their canonical files.
+
+    Args:
+        manifest: CopyManifest holding the duplicate entries
+        materialize: How to recreate each file (see executor.materializeFile)
+
+    Returns:
+        Number of files restored
+    """
+    restored = 0
+    for path, canonical in manifest.duplicates():
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        materializeFile(canonical, path, materialize)
+        manifest.forgetDuplicate(path)
+        restored += 1
+    manifest.flush()
+    return restored
+
+
+def savingsReport(replaced: List[Tuple[str, str]], roots: Iterable) -> pd.DataFrame:
+    """
+    Bytes saved per sequence/condition.
+
+    Duplicates are attributed by their path below a root, {root}/{seq}/{cond}/...
+
+    Args:
+        replaced: (duplicate, canonical) pairs from dedupeGroups
+        roots: Root directories that were scanned
+
+    Returns:
+        DataFrame with seq, cond, duplicates and bytes_saved columns
+    """
+    roots = [os.path.abspath(r) for r in roots]
+    rows = []
+    for path, canonical in replaced:
+        abspath = os.path.abspath(path)
+        seq, cond = "?", "?"
+        for root in roots:
+            if abspath.startswith(root.rstrip(os.sep) + os.sep):
+                rel = Path(os.path.relpath(abspath, root)).parts
+                if len(rel) > 2:
+                    seq, cond = rel[0], rel[1]
+                break
+        try:
+            size = os.stat(canonical).st_size
+        except OSError:
+            size = 0
+        rows.append((seq, cond, size))
+    if not rows:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    df = pd.DataFrame(rows, columns=["seq", "cond", "size"])
+    report = df.groupby(["seq", "cond"], sort=True).agg(
+        duplicates=("size", "size"),
+        bytes_saved=("size", "sum"),
+    ).reset_index()
+    return report[REPORT_COLUMNS]
+
+
+def dedupTrees(
+    roots: Iterable,
+    mode: str = "hardlink",
+    manifest: Optional[CopyManifest] = None,
+    pattern: str = "**/*",
+    workers: int = DEFAULT_HASH_WORKERS,
+    dry_run: bool = False
+) -> DedupResult:
+    """
+    Deduplicate every file under one or more staged trees.
+
+    Args:
+        roots: Directories such as ./preprocessed and ./final
+        mode: One of config.DEDUP_MODES
+        manifest: CopyManifest (required for manifest mode)
+        pattern: Glob pattern of files to consider
+        workers: Number of hashing threads
+        dry_run: Only report what would be done
+
+    Returns:
+        DedupResult with the duplicate groups, replaced and skipped files and
+        the per seq/cond savings report
+    """
+    roots = [str(r) for r in roots]
+    paths = (path for root in roots for path in walkFiles(root, pattern))
+    groups = findDuplicates(paths, workers)
+    replaced, skipped = dedupeGroups(groups, mode, manifest, dry_run)
+    return DedupResult(groups, replaced, skipped, savingsReport(replaced, roots))
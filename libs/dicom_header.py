@@ -0,0 +1,216 @@
+"""
+Minimal DICOM header reader.
+Reads the handful of tags the pipeline needs (PatientID, SeriesInstanceUID,
+InstanceNumber, ImagePositionPatient, Rows, Columns) by memory-mapping the
+file and walking the data elements until the last wanted tag. Pixel data is
+never touched, so only the first pages of each file are read from disk.
+"""
+
+import mmap
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+
+from .config import DEFAULT_HEADER_WORKERS
+
+# Wanted tags: (group, element) -> (name, VR used for implicit VR files)
+HEADER_TAGS = {
+    (0x0010, 0x0020): ("PatientID", "LO"),
+    (0x0020, 0x000E): ("SeriesInstanceUID", "UI"),
+    (0x0020, 0x0013): ("InstanceNumber", "IS"),
+    (0x0020, 0x0032): ("ImagePositionPatient", "DS"),
+    (0x0028, 0x0010): ("Rows", "US"),
+    (0x0028, 0x0011): ("Columns", "US"),
+}
+HEADER_FIELDS = [name for name, _ in HEADER_TAGS.values()]
+HEADER_COLUMNS = ["path"] + HEADER_FIELDS + ["error"]
+
+LAST_TAG = max(HEADER_TAGS)
+PIXEL_DATA = (0x7FE0, 0x0010)
+TRANSFER_SYNTAX = (0x0002, 0x0010)
+
+IMPLICIT_LITTLE = "1.2.840.10008.1.2"
+EXPLICIT_BIG = "1.2.840.10008.1.2.2"
+DEFLATED = "1.2.840.10008.1.2.1.99"
+
+# Explicit VRs with a 2-byte reserved field and a 4-byte length
+LONG_VRS = {b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"SV", b"UC", b"UN", b"UR", b"UT", b"UV"}
+
+ITEM = (0xFFFE, 0xE000)
+ITEM_END = (0xFFFE, 0xE00D)
+SEQUENCE_END = (0xFFFE, 0xE0DD)
+UNDEFINED = 0xFFFFFFFF
+
+# Files are read in batches so a million paths do not become a million futures
+BATCH_SIZE = 1024
+
+
+def _decodeValue(raw: bytes, vr: str, endian: str):
+    """Decode one value; numbers that do not parse ("1.0 ", "n/a") stay raw text."""
+    if vr == "US":
+        return struct.unpack(endian + "H", raw[:2])[0] if len(raw) >= 2 else None
+    text = raw.decode("ascii", errors="replace").strip("\x00 ")
+    if not text:
+        return None
+    try:
+        if vr == "IS":
+            # Writers emit "+1", " 1" or "1.0" for integer strings
+            return int(float(text.split("\\")[0]))
+        if vr == "DS":
+            return tuple(float(v) for v in text.split("\\"))
+    except (ValueError, OverflowError):
+        return text
+    return text
+
+
+class _Reader:
+    """Cursor over the data elements of a mapped DICOM buffer."""
+
+    def __init__(self, buf, pos: int, explicit: bool, endian: str):
+        self.buf = buf
+        self.pos = pos
+        self.explicit = explicit
+        self.endian = endian
+
+    def element(self) -> Tuple[Tuple[int, int], Optional[bytes], int]:
+        """Read one element header; returns (tag, explicit VR or None, length)."""
+        buf, pos, e = self.buf, self.pos, self.endian
+        if pos + 8 > len(buf):
+            raise ValueError("truncated DICOM header")
+        tag = struct.unpack_from(e + "HH", buf, pos)
+        if tag[0] == 0xFFFE:
+            # Item and delimiter tags never carry a VR
+            self.pos = pos + 8
+            return tag, None, struct.unpack_from(e + "I", buf, pos + 4)[0]
+        if self.explicit:
+            vr = bytes(buf[pos + 4:pos + 6])
+            if vr in LONG_VRS:
+                if pos + 12 > len(buf):
+                    raise ValueError("truncated DICOM header")
+                self.pos = pos + 12
+                return tag, vr, struct.unpack_from(e + "I", buf, pos + 8)[0]
+            self.pos = pos + 8
+            return tag, vr, struct.unpack_from(e + "H", buf, pos + 6)[0]
+        self.pos = pos + 8
+        return tag, None, struct.unpack_from(e + "I", buf, pos + 4)[0]
+
+    def skipUndefined(self) -> None:
+        """Skip an undefined-length sequence up to its delimiter, including nested items."""
+        while True:
+            tag, vr, length = self.element()
+            if tag == SEQUENCE_END or tag == ITEM_END:
+                return
+            if length == UNDEFINED:
+                self.skipUndefined()
+            else:
+                self.pos += length
+
+
+def parseHeader(buf) -> Dict:
+    """
+    Parse the wanted tags from a DICOM file's bytes.
+
+    Files with the 128-byte preamble and "DICM" prefix are read according to
+    the transfer syntax in their meta group; files without a preamble are read
+    as implicit VR little endian. Parsing stops at the first tag past the last
+    wanted one, and always before PixelData.
+
+    Args:
+        buf: Bytes-like object (e.g. an mmap) holding the file
+
+    Returns:
+        Dict with one entry per HEADER_FIELDS name (None when absent)
+
+    Raises:
+        ValueError: If the data is not a readable DICOM header
+    """
+    header = dict.fromkeys(HEADER_FIELDS)
+    if len(buf) >= 132 and buf[128:132] == b"DICM":
+        reader = _Reader(buf, 132, explicit=True, endian="<")
+        syntax = None
+        # File meta group (0002) is always explicit VR little endian
+        while reader.pos + 8 <= len(buf) and struct.unpack_from("<H", buf, reader.pos)[0] == 0x0002:
+            tag, vr, length = reader.element()
+            if tag == TRANSFER_SYNTAX:
+                syntax = _decodeValue(bytes(buf[reader.pos:reader.pos + length]), "UI", "<")
+            reader.pos += length
+        if syntax == DEFLATED:
+            raise ValueError("deflated transfer syntax is not supported")
+        reader.explicit = syntax != IMPLICIT_LITTLE
+        reader.endian = ">" if syntax == EXPLICIT_BIG else "<"
+    else:
+        reader = _Reader(buf, 0, explicit=False, endian="<")
+        if len(buf) < 8 or struct.unpack_from("<H", buf, 0)[0] not in (0x0008, 0x0010):
+            raise ValueError("not a DICOM file")
+
+    while reader.pos < len(buf):
+        tag, vr, length = reader.element()
+        if tag > LAST_TAG or tag >= PIXEL_DATA:
+            break
+        if length == UNDEFINED:
+            reader.skipUndefined()
+            continue
+        wanted = HEADER_TAGS.get(tag)
+        if wanted is not None:
+            name, default_vr = wanted
+            if reader.pos + length > len(buf):
+                raise ValueError("truncated DICOM header")
+            raw = bytes(buf[reader.pos:reader.pos + length])
+            header[name] = _decodeValue(raw, vr.decode("ascii") if vr else default_vr, reader.endian)
+        reader.pos += length
+    return header
+
+
+def _readHeader(path) -> Tuple[Optional[Dict], Optional[str]]:
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return parseHeader(buf), None
+    except (OSError, ValueError, struct.error) as e:
+        return None, str(e) or type(e).__name__
+
+
+def readDicomHeader(path) -> Optional[Dict]:
+    """
+    Read the wanted tags of one DICOM file.
+
+    Args:
+        path: DICOM file path
+
+    Returns:
+        Dict keyed by HEADER_FIELDS, or None if the file is not readable DICOM
+    """
+    return _readHeader(path)[0]
+
+
+def _readBatch(paths: List[str]) -> List[Dict]:
+    rows = []
+    for path in paths:
+        header, error = _readHeader(path)
+        row = {"path": path}
+        row.update(header or dict.fromkeys(HEADER_FIELDS))
+        row["error"] = error
+        rows.append(row)
+    return rows
+
+
+def readDicomHeaders(files: Iterable, workers: int = DEFAULT_HEADER_WORKERS) -> pd.DataFrame:
+    """
+    Read the wanted tags of many DICOM files in a thread pool.
+
+    Args:
+        files: Iterable of DICOM file paths
+        workers: Number of reader threads
+
+    Returns:
+        DataFrame with a path column, one column per HEADER_FIELDS name and an
+        error column (None for files that were read), in input order
+    """
+    paths = [str(f) for f in files]
+    batches = [paths[i:i + BATCH_SIZE] for i in range(0, len(paths), BATCH_SIZE)]
+    rows = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="dicom") as pool:
+        for batch_rows in pool.map(_readBatch, batches):
+            rows.extend(batch_rows)
+    return pd.DataFrame(rows, columns=HEADER_COLUMNS)
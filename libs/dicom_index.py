@@ -0,0 +1,169 @@
+"""
+Series-aware DICOM indexing for move2convert.
+Groups .dcm files into series by ADNI image ID (taken from the filename or
+the ADNI download layout ADNI/{subject}/{description}/{date}/I{image}/) and
+joins the series to metadata rows with a hash lookup. Files without an image
+ID are grouped by SeriesInstanceUID from their headers, read in bulk.
+"""
+
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+import pandas as pd
+
+from .config import DEFAULT_HEADER_WORKERS
+from .dicom_header import readDicomHeaders
+from .metadata import createMetaCombinedString
+from .parsing import parseFilenames
+
+SERIES_COLUMNS = ["key", "subject", "series", "image", "files"]
+
+# Path components of the ADNI download layout
+SUBJECT_DIR_PATTERN = r"(?:^|[/\\])(?P<subject>\d{3}_S_\d{4})[/\\]"
+IMAGE_DIR_PATTERN = r"[/\\]I(?P<image>\d+)[/\\][^/\\]+$"
+
+# Key prefix of series grouped by SeriesInstanceUID (they have no image ID)
+UID_KEY_PREFIX = "uid:"
+
+
+class SeriesMatch(NamedTuple):
+    """Outcome of joining DICOM series against metadata rows."""
+
+    staged: pd.DataFrame
+    unmatched_series: pd.DataFrame
+    unmatched_rows: List[int]
+    unresolved: List[str]
+
+
+def indexDicomSeries(
+    files: Iterable,
+    read_headers: bool = True,
+    workers: int = DEFAULT_HEADER_WORKERS
+) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Group DICOM files into series.
+
+    Subject, series and image IDs come from the ADNI filename when it parses,
+    otherwise from the directory layout. With read_headers, the headers of
+    files with no image ID in either are read on a thread pool and the files
+    are grouped by SeriesInstanceUID (key "uid:{uid}", image None, subject
+    from the path or PatientID); matchDicomSeries can then tie such a series
+    to a metadata row through its subject. Files left without a key are
+    returned as unresolved.
+
+    Args:
+        files: Iterable of .dcm paths
+        read_headers: Read headers of files without an image ID
+        workers: Header reading threads
+
+    Returns:
+        Tuple of (series DataFrame with key/subject/series/image/files columns,
+        list of unresolved paths)
+    """
+    paths = pd.Series(list(dict.fromkeys(str(f) for f in files)), dtype=object)
+    if paths.empty:
+        return pd.DataFrame(columns=SERIES_COLUMNS), []
+
+    parsed, _ = parseFilenames(paths, "")
+    parsed = parsed.set_index("path")
+    ids = pd.DataFrame({"path": paths})
+    ids["subject"] = paths.map(parsed["subject"])
+    ids["series"] = paths.map(parsed["series"])
+    ids["image"] = paths.map(parsed["image"])
+
+    ids["subject"] = ids["subject"].fillna(paths.str.extract(SUBJECT_DIR_PATTERN)["subject"])
+    ids["image"] = ids["image"].fillna(paths.str.extract(IMAGE_DIR_PATTERN)["image"])
+
+    found = ids["image"].notna() & ids["subject"].notna()
+    resolved = ids[found].copy()
+    resolved["key"] = resolved["subject"] + "-I" + resolved["image"]
+    unresolved = ids[~found]
+
+    if read_headers and len(unresolved):
+        headers = readDicomHeaders(unresolved["path"], workers).set_index(unresolved.index)
+        uids = headers["SeriesInstanceUID"].mask(headers["SeriesInstanceUID"] == "")
+        patients = headers["PatientID"].astype("string").str.strip()
+        extra = unresolved[uids.notna()].copy()
+        extra["subject"] = extra["subject"].fillna(patients[uids.notna()])
+        extra["series"] = None
+        extra["image"] = None
+        extra["key"] = UID_KEY_PREFIX + uids[uids.notna()].astype(str)
+        resolved = pd.concat([resolved, extra], ignore_index=True)
+        unresolved = unresolved[uids.isna()]
+
+    series = resolved.groupby("key", sort=True).agg(
+        subject=("subject", "first"),
+        series=("series", "first"),
+        image=("image", "first"),
+        files=("path", list),
+    ).reset_index()
+    return series[SERIES_COLUMNS], unresolved["path"].tolist()
+
+
+def _subjectRows(meta_keys: List[str], matched_keys: set) -> dict:
+    """Unmatched metadata keys per subject, each with its first row position."""
+    rows = {}
+    for pos, key in enumerate(meta_keys):
+        if key not in matched_keys:
+            rows.setdefault(key.rsplit("-I", 1)[0], {}).setdefault(key, pos)
+    return rows
+
+
+def matchDicomSeries(meta_df: pd.DataFrame, series: pd.DataFrame, unresolved: List[str] = None) -> SeriesMatch:
+    """
+    Join DICOM series to metadata rows on "subject-Iimage".
+
+    A series grouped by SeriesInstanceUID has no image ID; it is matched only
+    when it is the sole such series of its subject and the subject has
+    exactly one metadata image left unmatched. It then takes that image ID
+    and key. Any other UID series stays unmatched.
+
+    Args:
+        meta_df: Metadata DataFrame
+        series: Series DataFrame from indexDicomSeries
+        unresolved: Unresolved paths to carry into the result
+
+    Returns:
+        SeriesMatch with one staged row per matched series (with the first
+        matching metadata row), the unmatched series, the metadata row
+        positions without a series and the unresolved paths
+    """
+    meta_keys = createMetaCombinedString(meta_df)
+    meta_rows = {}
+    for pos, key in enumerate(meta_keys):
+        meta_rows.setdefault(key, pos)
+
+    series = series.copy()
+    rows = series["key"].map(meta_rows)
+
+    by_uid = series["key"].str.startswith(UID_KEY_PREFIX) & series["subject"].notna()
+    if by_uid.any():
+        candidates = _subjectRows(meta_keys, set(series.loc[rows.notna(), "key"]))
+        sole = ~series.loc[by_uid, "subject"].duplicated(keep=False)
+        for i in sole[sole].index:
+            keys = candidates.get(series.at[i, "subject"], {})
+            if len(keys) == 1:
+                (key, pos), = keys.items()
+                series.at[i, "key"] = key
+                series.at[i, "image"] = key.rsplit("-I", 1)[1]
+                rows.at[i] = pos
+
+    staged = series[rows.notna()].copy()
+    staged["row"] = rows[rows.notna()].astype(int)
+
+    matched_keys = set(staged["key"])
+    unmatched_rows = [pos for pos, key in enumerate(meta_keys) if key not in matched_keys]
+
+    return SeriesMatch(staged, series[rows.isna()], unmatched_rows, list(unresolved or []))
+
+
+def seriesDirName(subject: str, series: Optional[str], image: str) -> str:
+    """
+    Name of a series' staging directory: "{subject}-{series}_{image}".
+
+    Series and image IDs carry their ADNI letter prefix, as "Image Data ID"
+    does in the metadata: "002_S_0001-S12345_I67890". When the series ID is
+    unknown the image ID stands in for it, which gives the
+    "{Subject}-{Image Data ID}_{Image Data ID}" layout move2convert used
+    before series indexing.
+    """
+    series_label = f"S{series}" if isinstance(series, str) and series else f"I{image}"
+    return f"{subject}-{series_label}_I{image}"
@@ -0,0 +1,320 @@
+"""
+Shared copy executor for the move* functions.
+Runs file copies on a thread pool behind a bounded queue and captures
+per-file errors instead of aborting the whole run. Files can be staged as
+full copies, hardlinks, symlinks or reflinks (copy-on-write clones).
+"""
+
+import argparse
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .config import DEFAULT_COPY_WORKERS, DEFAULT_MATERIALIZE, MANIFEST_DB, MATERIALIZE_MODES
+from .checksum import hashFile
+from .manifest import CopyManifest
+
+# ioctl request number for FICLONE (Btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+
+class CopyStats(NamedTuple):
+    """Aggregate result of a batch of copies."""
+
+    files: int
+    bytes: int
+    elapsed: float
+    errors: List[Tuple[str, str, str]]
+    modes: Dict[str, int]
+    skipped: int = 0
+
+    def summary(self) -> str:
+        rate = self.bytes / self.elapsed / 1e6 if self.elapsed > 0 else 0.0
+        text = (f"Copied {self.files} files ({self.bytes / 1e9:.2f} GB) in {self.elapsed:.1f}s "
+                f"({rate:.1f} MB/s), errors: {len(self.errors)}")
+        if self.skipped:
+            text += f", skipped up to date: {self.skipped}"
+        if set(self.modes) - {"copy"}:
+            text += " [" + ", ".join(f"{mode}: {n}" for mode, n in sorted(self.modes.items())) + "]"
+        return text
+
+
+def _removeExisting(dst: Path) -> None:
+    if dst.is_symlink() or dst.exists():
+        dst.unlink()
+
+
+def _sameFilesystem(src: Path, dst: Path) -> bool:
+    try:
+        return os.stat(src).st_dev == os.stat(dst.parent).st_dev
+    except OSError:
+        return False
+
+
+def _copyAtomic(src: Path, dst: Path) -> None:
+    """Copy through a temporary file so dst never holds a partial copy."""
+    tmp = dst.with_name(dst.name + ".part")
+    try:
+        shutil.copy(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    if fcntl is None:
+        raise OSError("reflink is not supported on this platform")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            dst.unlink()
+            raise
+
+
+def materializeFile(src, dst, mode: str = DEFAULT_MATERIALIZE) -> str:
+    """
+    Stage src at dst without copying bytes where the filesystem allows it.
+    
+    hardlink and reflink need src and dst on the same filesystem and fall back
+    to a byte copy otherwise; symlink falls back to a copy when links cannot be
+    created. auto tries reflink, then hardlink, then copy. Hardlinked files share
+    their data with the source, so staged files must be treated as read-only.
+    
+    Args:
+        src: Source file path
+        dst: Destination file path (parent directory must exist)
+        mode: One of config.MATERIALIZE_MODES
+        
+    Returns:
+        The mode that was actually used
+    """
+    if mode not in MATERIALIZE_MODES:
+        raise ValueError(f"Unknown materialize mode: {mode}")
+    src, dst = Path(src), Path(dst)
+    
+    # Never write through a link left by an earlier run into the source data
+    _removeExisting(dst)
+    if mode == "copy":
+        _copyAtomic(src, dst)
+        return "copy"
+    
+    if mode == "symlink":
+        try:
+            os.symlink(os.path.abspath(src), dst)
+            return "symlink"
+        except OSError:
+            _copyAtomic(src, dst)
+            return "copy"
+    
+    candidates = ["reflink", "hardlink"] if mode == "auto" else [mode]
+    if _sameFilesystem(src, dst):
+        for candidate in candidates:
+            try:
+                if candidate == "reflink":
+                    _reflink(src, dst)
+                else:
+                    os.link(src, dst)
+                return candidate
+            except OSError:
+                continue
+    _copyAtomic(src, dst)
+    return "copy"
+
+
+class CopyExecutor:
+    """
+    Thread pool that copies files submitted by the move functions.
+
+    At most `queue_size` copies are pending at any time; submit() blocks once
+    the queue is full so that huge plans do not pile up in memory. With a
+    manifest, every completed copy is recorded, and with `resume` copies that
+    the manifest shows as complete and up to date are skipped. The executor
+    closes the manifest on shutdown.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_COPY_WORKERS,
+        queue_size: Optional[int] = None,
+        materialize: str = DEFAULT_MATERIALIZE,
+        manifest: Optional[CopyManifest] = None,
+        resume: bool = False,
+        checksum: bool = False
+    ):
+        if materialize not in MATERIALIZE_MODES:
+            raise ValueError(f"Unknown materialize mode: {materialize}")
+        self.workers = max(1, workers)
+        self.materialize = materialize
+        self.manifest = manifest
+        self.resume = resume
+        self.checksum = checksum
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="copy")
+        self._slots = threading.BoundedSemaphore(queue_size or self.workers * 4)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._files = 0
+        self._bytes = 0
+        self._errors = []
+        self._modes = {}
+        self._skipped = 0
+        self._started = None
+
+    def prepareDir(self, path) -> None:
+        """Create a destination directory (with its parents) before submitting into it."""
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+    def submit(self, src, dst, row: Optional[int] = None, reason: str = "") -> None:
+        """
+        Queue a copy of src to dst.
+
+        Args:
+            src: Source file path
+            dst: Destination file path (parent directory must exist, see prepareDir)
+            row: Metadata row position behind the copy (used by CopyPlanner)
+            reason: Why the file is staged (used by CopyPlanner)
+        """
+        self._slots.acquire()
+        with self._lock:
+            if self._started is None:
+                self._started = time.perf_counter()
+            self._pending += 1
+        try:
+            self._pool.submit(self._copy, Path(src), Path(dst))
+        except RuntimeError:
+            self._done()
+            raise
+
+    def _copy(self, src: Path, dst: Path) -> None:
+        try:
+            if self.resume and self.manifest is not None and self.manifest.isUpToDate(src, dst):
+                with self._lock:
+                    self._skipped += 1
+                return
+            used = materializeFile(src, dst, self.materialize)
+            size = dst.stat().st_size
+            if self.manifest is not None:
+                digest = hashFile(dst) if self.checksum else None
+                self.manifest.record(src, dst, used, digest)
+        except Exception as e:
+            # Nothing collects the pool futures, so anything left uncaught
+            # here (e.g. sqlite3.Error from the manifest) would be lost
+            with self._lock:
+                self._errors.append((str(src), str(dst), str(e)))
+        else:
+            with self._lock:
+                self._files += 1
+                self._bytes += size
+                self._modes[used] = self._modes.get(used, 0) + 1
+        finally:
+            self._done()
+
+    def _done(self) -> None:
+        with self._lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+        self._slots.release()
+
+    def wait(self) -> CopyStats:
+        """
+        Block until all submitted copies finish.
+
+        Returns:
+            CopyStats for the copies submitted since the previous wait()
+        """
+        with self._lock:
+            while self._pending:
+                self._idle.wait()
+            elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+            stats = CopyStats(self._files, self._bytes, elapsed, self._errors, self._modes, self._skipped)
+            self._reset()
+        if self.manifest is not None:
+            self.manifest.flush()
+            if stats.files and stats.elapsed > 0:
+                self.manifest.recordThroughput(self.materialize, stats.files, stats.bytes, stats.elapsed)
+        return stats
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+def addExecutorArguments(parser: argparse.ArgumentParser, planning: bool = True) -> None:
+    """
+    Add the copy executor options to a script's argument parser.
+
+    Args:
+        parser: Script argument parser
+        planning: Also add --plan/--plan-append for dry runs
+    """
+    parser.add_argument("--workers", type=int, default=DEFAULT_COPY_WORKERS,
+                        help="Number of parallel copy workers")
+    parser.add_argument("--materialize", type=str, default=DEFAULT_MATERIALIZE,
+                        choices=MATERIALIZE_MODES,
+                        help="How to stage files: full copy, hardlink, symlink, reflink or auto")
+    parser.add_argument("--manifest", type=str, default=str(MANIFEST_DB),
+                        help="SQLite manifest of completed copies")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--resume", action="store_true",
+                       help="Skip files the manifest records as copied and up to date")
+    group.add_argument("--force", action="store_true",
+                       help="Clear the manifest and copy everything from scratch")
+    parser.add_argument("--checksum", action="store_true",
+                        help="Store a blake2b checksum of each copy in the manifest")
+    if planning:
+        parser.add_argument("--plan", type=str, default=None,
+                            help="Dry run: write the copy plan to this CSV/Parquet file instead of copying")
+        parser.add_argument("--plan-append", action="store_true",
+                            help=argparse.SUPPRESS)
+
+
+def executorFromArgs(args: argparse.Namespace) -> CopyExecutor:
+    """Build a CopyExecutor, or a CopyPlanner for --plan, from parsed script arguments."""
+    manifest = CopyManifest(args.manifest)
+    if getattr(args, "plan", None):
+        from .plan import CopyPlanner
+        return CopyPlanner(args.plan, append=args.plan_append,
+                           materialize=args.materialize, manifest=manifest)
+    if args.force:
+        manifest.clear()
+    return CopyExecutor(
+        workers=args.workers,
+        materialize=args.materialize,
+        manifest=manifest,
+        resume=args.resume,
+        checksum=args.checksum
+    )
+
+
+def printStats(stats) -> None:
+    """Print a CopyStats (or PlanStats) summary followed by the first few errors."""
+    print(stats.summary())
+    for src, dst, error in stats.errors[:10]:
+        print(f"  ✗ {src} -> {dst}: {error}")
+    if len(stats.errors) > 10:
+        print(f"  ... and {len(stats.errors) - 10} more")
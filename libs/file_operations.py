@@ -3,12 +3,25 @@ File operation utilities for moving and organizing ADNI MRI data.
 Handles DICOM files, preprocessed files, and metadata-based file organization.
 """
 
-import os
-import shutil
 import pandas as pd
 from pathlib import Path
 from typing import Tuple, Dict, List, Optional
-from .metadata import createMetaCombinedString
+from .config import METADATA_COLUMNS, STREAM_CHUNK_SIZE
+from .dicom_index import indexDicomSeries, matchDicomSeries, seriesDirName
+from .executor import CopyExecutor, CopyStats, printStats
+from .inventory import Inventory, iterFiles
+from .metadata import baselineMask
+from .parsing import parseFilename
+from .streaming import StreamMatcher, prefetch
+
+
+def _finishCopies(copier: CopyExecutor, executor: Optional[CopyExecutor]) -> CopyStats:
+    """Wait for a move function's copies, report them and release a private executor."""
+    stats = copier.wait()
+    printStats(stats)
+    if executor is None:
+        copier.shutdown()
+    return stats
 
 
 def movePreprocessed(
@@ -17,8 +30,10 @@ def movePreprocessed(
     seq: str,
     cond: str,
     tesla: int = 3,
-    divider: str = "raw_"
-) -> Tuple[Dict, List[int]]:
+    divider: str = "raw_",
+    executor: Optional[CopyExecutor] = None,
+    inventory: Optional[Inventory] = None
+) -> Tuple[pd.DataFrame, List[int]]:
     """
     Move preprocessed files from source to target directory and track unprocessed files.
     
@@ -29,80 +44,39 @@ def movePreprocessed(
         cond: Condition (AD, CN, or MCI)
         tesla: Tesla field strength (1.5 or 3)
         divider: Divider string in filename to parse IDs
+        executor: Shared CopyExecutor (a private one is created when omitted)
+        inventory: Optional file Inventory queried instead of globbing
         
     Returns:
-        Tuple of (metadata_dict for unprocessed files, list of metadata indices)
+        Tuple of (metadata rows of unprocessed files, list of matched metadata indices)
     """
     target_path = "./preprocessed/"
     search_path = Path(path) / seq / cond
     
     print(f"Searching in: {search_path}")
     
-    result = list(search_path.glob('**/wm*.nii'))
-    unique = set(result)
-    print(f"---------\n{seq}w-{cond}\nOriginal number of files: {len(result)}\nUnique result: {len(unique)}")
+    copier = executor or CopyExecutor()
     
-    sim = 0
-    notsim = 0
-    j = 0
     target_dir = Path(target_path) / seq / cond
-    target_dir.mkdir(parents=True, exist_ok=True)
-    
-    meta_combined = createMetaCombinedString(meta_df)
-    meta_dict = {
-        "Image Data ID": [],
-        "Subject": [],
-        "Group": [],
-        "Sex": [],
-        "Age": [],
-        "Visit": [],
-        "Modality": [],
-        "Description": [],
-        "Type": [],
-        "Acq Date": [],
-        "Format": []
-    }
-    
-    for j in range(len(meta_combined)):
-        flag = 0
-        for f in result[:]:
-            pathToFile = str(f)
-            fileName = Path(pathToFile).name
-            fileNameNoExt = fileName.split(".nii")[0]
-            
-            try:
-                part = fileNameNoExt.split('_MR')
-                id_subject = part[0].split("ADNI_")[1]
-                part = part[1].split(divider)[1]
-                id_series = part.split("_S")[1].split("_I")[0]
-                id_image = fileNameNoExt.split("_I")[1]
-                
-                combinedIDs = f"{id_subject}-I{id_image}"
-                
-                if combinedIDs in meta_combined[j]:
-                    shutil.copy(f, target_dir / f"{j}-{fileName}")
-                    flag = 1
-            except IndexError:
-                continue
-        
-        if flag == 1:
-            sim += 1
-        else:
-            meta_dict["Image Data ID"].append(meta_df.loc[j, "Image Data ID"])
-            meta_dict["Subject"].append(meta_df.loc[j, "Subject"])
-            meta_dict["Group"].append(meta_df.loc[j, "Group"])
-            meta_dict["Sex"].append(meta_df.loc[j, "Sex"])
-            meta_dict["Age"].append(meta_df.loc[j, "Age"])
-            meta_dict["Visit"].append(meta_df.loc[j, "Visit"])
-            meta_dict["Modality"].append(meta_df.loc[j, "Modality"])
-            meta_dict["Description"].append(meta_df.loc[j, "Description"])
-            meta_dict["Type"].append(meta_df.loc[j, "Type"])
-            meta_dict["Acq Date"].append(meta_df.loc[j, "Acq Date"])
-            meta_dict["Format"].append(meta_df.loc[j, "Format"])
-            notsim += 1
-    
+    copier.prepareDir(target_dir)
+    
+    # Copies start while the walk is still running
+    matcher = StreamMatcher(meta_df, divider)
+    for j, f in matcher.matches(iterFiles(search_path, '**/wm*.{nii,nii.gz}', inventory)):
+        copier.submit(f, target_dir / f"{j}-{f.name}", row=j, reason="preprocessed file matches subject-Iimage")
+    print(f"---------\n{seq}w-{cond}\nOriginal number of files: {matcher.scanned}")
+    print(f"Unparsed filenames: {matcher.rejected}")
+    
+    matched = sorted(matcher.matched)
+    # Export the metadata columns the frame has, like exportCSV always did
+    columns = [c for c in METADATA_COLUMNS if c in meta_df.columns]
+    unmatched_df = meta_df.loc[matcher.unmatchedMask(), columns].reset_index(drop=True)
+    
+    sim = len(matched)
+    notsim = len(unmatched_df)
+    _finishCopies(copier, executor)
     print(f"Total {seq}w-{cond} data is {sim} and not preprocessed is {notsim}")
-    return meta_dict, [i for i in range(len(meta_combined)) if i not in [j for j in range(len(meta_dict['Image Data ID']))]]
+    return unmatched_df, matched
 
 
 def freemove(
@@ -111,7 +85,9 @@ def freemove(
     seq: str,
     cond: str,
     tesla: int = 3,
-    file_format: str = '**/*wm*.nii'
+    file_format: str = '**/*wm*.{nii,nii.gz}',
+    executor: Optional[CopyExecutor] = None,
+    inventory: Optional[Inventory] = None
 ) -> int:
     """
     Move files based on filename pattern matching.
@@ -124,31 +100,34 @@ def freemove(
         cond: Condition (AD, CN, or MCI)
         tesla: Tesla field strength
         file_format: Glob pattern for file matching (default: white matter segmented files)
+        executor: Shared CopyExecutor (a private one is created when omitted)
+        inventory: Optional file Inventory queried instead of globbing
         
     Returns:
         Count of files moved
     """
-    target_dir = Path(target_path) / seq / cond
-    target_dir.mkdir(parents=True, exist_ok=True)
-    
     search_path = Path(source_path) / seq / cond
     print(f"Source path: {search_path}")
     print(f"Exists: {search_path.exists()}")
     
-    result = sorted(list(search_path.glob(file_format)))
-    unique = set(result)
-    print(f"----\n{seq}-{cond}\nOriginal number of files: {len(result)}\nUnique result: {len(unique)}")
+    copier = executor or CopyExecutor()
+    
+    target_dir = Path(target_path) / seq / cond
+    copier.prepareDir(target_dir)
     
+    scanned = 0
     j = 0
-    for f in result:
-        pathToFile = str(f)
-        fileName = Path(pathToFile).name
+    for f in prefetch(iterFiles(search_path, file_format, inventory), STREAM_CHUNK_SIZE):
+        scanned += 1
+        fileName = Path(f).name
         
         if "ADNI" in fileName:
             print(f"Moving: {fileName}")
-            shutil.copy(f, target_dir / f"{j}-{fileName}")
+            copier.submit(f, target_dir / f"{j}-{fileName}", reason=f"ADNI file matching {file_format}")
             j += 1
+    print(f"----\n{seq}-{cond}\nOriginal number of files: {scanned}")
     
+    _finishCopies(copier, executor)
     print(f"Total files moved: {j}")
     return j
 
@@ -158,7 +137,9 @@ def move2preprocess(
     seq: str,
     cond: str,
     tesla: int = 3,
-    divider: str = "raw_"
+    divider: str = "raw_",
+    executor: Optional[CopyExecutor] = None,
+    inventory: Optional[Inventory] = None
 ) -> int:
     """
     Move files that need preprocessing to designated folder with proper organization.
@@ -170,6 +151,8 @@ def move2preprocess(
         cond: Condition (AD, CN, or MCI)
         tesla: Tesla field strength
         divider: Divider string in filename to parse IDs
+        executor: Shared CopyExecutor (a private one is created when omitted)
+        inventory: Optional file Inventory queried instead of globbing
         
     Returns:
         Count of files moved
@@ -179,41 +162,26 @@ def move2preprocess(
     
     print(f"Source path: {nii_path}{cond}/")
     
-    result = list(Path(nii_path).glob(f'**/*{cond}/**/*.nii'))
-    unique = set(result)
-    print(f"---------\n{seq}w-{cond}\nOriginal number: {len(result)}\nUnique result: {len(unique)}")
+    copier = executor or CopyExecutor()
     
+    matcher = StreamMatcher(meta_df, divider)
+    staged = set()
     sim = 0
-    ctr = 0
-    
-    for ctr in range(len(meta_df)):
-        flag = 0
-        for f in result[:]:
-            pathToFile = str(f)
-            fileName = Path(pathToFile).name
-            fileNameNoExt = fileName.split(".nii")[0]
-            
-            try:
-                part = fileNameNoExt.split('_MR')
-                id_subject = part[0].split("ADNI_")[1]
-                part = part[1].split(divider)[1]
-                id_series = part.split("_S")[1].split("_I")[0]
-                id_image = fileNameNoExt.split("_I")[1]
-                
-                subdirName = f"{id_subject}-{id_series}-{id_image}"
-                meta_combined = f"{id_subject}-I{id_image}"
-                
-                meta_combined_list = createMetaCombinedString(meta_df)
-                
-                if meta_combined in meta_combined_list[ctr]:
-                    target_dir = Path(target_path) / seq / cond / subdirName
-                    target_dir.mkdir(parents=True, exist_ok=True)
-                    shutil.copy(f, target_dir / fileName)
-                    flag = 1
-                    sim += 1
-            except (IndexError, ValueError):
-                continue
-    
+    for ctr, f in matcher.matches(iterFiles(nii_path, f'**/*{cond}/**/*.{{nii,nii.gz}}', inventory)):
+        sim += 1
+        # Several metadata rows may point at the same file; stage it once
+        if f in staged:
+            continue
+        staged.add(f)
+        name = parseFilename(f, divider)
+        subdirName = f"{name.subject}-{name.series}-{name.image}"
+        target_dir = Path(target_path) / seq / cond / subdirName
+        copier.prepareDir(target_dir)
+        copier.submit(f, target_dir / f.name, row=ctr, reason="raw file needs preprocessing")
+    print(f"---------\n{seq}w-{cond}\nOriginal number: {matcher.scanned}")
+    print(f"Unparsed filenames: {matcher.rejected}")
+    
+    _finishCopies(copier, executor)
     print(f"Total {seq}w - {cond} data is {sim}")
     return sim
 
@@ -223,11 +191,16 @@ def move2convert(
     seq: str,
     cond: str,
     tesla: int = 3,
-    divider: str = "raw_"
+    divider: str = "raw_",
+    executor: Optional[CopyExecutor] = None,
+    inventory: Optional[Inventory] = None,
+    read_headers: bool = True
 ) -> int:
     """
     Move DICOM files to conversion folder with proper directory structure.
-    Organizes files by series and image ID for DICOM to NIfTI conversion.
+    Organizes files by series and image ID for DICOM to NIfTI conversion:
+    files are grouped into series, each series is joined to the metadata on
+    "subject-Iimage" and staged once into {subject}-S{series}_I{image}/.
     
     Args:
         meta_df: Metadata DataFrame
@@ -235,6 +208,10 @@ def move2convert(
         cond: Condition (AD, CN, or MCI)
         tesla: Tesla field strength
         divider: Divider string in filename to parse IDs
+        executor: Shared CopyExecutor (a private one is created when omitted)
+        inventory: Optional file Inventory queried instead of globbing
+        read_headers: Group files whose path carries no image ID by the
+            SeriesInstanceUID of their headers (read in bulk)
         
     Returns:
         Count of files moved
@@ -244,37 +221,25 @@ def move2convert(
     
     print(f"Source DICOM path: {dicom_path}")
     
-    result = list(Path(dicom_path).glob('**/*.dcm'))
-    unique = set(result)
-    print(f"---------\n{seq}w-{cond}\nOriginal number: {len(result)}\nUnique result: {len(unique)}")
+    copier = executor or CopyExecutor()
+    
+    # Grouping into series needs the whole listing; only path strings are kept
+    series, unresolved = indexDicomSeries(iterFiles(dicom_path, '**/*.dcm', inventory), read_headers)
+    print(f"---------\n{seq}w-{cond}\nOriginal number: {int(series['files'].str.len().sum()) + len(unresolved)}")
+    match = matchDicomSeries(meta_df, series, unresolved)
+    print(f"Series found: {len(series)}, matched: {len(match.staged)}, "
+          f"unmatched series: {len(match.unmatched_series)}, unresolved files: {len(match.unresolved)}")
+    print(f"Metadata rows without DICOM series: {len(match.unmatched_rows)}")
     
     sim = 0
-    ctr = 0
-    
-    for ctr in range(len(meta_df)):
-        flag = 0
-        for f in result[:]:
-            pathToFile = str(f)
-            fileName = Path(pathToFile).name
-            
-            try:
-                # Extract IDs from path structure (assuming nested folder structure)
-                parts = Path(pathToFile).parts
-                # Adjust indexing based on your actual folder structure
-                if len(parts) > 3:
-                    id_subject = meta_df.loc[ctr, "Subject"]
-                    id_series = meta_df.loc[ctr, "Image Data ID"]
-                    id_image = meta_df.loc[ctr, "Image Data ID"]
-                    
-                    subdirName = f"{id_subject}-{id_series}_{id_image}"
-                    target_dir = Path(target_path) / seq / cond / subdirName
-                    target_dir.mkdir(parents=True, exist_ok=True)
-                    shutil.copy(f, target_dir / fileName)
-                    flag = 1
-                    sim += 1
-            except (IndexError, ValueError):
-                continue
+    for row in match.staged.itertuples(index=False):
+        target_dir = Path(target_path) / seq / cond / seriesDirName(row.subject, row.series, row.image)
+        copier.prepareDir(target_dir)
+        for f in row.files:
+            copier.submit(f, target_dir / Path(f).name, row=row.row, reason=f"DICOM series {row.key}")
+            sim += 1
     
+    _finishCopies(copier, executor)
     print(f"Total {seq}w - {cond} data is {sim}")
     return sim
 
@@ -284,7 +249,9 @@ def moveConverted(
     seq: str,
     cond: str,
     tesla: int = 3,
-    divider: str = "br_"
+    divider: str = "br_",
+    executor: Optional[CopyExecutor] = None,
+    inventory: Optional[Inventory] = None
 ) -> int:
     """
     Move converted NIfTI files from conversion folder to preprocessed folder.
@@ -295,6 +262,8 @@ def moveConverted(
         cond: Condition (AD, CN, or MCI)
         tesla: Tesla field strength
         divider: Divider string in filename to parse IDs
+        executor: Shared CopyExecutor (a private one is created when omitted)
+        inventory: Optional file Inventory queried instead of globbing
         
     Returns:
         Count of files moved
@@ -304,40 +273,20 @@ def moveConverted(
     
     print(f"Source NIfTI path: {nii_path}")
     
-    result = list(Path(nii_path).glob('**/wm*.nii'))
-    unique = set(result)
-    print(f"---------\n{seq}w-{cond}\nOriginal number: {len(result)}\nUnique result: {len(unique)}")
+    copier = executor or CopyExecutor()
     
-    sim = 0
-    j = 0
     target_dir = Path(target_path) / seq / cond
-    target_dir.mkdir(parents=True, exist_ok=True)
-    
-    meta_combined = createMetaCombinedString(meta_df)
-    
-    for j in range(len(meta_combined)):
-        flag = 0
-        for f in result[:]:
-            pathToFile = str(f)
-            fileName = Path(pathToFile).name
-            fileNameNoExt = fileName.split(".nii")[0]
-            
-            try:
-                part = fileNameNoExt.split('_MR')
-                id_subject = part[0].split("ADNI_")[1]
-                part = part[1].split(divider)[1]
-                id_series = part.split("_S")[1].split("_I")[0]
-                id_image = fileNameNoExt.split("_I")[1]
-                
-                combinedIDs = f"{id_subject}-I{id_image}"
-                
-                if combinedIDs in meta_combined[j]:
-                    shutil.copy(f, target_dir / f"{j}-{fileName}")
-                    flag = 1
-                    sim += 1
-            except IndexError:
-                continue
+    copier.prepareDir(target_dir)
     
+    matcher = StreamMatcher(meta_df, divider)
+    sim = 0
+    for j, f in matcher.matches(iterFiles(nii_path, '**/wm*.{nii,nii.gz}', inventory)):
+        copier.submit(f, target_dir / f"{j}-{f.name}", row=j, reason="converted file matches subject-Iimage")
+        sim += 1
+    print(f"---------\n{seq}w-{cond}\nOriginal number: {matcher.scanned}")
+    print(f"Unparsed filenames: {matcher.rejected}")
+    
+    _finishCopies(copier, executor)
     print(f"Total {seq}w - {cond} data is {sim}")
     return sim
 
@@ -347,17 +296,23 @@ def move2separate(
     seq: str,
     tesla: int = 3,
     ONLY_BASELINE: bool = False,
-    divider: str = "Br_"
+    divider: str = "Br_",
+    executor: Optional[CopyExecutor] = None,
+    inventory: Optional[Inventory] = None
 ) -> int:
     """
     Move and separate data into organized folder structure for robustness evaluation.
+    Each file is joined to its metadata row on "subject-Iimage" and staged once
+    into DataSep/{seq}/{subject}-{image}/.
     
     Args:
         meta_df: Metadata DataFrame
         seq: Sequence type (T1 or T2)
         tesla: Tesla field strength
-        ONLY_BASELINE: Filter only baseline visits
+        ONLY_BASELINE: Keep only rows whose Visit matches config.BASELINE_VISIT_PATTERN
         divider: Divider string in filename to parse IDs
+        executor: Shared CopyExecutor (a private one is created when omitted)
+        inventory: Optional file Inventory queried instead of globbing
         
     Returns:
         Count of files processed
@@ -367,37 +322,37 @@ def move2separate(
     
     print(f"Source path: {nii_path}")
     
-    result = sorted(list(Path(nii_path).glob('**/*.nii')))
-    unique = set(result)
-    print(f"---------\n{seq}w\nOriginal number: {len(result)}\nUnique result: {len(unique)}")
+    copier = executor or CopyExecutor()
     
-    sim = 0
-    ctr = 0
-    
-    meta_combined = createMetaCombinedString(meta_df)
-    
-    for ctr in range(len(meta_combined)):
-        flag = 0
-        for f in result[:]:
-            pathToFile = str(f)
-            fileName = Path(pathToFile).name
-            
-            try:
-                # Match metadata
-                for meta_id, meta_str in enumerate(meta_combined):
-                    if str(ctr) in str(meta_id):
-                        id_subject = meta_df.loc[ctr, "Subject"]
-                        id_series = meta_df.loc[ctr, "Image Data ID"]
-                        subdirName = f"{id_subject}-{id_series}"
-                        
-                        target_dir = Path(target_path) / seq / subdirName
-                        target_dir.mkdir(parents=True, exist_ok=True)
-                        shutil.copy(f, target_dir / fileName)
-                        flag = 1
-                        sim += 1
-                        break
-            except (IndexError, ValueError):
-                continue
+    # Row positions in the caller's frame, kept through the baseline filter
+    positions = pd.RangeIndex(len(meta_df))
+    reason = "hold-out file matches subject-Iimage"
+    if ONLY_BASELINE:
+        mask = baselineMask(meta_df).to_numpy()
+        print(f"Baseline rows: {int(mask.sum())} of {len(meta_df)}")
+        meta_df = meta_df[mask]
+        positions = positions[mask]
+        reason = "baseline " + reason
     
+    matcher = StreamMatcher(meta_df, divider)
+    
+    subjects = meta_df["Subject"].astype(str).to_numpy()
+    images = meta_df["Image Data ID"].astype(str).to_numpy()
+    staged = set()
+    sim = 0
+    for j, f in matcher.matches(iterFiles(nii_path, '**/*.{nii,nii.gz}', inventory)):
+        # A file is staged once even if several rows share its key
+        if f in staged:
+            continue
+        staged.add(f)
+        target_dir = Path(target_path) / seq / f"{subjects[j]}-{images[j]}"
+        copier.prepareDir(target_dir)
+        copier.submit(f, target_dir / f.name, row=int(positions[j]), reason=reason)
+        sim += 1
+    print(f"---------\n{seq}w\nOriginal number: {matcher.scanned}")
+    print(f"Matched rows: {len(matcher.matched)}, unmatched rows: {len(matcher.unmatched())}, "
+          f"unparsed filenames: {matcher.rejected}")
+    
+    _finishCopies(copier, executor)
     print(f"Total {seq} data is {sim}")
     return sim
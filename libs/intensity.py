@@ -0,0 +1,307 @@
+"""
+Intensity normalization and downsampling of NIfTI volumes.
+Volumes are memory-mapped and processed in slabs of z-slices with vectorized
+numpy: a first pass collects masked statistics, a second normalizes,
+block-mean downsamples and writes each slab into a memory-mapped output.
+Files are spread across a process pool.
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+from .config import (
+    DEFAULT_NORMALIZE_WORKERS,
+    NIFTI_ANY_PATTERN,
+    NORMALIZE_CHUNK_SLICES,
+    NORMALIZE_METHODS,
+)
+from .inventory import walkFiles
+from .nifti import NIFTI_HEADER_SIZE, loadVolume, niftiHeaderBytes, readNiftiHeader, scaleVoxels
+
+
+class NormalizeStats(NamedTuple):
+    """Aggregate result of processing a set of volumes."""
+
+    files: int
+    elapsed: float
+    errors: List[Tuple[str, str]]
+
+    def summary(self) -> str:
+        return f"Processed {self.files} volumes in {self.elapsed:.1f}s, errors: {len(self.errors)}"
+
+
+class MaskedStats(NamedTuple):
+    """Intensity statistics over the voxels inside the mask."""
+
+    count: int
+    mean: float
+    std: float
+    min: float
+    max: float
+
+
+def _slabs(depth: int, size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, depth, size):
+        yield start, min(start + size, depth)
+
+
+def _scaled(chunk: np.ndarray, slope: float, inter: float) -> np.ndarray:
+    """Slab as float32 with the header's scl_slope/scl_inter applied."""
+    return scaleVoxels(chunk, slope, inter, np.float32)
+
+
+@contextmanager
+def _mappable(src, work_dir) -> Iterator[str]:
+    """
+    Path under which src can be memory-mapped.
+
+    A .nii.gz is stream-decompressed to a temporary .nii in work_dir (removed
+    afterwards), so it never has to fit in memory as a whole. Truncated or
+    corrupt archives raise ValueError, which callers report per file.
+    """
+    src = str(src)
+    if not src.endswith(".gz"):
+        yield src
+        return
+    fd, tmp = tempfile.mkstemp(suffix=".nii", prefix=".decompressed-", dir=work_dir)
+    try:
+        with os.fdopen(fd, "wb") as out, gzip.open(src, "rb") as f:
+            shutil.copyfileobj(f, out, 1 << 20)
+        yield tmp
+    except EOFError as e:
+        raise ValueError(f"{src} is truncated: {e}") from e
+    except zlib.error as e:
+        raise ValueError(f"{src} is corrupt: {e}") from e
+    finally:
+        os.unlink(tmp)
+
+
+def maskedStats(
+    data: np.ndarray,
+    threshold: float = 0.0,
+    chunk_slices: int = NORMALIZE_CHUNK_SLICES,
+    slope: float = 1.0,
+    inter: float = 0.0
+) -> MaskedStats:
+    """
+    Statistics of the voxels above threshold, accumulated slab by slab.
+
+    Args:
+        data: Volume indexed [x, y, z, ...] (typically a memmap)
+        threshold: Voxels with values above it form the mask
+        chunk_slices: z-slices read per slab
+        slope: scl_slope of the volume
+        inter: scl_inter of the volume
+
+    Returns:
+        MaskedStats (NaN mean/std/min/max when the mask is empty)
+    """
+    count = 0
+    total = squares = 0.0
+    low, high = np.inf, -np.inf
+    for start, stop in _slabs(data.shape[2], chunk_slices):
+        values = _scaled(data[:, :, start:stop], slope, inter)
+        values = values[values > threshold].astype(np.float64)
+        if values.size == 0:
+            continue
+        count += values.size
+        total += values.sum()
+        squares += np.square(values).sum()
+        low = min(low, values.min())
+        high = max(high, values.max())
+    if count == 0:
+        return MaskedStats(0, np.nan, np.nan, np.nan, np.nan)
+    mean = total / count
+    std = np.sqrt(max(squares / count - mean * mean, 0.0))
+    return MaskedStats(count, mean, std, low, high)
+
+
+def blockMean(data: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Downsample the first three axes by averaging factor^3 blocks.
+
+    Trailing voxels that do not fill a whole block are dropped.
+
+    Args:
+        data: Array indexed [x, y, z, ...]
+        factor: Integer downsampling factor
+
+    Returns:
+        Array of shape (x // factor, y // factor, z // factor, ...)
+    """
+    if factor == 1:
+        return data
+    x, y, z = (n // factor for n in data.shape[:3])
+    rest = data.shape[3:]
+    blocks = data[:x * factor, :y * factor, :z * factor].reshape(
+        x, factor, y, factor, z, factor, *rest)
+    return blocks.mean(axis=(1, 3, 5), dtype=np.float32)
+
+
+def downsampledAffine(affine: np.ndarray, factor: int) -> np.ndarray:
+    """Affine of a block-mean downsampled grid; block centres keep their world position."""
+    out = np.array(affine, dtype=float)
+    out[:3, 3] = affine[:3, 3] + affine[:3, :3] @ np.full(3, (factor - 1) / 2)
+    out[:3, :3] = affine[:3, :3] * factor
+    return out
+
+
+def processVolume(
+    src,
+    dst,
+    method: str = "zscore",
+    factor: int = 1,
+    threshold: float = 0.0,
+    chunk_slices: int = NORMALIZE_CHUNK_SLICES
+) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Normalize and downsample one volume into a float32 .nii file.
+
+    Voxels above threshold form the mask. "zscore" maps them to zero mean and
+    unit variance, "minmax" to [0, 1]; voxels outside the mask become 0.
+    "none" leaves intensities unchanged. Only chunk_slices z-slices (rounded
+    up to a multiple of factor) are held in memory at a time; a .nii.gz input
+    is first decompressed to a temporary file next to dst and mapped from
+    there. The output is written to a temporary file and renamed.
+
+    Args:
+        src: Input .nii or .nii.gz
+        dst: Output .nii
+        method: One of NORMALIZE_METHODS
+        factor: Integer block-mean downsampling factor (1 = none)
+        threshold: Mask threshold
+        chunk_slices: z-slices per slab
+
+    Returns:
+        Tuple of (input shape, output shape)
+    """
+    if method not in NORMALIZE_METHODS:
+        raise ValueError(f"Unknown normalization {method!r}, expected one of {NORMALIZE_METHODS}")
+    if factor < 1:
+        raise ValueError("factor must be a positive integer")
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with _mappable(src, dst.parent) as path:
+        return _processMapped(path, src, dst, method, factor, threshold, chunk_slices)
+
+
+def _processMapped(path: str, src, dst: Path, method: str, factor: int, threshold: float,
+                   chunk_slices: int) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """processVolume body on a mappable copy at path; src only names the input in errors."""
+    header = readNiftiHeader(path)
+    data = loadVolume(path, header)
+    if data.ndim < 3:
+        raise ValueError(f"{src} has {data.ndim} dimensions, expected at least 3")
+    slope, inter = header["scl_slope"], header["scl_inter"]
+    chunk_slices = -(-max(chunk_slices, 1) // factor) * factor
+
+    shift, scale = 0.0, 1.0
+    if method != "none":
+        stats = maskedStats(data, threshold, chunk_slices, slope, inter)
+        if stats.count == 0:
+            raise ValueError(f"No voxels above {threshold} in {src}")
+        if method == "zscore":
+            shift, scale = stats.mean, stats.std or 1.0
+        else:
+            shift, scale = stats.min, (stats.max - stats.min) or 1.0
+
+    out_shape = tuple(n // factor for n in data.shape[:3]) + data.shape[3:]
+    tmp = dst.with_name(dst.name + ".part")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(niftiHeaderBytes(out_shape, np.float32, downsampledAffine(header["affine"], factor)))
+            f.truncate(NIFTI_HEADER_SIZE + 4 + int(np.prod(out_shape)) * 4)
+        out = np.memmap(tmp, dtype=np.float32, mode="r+", offset=NIFTI_HEADER_SIZE + 4,
+                        shape=out_shape, order="F")
+        for start, stop in _slabs(out_shape[2] * factor, chunk_slices):
+            slab = _scaled(data[:, :, start:stop], slope, inter)
+            if method != "none":
+                mask = slab > threshold
+                slab = np.where(mask, (slab - np.float32(shift)) / np.float32(scale), np.float32(0))
+            out[:, :, start // factor:stop // factor] = blockMean(slab, factor)
+        out.flush()
+        del out
+        os.replace(tmp, dst)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return tuple(data.shape), out_shape
+
+
+def _processOne(src: str, dst: str, kwargs: dict):
+    try:
+        return processVolume(src, dst, **kwargs)
+    except (OSError, ValueError) as e:
+        return e
+
+
+def processFiles(
+    jobs: Iterable[Tuple[str, str]],
+    workers: Optional[int] = DEFAULT_NORMALIZE_WORKERS,
+    **kwargs
+) -> NormalizeStats:
+    """
+    Run processVolume over (src, dst) pairs on a process pool.
+
+    Args:
+        jobs: (input, output) path pairs
+        workers: Worker processes (default: CPU count)
+        **kwargs: Passed to processVolume
+
+    Returns:
+        NormalizeStats
+    """
+    start = time.perf_counter()
+    jobs = [(str(src), str(dst)) for src, dst in jobs]
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_processOne, src, dst, kwargs) for src, dst in jobs]
+        for (src, _), future in zip(jobs, futures):
+            outcome = future.result()
+            if isinstance(outcome, Exception):
+                errors.append((src, str(outcome)))
+    return NormalizeStats(len(jobs) - len(errors), time.perf_counter() - start, errors)
+
+
+def processTree(
+    source,
+    target,
+    seq: str,
+    cond: str,
+    pattern: str = NIFTI_ANY_PATTERN,
+    workers: Optional[int] = DEFAULT_NORMALIZE_WORKERS,
+    **kwargs
+) -> NormalizeStats:
+    """
+    Process every volume of {source}/{seq}/{cond} into {target}/{seq}/{cond}.
+
+    Outputs keep their input names (as .nii).
+
+    Args:
+        source: Input stage directory
+        target: Output stage directory
+        seq: Sequence type (T1 or T2)
+        cond: Condition (AD, CN, or MCI)
+        pattern: Glob pattern of input volumes
+        workers: Worker processes (default: CPU count)
+        **kwargs: Passed to processVolume
+
+    Returns:
+        NormalizeStats
+    """
+    target_dir = Path(target) / seq / cond
+    jobs = []
+    for f in walkFiles(Path(source) / seq / cond, pattern):
+        name = Path(f).name
+        jobs.append((f, target_dir / (name[:-3] if name.endswith(".gz") else name)))
+    return processFiles(jobs, workers, **kwargs)
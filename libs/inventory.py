@@ -0,0 +1,372 @@
+"""
+Persistent filesystem inventory backed by SQLite.
+Walks the data trees once with os.scandir and records path, size, mtime and
+parsed ADNI IDs for every file. Later refreshes only list directories whose
+mtime changed, so repeated steps do not re-glob multi-million-file trees.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .config import INVENTORY_DB
+from .parsing import parseFilename
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT,
+    name TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    subject TEXT,
+    series TEXT,
+    image TEXT
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS files_image ON files(image);
+"""
+
+# A refresh commits after this many file and directory rows or seconds,
+# whichever comes first, so other connections are not locked out for long
+COMMIT_EVERY = 5000
+COMMIT_INTERVAL = 0.5
+
+
+@lru_cache(maxsize=128)
+def globToRegex(pattern: str) -> "re.Pattern":
+    """
+    Translate a Path.glob pattern (with "**") into a regex over "/"-separated relative paths.
+
+    Besides the Path.glob syntax, "{a,b}" matches either literal alternative,
+    e.g. "**/wm*.{nii,nii.gz}".
+
+    Args:
+        pattern: Glob pattern such as "**/wm*.nii"
+
+    Returns:
+        Compiled regular expression matching whole relative paths
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append(r"(?:[^/]*/)*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(r".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append(r"[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append(r"[^/]")
+            i += 1
+        elif pattern[i] == "{" and "}" in pattern[i + 1:]:
+            j = pattern.index("}", i + 1)
+            options = pattern[i + 1:j].split(",")
+            out.append("(?:" + "|".join(re.escape(option) for option in options) + ")")
+            i = j + 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            j = pattern.index("]", i + 1)
+            body = pattern[i + 1:j].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = j + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def _prefixRange(root: str):
+    prefix = root.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class Inventory:
+    """
+    SQLite index of files under one or more data trees.
+
+    The connection may be handed to another thread (streaming stages read
+    query results from a producer thread) but must only be used by one
+    thread at a time.
+    """
+
+    def __init__(self, db_path=INVENTORY_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _forget(self, path: str) -> None:
+        """Drop a directory and everything recorded below it."""
+        lo, hi = _prefixRange(path)
+        conn = self._conn
+        conn.execute("DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)", (path, lo, hi))
+        conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, lo, hi))
+
+    def _refreshWalk(self, root: str) -> Iterator[Tuple[str, bool]]:
+        """
+        Bring the index for a tree up to date one directory at a time.
+
+        Yields (directory, rescanned) once the directory's listing is current,
+        files of a directory before its subdirectories, subdirectories in
+        sorted order (the order walkFiles uses).
+        """
+        conn = self._conn
+        if not os.path.isdir(root):
+            self._forget(root)
+            conn.commit()
+            return
+
+        known = dict(conn.execute(
+            "SELECT path, mtime_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (root, *_prefixRange(root))
+        ).fetchall())
+
+        pending = 0
+        committed_at = time.monotonic()
+        stack = [root]
+        try:
+            while stack:
+                d = stack.pop()
+                try:
+                    mtime_ns = os.stat(d).st_mtime_ns
+                except OSError:
+                    self._forget(d)
+                    continue
+
+                if known.get(d) == mtime_ns:
+                    subdirs = sorted(row[0] for row in conn.execute(
+                        "SELECT path FROM dirs WHERE parent = ?", (d,)))
+                    stack.extend(reversed(subdirs))
+                    yield d, False
+                    continue
+
+                rows = []
+                subdirs = []
+                with os.scandir(d) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file():
+                                st = entry.stat()
+                                name = parseFilename(entry.name, "")
+                                rows.append((
+                                    entry.path, d, entry.name, st.st_size, st.st_mtime_ns,
+                                    name.subject if name else None,
+                                    name.series if name else None,
+                                    name.image if name else None,
+                                ))
+                        except OSError:
+                            continue
+
+                present = set(subdirs)
+                for (old,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (d,)).fetchall():
+                    if old not in present:
+                        self._forget(old)
+                conn.execute("DELETE FROM files WHERE dir = ?", (d,))
+                conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+                             (d, os.path.dirname(d), mtime_ns))
+                for sub in subdirs:
+                    conn.execute("INSERT OR IGNORE INTO dirs VALUES (?, ?, ?)", (sub, d, None))
+                stack.extend(sorted(subdirs, reverse=True))
+                pending += len(rows) + len(subdirs) + 1
+                if pending >= COMMIT_EVERY or time.monotonic() - committed_at >= COMMIT_INTERVAL:
+                    conn.commit()
+                    pending = 0
+                    committed_at = time.monotonic()
+                yield d, True
+        finally:
+            # Also reached when a consumer stops early
+            conn.commit()
+
+    def refresh(self, root) -> int:
+        """
+        Bring the index for a tree up to date.
+
+        Directories whose mtime is unchanged keep their recorded listing; only
+        new or modified directories are read with os.scandir. Size changes of
+        files in place do not touch the directory mtime and are not picked up.
+        Work is committed in batches of whole directories: other processes
+        can read and write the inventory meanwhile, and an interrupted
+        refresh keeps the directories it finished.
+
+        Args:
+            root: Directory to index
+
+        Returns:
+            Number of directories that were rescanned
+        """
+        return sum(rescanned for _, rescanned in self._refreshWalk(os.path.abspath(root)))
+
+    def _iterPaths(self, root: str, pattern: str) -> Iterable[str]:
+        regex = globToRegex(pattern)
+        lo, hi = _prefixRange(root)
+        for (path,) in self._conn.execute(
+            "SELECT path FROM files WHERE path >= ? AND path < ? ORDER BY path", (lo, hi)
+        ):
+            if regex.match(path[len(lo):].replace(os.sep, "/")):
+                yield path
+
+    def glob(self, root, pattern: str = "**/*", refresh: bool = True) -> List[Path]:
+        """
+        List indexed files under root matching a glob pattern.
+
+        Args:
+            root: Directory to search
+            pattern: Glob pattern relative to root (Path.glob syntax)
+            refresh: Refresh the index for root before querying
+
+        Returns:
+            Sorted list of matching file paths
+        """
+        root = os.path.abspath(root)
+        if refresh:
+            self.refresh(root)
+        return [Path(p) for p in self._iterPaths(root, pattern)]
+
+    def iterGlob(self, root, pattern: str = "**/*", refresh: bool = True) -> Iterator[str]:
+        """
+        Stream indexed paths under root matching a glob pattern.
+
+        With refresh, each directory is brought up to date right before its
+        files are yielded, so the first paths arrive while the rest of the
+        tree is still being checked. Paths come in walkFiles order (a
+        directory's files sorted, then its subdirectories); without refresh
+        they are sorted by path.
+
+        Args:
+            root: Directory to search
+            pattern: Glob pattern relative to root (Path.glob syntax)
+            refresh: Refresh the index for root while streaming
+
+        Returns:
+            Iterator of matching path strings
+        """
+        root = os.path.abspath(root)
+        if not refresh:
+            yield from self._iterPaths(root, pattern)
+            return
+        regex = globToRegex(pattern)
+        prefix_len = len(root.rstrip(os.sep)) + 1
+        for d, _ in self._refreshWalk(root):
+            names = self._conn.execute("SELECT path FROM files WHERE dir = ? ORDER BY path", (d,)).fetchall()
+            for (path,) in names:
+                if regex.match(path[prefix_len:].replace(os.sep, "/")):
+                    yield path
+
+    def count(self, root, pattern: str = "**/*", refresh: bool = True) -> int:
+        """Count indexed files under root matching a glob pattern."""
+        return sum(1 for _ in self.iterGlob(root, pattern, refresh))
+
+
+def listFiles(root, pattern: str, inventory: Optional[Inventory] = None) -> List[Path]:
+    """
+    List files under root matching a glob pattern, through the inventory when given.
+
+    Args:
+        root: Directory to search
+        pattern: Glob pattern relative to root
+        inventory: Optional Inventory to query instead of walking the tree
+
+    Returns:
+        List of matching file paths
+    """
+    if inventory is not None:
+        return inventory.glob(root, pattern)
+    return [Path(p) for p in walkFiles(root, pattern)]
+
+
+def walkFiles(root, pattern: str = "**/*") -> Iterator[str]:
+    """
+    Walk a tree with os.scandir and yield files matching a glob pattern.
+
+    Entries are visited in sorted order per directory, so the output is
+    deterministic, and only the directories still to visit are held in memory.
+
+    Args:
+        root: Directory to search
+        pattern: Glob pattern relative to root (Path.glob syntax)
+
+    Returns:
+        Iterator of matching path strings
+    """
+    regex = globToRegex(pattern)
+    root = str(root).rstrip(os.sep) or os.sep
+    prefix_len = len(root) + 1
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file() and regex.match(entry.path[prefix_len:].replace(os.sep, "/")):
+                    yield entry.path
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+
+
+def iterFiles(root, pattern: str, inventory: Optional[Inventory] = None) -> Iterator[str]:
+    """
+    Stream files under root matching a glob pattern, through the inventory when given.
+
+    Args:
+        root: Directory to search
+        pattern: Glob pattern relative to root
+        inventory: Optional Inventory to query instead of walking the tree
+
+    Returns:
+        Iterator of matching path strings
+    """
+    if inventory is not None:
+        return inventory.iterGlob(root, pattern)
+    return walkFiles(root, pattern)
+
+
+def addInventoryArguments(parser: argparse.ArgumentParser) -> None:
+    """Add the inventory options to a script's argument parser."""
+    parser.add_argument("--inventory", type=str, default=str(INVENTORY_DB),
+                        help="SQLite file inventory used instead of globbing")
+    parser.add_argument("--no-inventory", action="store_true",
+                        help="Glob the directories directly instead of using the inventory")
+
+
+def inventoryFromArgs(args: argparse.Namespace) -> Optional[Inventory]:
+    """Open the Inventory selected by parsed script arguments, if any."""
+    if args.no_inventory:
+        return None
+    return Inventory(args.inventory)
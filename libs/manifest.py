@@ -0,0 +1,301 @@
+"""
+Copy manifest for resumable, idempotent runs.
+Records every completed copy (source, destination, size, mtime, optional
+checksum) in SQLite so that an interrupted run can skip files that are
+already staged and up to date.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import MANIFEST_DB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS copies (
+    dst TEXT PRIMARY KEY,
+    src TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    checksum TEXT,
+    mode TEXT,
+    completed_at REAL
+);
+CREATE TABLE IF NOT EXISTS duplicates (
+    path TEXT PRIMARY KEY,
+    canonical TEXT,
+    size INTEGER,
+    checksum TEXT,
+    recorded_at REAL
+);
+CREATE TABLE IF NOT EXISTS throughput (
+    mode TEXT,
+    files INTEGER,
+    bytes INTEGER,
+    seconds REAL,
+    recorded_at REAL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    checksum TEXT,
+    hashed_at REAL
+);
+"""
+
+# Columns added to copies after the first release: (name, SQL type)
+COPIES_MIGRATIONS = [
+    ("src_checksum", "TEXT"),
+    ("verified", "INTEGER"),
+    ("verified_at", "REAL"),
+]
+
+# Number of recent batches averaged by CopyManifest.throughput
+THROUGHPUT_WINDOW = 20
+
+# Pending records are committed after this many rows or seconds, whichever
+# comes first, so processes sharing the manifest wait briefly for the lock
+COMMIT_EVERY = 50
+COMMIT_INTERVAL = 0.5
+
+
+def _key(path) -> str:
+    """Absolute form of a path, so relative and absolute spellings share one entry."""
+    return os.path.abspath(str(path))
+
+
+class CopyManifest:
+    """Thread-safe SQLite record of completed copies, keyed by absolute destination path."""
+
+    def __init__(self, db_path=MANIFEST_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+
+    def _pending(self) -> None:
+        """Count one uncommitted row and commit the batch when it is due (lock held)."""
+        self._uncommitted += 1
+        now = time.monotonic()
+        if self._uncommitted >= COMMIT_EVERY or now - self._committed_at >= COMMIT_INTERVAL:
+            self._conn.commit()
+            self._uncommitted = 0
+            self._committed_at = now
+
+    def _migrate(self) -> None:
+        """Add columns missing from manifests written by older versions."""
+        # Check and alter under the write lock; fan-out processes open the
+        # same manifest at the same time
+        self._conn.execute("BEGIN IMMEDIATE")
+        present = {row[1] for row in self._conn.execute("PRAGMA table_info(copies)")}
+        for name, sql_type in COPIES_MIGRATIONS:
+            if name not in present:
+                self._conn.execute(f"ALTER TABLE copies ADD COLUMN {name} {sql_type}")
+        self._conn.commit()
+
+    def isUpToDate(self, src, dst) -> bool:
+        """
+        Check whether dst is a complete, current copy of src.
+
+        The entry must exist for the same source, the source must still have
+        the recorded size and mtime, and dst must exist with the recorded size.
+        A destination without an entry, or with a different size (for example a
+        partially written file), is not up to date. A destination removed by
+        dedup in manifest mode is checked through its canonical file instead.
+
+        Args:
+            src: Source file path
+            dst: Destination file path
+
+        Returns:
+            True if the copy can be skipped
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT c.src, c.size, c.mtime_ns, d.canonical FROM copies c "
+                "LEFT JOIN duplicates d ON d.path = c.dst WHERE c.dst = ?", (_key(dst),)
+            ).fetchone()
+        if row is None or row[0] != _key(src):
+            return False
+        try:
+            src_stat = os.stat(src)
+            dst_size = os.stat(row[3] or dst).st_size
+        except OSError:
+            return False
+        return src_stat.st_size == row[1] and src_stat.st_mtime_ns == row[2] and dst_size == row[1]
+
+    def record(self, src, dst, mode: str = "copy", checksum: Optional[str] = None) -> None:
+        """
+        Record a completed copy of src to dst.
+
+        Args:
+            src: Source file path
+            dst: Destination file path
+            mode: Materialize mode that was used
+            checksum: Optional checksum of the destination
+        """
+        st = os.stat(src)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO copies (dst, src, size, mtime_ns, checksum, mode, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_key(dst), _key(src), st.st_size, st.st_mtime_ns, checksum, mode, time.time())
+            )
+            # A fresh copy replaces a duplicate removed by dedup
+            self._conn.execute("DELETE FROM duplicates WHERE path = ?", (_key(dst),))
+            self._pending()
+
+    def recordThroughput(self, mode: str, files: int, nbytes: int, seconds: float) -> None:
+        """
+        Store the measured throughput of one batch of copies.
+
+        Args:
+            mode: Materialize mode of the executor
+            files: Number of files copied
+            nbytes: Bytes copied
+            seconds: Wall time of the batch
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO throughput VALUES (?, ?, ?, ?, ?)",
+                (mode, files, nbytes, seconds, time.time())
+            )
+            self._conn.commit()
+
+    def throughput(self, mode: str) -> Optional[float]:
+        """
+        Average measured throughput of recent batches in a materialize mode.
+
+        Args:
+            mode: Materialize mode
+
+        Returns:
+            Bytes per second, or None if nothing has been measured yet
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT SUM(bytes), SUM(seconds) FROM (SELECT bytes, seconds FROM throughput "
+                "WHERE mode = ? ORDER BY recorded_at DESC LIMIT ?)", (mode, THROUGHPUT_WINDOW)
+            ).fetchone()
+        if not row or not row[0] or not row[1]:
+            return None
+        return row[0] / row[1]
+
+    def recordDuplicate(self, path, canonical, size: int, checksum: str) -> None:
+        """
+        Record that path was removed as a byte-identical duplicate of canonical.
+
+        Args:
+            path: Removed duplicate
+            canonical: File kept in its place
+            size: File size in bytes
+            checksum: Shared blake2b checksum
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO duplicates VALUES (?, ?, ?, ?, ?)",
+                (_key(path), _key(canonical), size, checksum, time.time())
+            )
+            self._pending()
+
+    def duplicates(self) -> List[Tuple[str, str]]:
+        """List the recorded (duplicate path, canonical path) pairs."""
+        with self._lock:
+            return self._conn.execute("SELECT path, canonical FROM duplicates ORDER BY path").fetchall()
+
+    def forgetDuplicate(self, path) -> None:
+        """Drop the duplicate entry for path (after it was restored)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM duplicates WHERE path = ?", (_key(path),))
+            self._pending()
+
+    def entries(self, prefixes: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        List recorded copies as (src, dst) pairs.
+
+        Destinations removed by dedup in manifest mode are left out; their
+        content lives on in the canonical file.
+
+        Args:
+            prefixes: Only return destinations below one of these directories
+
+        Returns:
+            List of (src, dst) pairs ordered by destination
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT src, dst FROM copies WHERE dst NOT IN (SELECT path FROM duplicates) ORDER BY dst"
+            ).fetchall()
+        if prefixes:
+            # Relative paths are resolved against the current directory
+            starts = tuple(os.path.join(os.path.abspath(str(p)), "") for p in prefixes)
+            rows = [row for row in rows if os.path.abspath(row[1]).startswith(starts)]
+        return rows
+
+    def loadHashes(self) -> Dict[str, Tuple[int, int, str]]:
+        """Cached checksums as {path: (size, mtime_ns, checksum)}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime_ns, checksum FROM hashes").fetchall()
+        return {path: (size, mtime_ns, checksum) for path, size, mtime_ns, checksum in rows}
+
+    def storeHashes(self, rows: List[Tuple[str, int, int, str]]) -> None:
+        """
+        Cache checksums of files.
+
+        Args:
+            rows: (path, size, mtime_ns, checksum) tuples; size and mtime are
+                the stat taken before hashing
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                [(path, size, mtime_ns, checksum, now) for path, size, mtime_ns, checksum in rows]
+            )
+            self._conn.commit()
+
+    def recordVerification(self, rows: List[Tuple[str, Optional[str], Optional[str], bool]]) -> None:
+        """
+        Store the outcome of verifying copies.
+
+        Args:
+            rows: (dst, source checksum, destination checksum, matched) tuples
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE copies SET src_checksum = ?, checksum = ?, verified = ?, verified_at = ? WHERE dst = ?",
+                [(src_sum, dst_sum, int(ok), now, dst) for dst, src_sum, dst_sum, ok in rows]
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Forget all recorded copies."""
+        with self._lock:
+            self._conn.execute("DELETE FROM copies")
+            self._conn.commit()
+            self._uncommitted = 0
+            self._committed_at = time.monotonic()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM copies").fetchone()[0]
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+            self._committed_at = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
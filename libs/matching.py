@@ -0,0 +1,26 @@
+"""
+Hash-join index of metadata rows for matching ADNI image files.
+Every file is parsed once and looked up by key, so joining N files against
+M rows is O(N+M); streaming.StreamMatcher does the file side.
+"""
+
+from typing import Dict, List
+import pandas as pd
+
+from .metadata import createMetaCombinedString
+
+
+def buildMetaIndex(meta_df: pd.DataFrame) -> Dict[str, List[int]]:
+    """
+    Map each metadata join key to the row positions carrying it.
+
+    Args:
+        meta_df: Metadata DataFrame with "Subject" and "Image Data ID" columns
+
+    Returns:
+        Dictionary of "subject-Iimage" key to list of row positions
+    """
+    index = {}
+    for pos, key in enumerate(createMetaCombinedString(meta_df)):
+        index.setdefault(key, []).append(pos)
+    return index
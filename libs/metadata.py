@@ -2,71 +2,305 @@
 Metadata utilities for handling and processing ADNI dataset metadata.
 """
 
+import hashlib
+import json
+import os
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
+
+from .config import (
+    BASELINE_VISIT_PATTERN,
+    CATEGORICAL_COLUMNS,
+    DEFAULT_META_FORMAT,
+    META_CACHE_INFO_SUFFIX,
+    META_CACHE_SUFFIX,
+    META_EXPORT_FORMATS,
+)
+from .metadata_query import MetadataIndex
+
+KEY_COLUMNS = ["Subject", "Image Data ID"]
+
+# Bump when the sidecar layout changes so old caches are rebuilt
+META_CACHE_VERSION = 2
+
+# LRU memo for createMetaCombinedString, keyed on the content of the key columns
+COMBINED_CACHE_SIZE = 32
+_COMBINED_CACHE = OrderedDict()
+
+
+def _frameHash(meta_df: pd.DataFrame) -> str:
+    """Hash the key columns of a metadata frame by content (vectorized)."""
+    hashed = pd.util.hash_pandas_object(meta_df[KEY_COLUMNS], index=False)
+    return hashlib.blake2b(hashed.to_numpy().tobytes(), digest_size=16).hexdigest()
+
+
+def _memoize(cache_key: tuple, keys: List[str]) -> None:
+    _COMBINED_CACHE[cache_key] = keys
+    if len(_COMBINED_CACHE) > COMBINED_CACHE_SIZE:
+        _COMBINED_CACHE.popitem(last=False)
 
 
 def createMetaCombinedString(meta_df: pd.DataFrame) -> List[str]:
     """
     Create combined metadata strings from dataframe for matching operations.
     
+    Rows are read by position, so filtered frames without a RangeIndex work too.
+    A leading "I" on the image ID is dropped so both "I41124" and "41124" give
+    the same key. Results are memoized on the content of the key columns, so
+    frames edited in place are recomputed and equal frames share an entry.
+    
     Args:
         meta_df: Pandas DataFrame containing metadata
         
     Returns:
         List of combined ID strings (format: "subject_id-Iimage_id")
     """
-    meta_combined = []
-    for i in range(len(meta_df)):
-        subject_id = meta_df.loc[i, "Subject"]
-        image_id = meta_df.loc[i, "Image Data ID"]
-        combined = f"{subject_id}-I{image_id}"
-        meta_combined.append(combined)
-    return meta_combined
+    cache_key = (len(meta_df), _frameHash(meta_df))
+    cached = _COMBINED_CACHE.get(cache_key)
+    if cached is not None:
+        _COMBINED_CACHE.move_to_end(cache_key)
+        return list(cached)
+    
+    subject_id = meta_df["Subject"].astype(str).str.strip()
+    image_id = meta_df["Image Data ID"].astype(str).str.strip().str.replace(r"^[Ii]", "", regex=True)
+    meta_combined = (subject_id + "-I" + image_id).tolist()
+    
+    _memoize(cache_key, meta_combined)
+    return list(meta_combined)
+
+
+def clearMetaCombinedCache() -> None:
+    """Drop all memoized createMetaCombinedString results."""
+    _COMBINED_CACHE.clear()
+
+
+# Column holding the prebuilt combined keys in the sidecar frame
+CACHE_KEY_COLUMN = "__combined_key__"
+
+
+def _cachePaths(csv_path: Path) -> Tuple[Path, Path]:
+    """(frame, info) paths of a metadata file's sidecar cache."""
+    return (csv_path.with_name(csv_path.name + META_CACHE_SUFFIX),
+            csv_path.with_name(csv_path.name + META_CACHE_INFO_SUFFIX))
+
+
+def _readCache(csv_path: Path, stat: os.stat_result) -> Optional[Tuple[pd.DataFrame, Optional[List[str]]]]:
+    """Cached (frame, combined keys) of csv_path, or None if missing, stale or unreadable."""
+    frame_path, info_path = _cachePaths(csv_path)
+    try:
+        with open(info_path) as f:
+            info = json.load(f)
+        if (
+            not isinstance(info, dict)
+            or info.get("version") != META_CACHE_VERSION
+            or info.get("mtime_ns") != stat.st_mtime_ns
+            or info.get("size") != stat.st_size
+            or info.get("frame_size") != frame_path.stat().st_size
+        ):
+            return None
+        meta_df = pd.read_parquet(frame_path)
+    except Exception:
+        # Any unreadable cache (missing pyarrow, other pandas version, ...) is rebuilt
+        return None
+    keys = None
+    if CACHE_KEY_COLUMN in meta_df.columns:
+        keys = meta_df[CACHE_KEY_COLUMN].tolist()
+        meta_df = meta_df.drop(columns=CACHE_KEY_COLUMN)
+    return meta_df, keys
+
+
+def _writeCache(csv_path: Path, stat: os.stat_result, meta_df: pd.DataFrame, keys: Optional[List[str]]) -> None:
+    frame_path, info_path = _cachePaths(csv_path)
+    frame_tmp = frame_path.with_name(frame_path.name + ".tmp")
+    info_tmp = info_path.with_name(info_path.name + ".tmp")
+    frame = meta_df if keys is None else meta_df.assign(**{CACHE_KEY_COLUMN: keys})
+    try:
+        frame.to_parquet(frame_tmp, index=False)
+        os.replace(frame_tmp, frame_path)
+        with open(info_tmp, "w") as f:
+            json.dump({
+                "version": META_CACHE_VERSION,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "frame_size": frame_path.stat().st_size,
+            }, f)
+        os.replace(info_tmp, info_path)
+    except ImportError:
+        # Without pyarrow there is no cache; loads parse the file every time
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Could not write metadata cache {frame_path}: {e}")
+    finally:
+        for tmp in (frame_tmp, info_tmp):
+            if tmp.exists():
+                tmp.unlink()
+
+
+def _readFrame(path: Path) -> pd.DataFrame:
+    """Read a metadata file by its extension, dropping the index column older exports wrote."""
+    if path.suffix == ".parquet":
+        meta_df = pd.read_parquet(path)
+    elif path.suffix == ".feather":
+        meta_df = pd.read_feather(path)
+    else:
+        meta_df = pd.read_csv(path)
+    if "Unnamed: 0" in meta_df.columns:
+        meta_df = meta_df.drop(columns="Unnamed: 0")
+    return meta_df
+
+
+def loadMetadata(csv_path: str, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load a metadata file through a typed binary sidecar cache.
+    
+    The file is read according to its extension (.csv, .parquet or .feather).
+    The first load parses it, converts Group/Sex/Visit/Modality to
+    categoricals and stores the frame with its prebuilt combined keys as
+    "{file}.cache.parquet", validated by "{file}.cache.json". Later loads
+    read the sidecar as long as the file's mtime and size are unchanged.
+    Without pyarrow no sidecar is written.
+    
+    Args:
+        csv_path: Path to the metadata file
+        use_cache: Read and write the sidecar cache
+        
+    Returns:
+        Metadata DataFrame
+    """
+    csv_path = Path(csv_path)
+    stat = csv_path.stat()
+    
+    cached = _readCache(csv_path, stat) if use_cache else None
+    if cached is None:
+        meta_df = _readFrame(csv_path)
+        for col in CATEGORICAL_COLUMNS:
+            if col in meta_df.columns:
+                meta_df[col] = meta_df[col].astype("category")
+        keys = createMetaCombinedString(meta_df) if set(KEY_COLUMNS) <= set(meta_df.columns) else None
+        if use_cache:
+            _writeCache(csv_path, stat, meta_df, keys)
+        return meta_df
+    
+    meta_df, keys = cached
+    if keys is not None:
+        _memoize((len(meta_df), _frameHash(meta_df)), keys)
+    return meta_df
 
 
-def exportCSV(meta_dict: Dict, title: str, output_dir: str = "./TempMeta/") -> pd.DataFrame:
+def exportCSV(
+    meta_dict: Union[Dict, pd.DataFrame],
+    title: str,
+    output_dir: str = "./TempMeta/",
+    fmt: str = DEFAULT_META_FORMAT
+) -> pd.DataFrame:
     """
-    Export metadata dictionary to CSV file.
+    Export metadata to a CSV, Parquet or Feather file.
+    
+    A DataFrame is written as is, without its index. Parquet and Feather keep
+    the column dtypes; when pyarrow is missing they fall back to CSV with a
+    warning. Copies of the same title in the other formats are removed so
+    findMetadata never picks up a stale one.
     
     Args:
-        meta_dict: Dictionary containing metadata
-        title: Title for the CSV file (will be saved as TempMeta/{title}.csv)
+        meta_dict: Metadata DataFrame, or dictionary of column lists
+        title: Title for the file (saved as {output_dir}/{title}.{fmt})
         output_dir: Output directory path
+        fmt: One of META_EXPORT_FORMATS
         
     Returns:
         Pandas DataFrame that was saved
     """
+    if fmt not in META_EXPORT_FORMATS:
+        raise ValueError(f"Unknown metadata format {fmt!r}, expected one of {list(META_EXPORT_FORMATS)}")
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    temp_meta_df = pd.DataFrame(meta_dict)
-    csv_file = output_path / f"{title}.csv"
+    temp_meta_df = meta_dict if isinstance(meta_dict, pd.DataFrame) else pd.DataFrame(meta_dict)
+    out_file = output_path / f"{title}{META_EXPORT_FORMATS[fmt]}"
+    
+    try:
+        if fmt == "parquet":
+            temp_meta_df.to_parquet(out_file, index=False)
+        elif fmt == "feather":
+            temp_meta_df.reset_index(drop=True).to_feather(out_file)
+    except ImportError:
+        fmt = "csv"
+        out_file = output_path / f"{title}.csv"
+        print(f"Warning: pyarrow is not installed (pip install -r requirements.txt); "
+              f"exporting {out_file} as CSV, column dtypes are not kept")
+    if fmt == "csv":
+        temp_meta_df.to_csv(out_file, index=False)
     
-    with open(csv_file, mode='w') as f:
-        temp_meta_df.to_csv(f)
+    for ext in META_EXPORT_FORMATS.values():
+        stale = output_path / f"{title}{ext}"
+        if stale != out_file and stale.exists():
+            stale.unlink()
     
-    print(f"Metadata exported to: {csv_file}")
+    print(f"Metadata exported to: {out_file}")
     return temp_meta_df
 
 
-def filterMetadata(meta_df: pd.DataFrame, **filters) -> pd.DataFrame:
+def findMetadata(directory, title: str) -> Optional[Path]:
+    """
+    Find a metadata file exported by exportCSV in any format.
+    
+    Args:
+        directory: Directory searched
+        title: Title passed to exportCSV
+        
+    Returns:
+        Path of the newest {title}.csv/.parquet/.feather, or None
+    """
+    found = [Path(directory) / f"{title}{ext}" for ext in META_EXPORT_FORMATS.values()]
+    found = [p for p in found if p.exists()]
+    return max(found, key=lambda p: p.stat().st_mtime_ns) if found else None
+
+
+def filterMetadata(meta_df: pd.DataFrame, criteria: Optional[Dict] = None, **filters) -> pd.DataFrame:
     """
     Filter metadata based on specified criteria.
     
+    Thin wrapper around MetadataIndex (see metadata_query.py): values may be
+    a single value, a list/set of values, or between(low, high) for ranges
+    such as Age or Acq Date. Keep a MetadataIndex around instead when
+    running many queries on the same frame.
+    
     Args:
         meta_df: Input metadata DataFrame
-        **filters: Column name and value pairs for filtering
+        criteria: Column to criterion mapping (for names with spaces)
+        **filters: Column name and criterion pairs for filtering
         
     Returns:
         Filtered DataFrame
     """
-    result = meta_df.copy()
-    for col, value in filters.items():
-        if col in result.columns:
-            result = result[result[col] == value]
-    return result
+    return MetadataIndex(meta_df).select(criteria, **filters).frame()
+
+
+def baselineMask(meta_df: pd.DataFrame, pattern: str = BASELINE_VISIT_PATTERN) -> pd.Series:
+    """
+    Flag the metadata rows whose Visit is a baseline visit.
+    
+    For a categorical Visit column the pattern is only evaluated once per
+    category.
+    
+    Args:
+        meta_df: Metadata DataFrame with a "Visit" column
+        pattern: Case-insensitive regex matched against the visit label
+        
+    Returns:
+        Boolean Series aligned with meta_df
+    """
+    visit = meta_df["Visit"]
+    if isinstance(visit.dtype, pd.CategoricalDtype):
+        labels = visit.cat.categories.astype(str).str.strip()
+        hits = np.asarray(labels.str.contains(pattern, case=False, regex=True), dtype=bool)
+        codes = visit.cat.codes.to_numpy()
+        return pd.Series((codes >= 0) & hits[codes], index=meta_df.index)
+    labels = visit.astype(str).str.strip()
+    return labels.str.contains(pattern, case=False, regex=True) & visit.notna()
 
 
 def mergeMetadata(meta_list: List[pd.DataFrame]) -> pd.DataFrame:
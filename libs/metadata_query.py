@@ -0,0 +1,167 @@
+"""
+Indexed queries over metadata frames.
+Each queried column is indexed once: discrete columns as integer codes with
+cached per-value bitmaps, range columns (Age, Acq Date) as a sorted order
+searched with searchsorted. Criteria are combined by intersecting boolean
+bitmaps, and results stay as row positions until materialized.
+"""
+
+from typing import Dict, Hashable, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .metadata_store import parseDates
+
+
+class Range(NamedTuple):
+    """Inclusive range criterion; None leaves a side open."""
+
+    low: object = None
+    high: object = None
+
+
+def between(low=None, high=None) -> Range:
+    """Criterion matching values from low to high, both inclusive."""
+    return Range(low, high)
+
+
+class Selection:
+    """Row positions of a query; the frame is only copied by frame()."""
+
+    def __init__(self, meta_df: pd.DataFrame, mask: np.ndarray):
+        self._meta_df = meta_df
+        self.mask = mask
+        self._positions: Optional[np.ndarray] = None
+
+    @property
+    def positions(self) -> np.ndarray:
+        """Matching row positions in ascending order."""
+        if self._positions is None:
+            self._positions = np.flatnonzero(self.mask)
+        return self._positions
+
+    def __len__(self) -> int:
+        return int(self.mask.sum()) if self._positions is None else len(self._positions)
+
+    def frame(self) -> pd.DataFrame:
+        """Materialize the matching rows (original index labels are kept)."""
+        return self._meta_df.iloc[self.positions]
+
+
+class MetadataIndex:
+    """
+    Query index over one metadata frame.
+
+    Columns are indexed on first use, so building the index costs nothing
+    up front and repeated queries reuse the work. The frame must not be
+    modified while the index is in use.
+    """
+
+    def __init__(self, meta_df: pd.DataFrame):
+        self.meta_df = meta_df
+        self.rows = len(meta_df)
+        self._codes: Dict[str, Tuple[np.ndarray, Dict[Hashable, int]]] = {}
+        self._bitmaps: Dict[Tuple[str, int], np.ndarray] = {}
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _categories(self, col: str) -> Tuple[np.ndarray, Dict[Hashable, int]]:
+        """Integer codes of a column and the code of each distinct value (-1 = missing)."""
+        if col not in self._codes:
+            series = self.meta_df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy()
+                values = series.cat.categories
+            else:
+                codes, values = pd.factorize(series)
+            self._codes[col] = (codes, {value: code for code, value in enumerate(values)})
+        return self._codes[col]
+
+    def _bitmap(self, col: str, code: int) -> np.ndarray:
+        key = (col, code)
+        if key not in self._bitmaps:
+            self._bitmaps[key] = self._categories(col)[0] == code
+        return self._bitmaps[key]
+
+    def _rangeKeys(self, col: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Sort order of a column's non-missing values and the sorted values."""
+        if col not in self._sorted:
+            series = self.meta_df[col]
+            if not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series)):
+                # Text column: numbers if every distinct value is one, else dates
+                uniques = pd.Series(pd.unique(series.dropna()), dtype=object)
+                if pd.to_numeric(uniques, errors="coerce").notna().all():
+                    series = pd.to_numeric(series, errors="coerce")
+                else:
+                    series = parseDates(series)
+            values = series.to_numpy()
+            valid = np.flatnonzero(series.notna().to_numpy())
+            order = valid[np.argsort(values[valid], kind="stable")]
+            self._sorted[col] = (order, values[order])
+        return self._sorted[col]
+
+    def equal(self, col: str, value) -> np.ndarray:
+        """Bitmap of rows where col == value."""
+        code = self._categories(col)[1].get(value)
+        if code is None:
+            return np.zeros(self.rows, dtype=bool)
+        return self._bitmap(col, code)
+
+    def isin(self, col: str, values) -> np.ndarray:
+        """Bitmap of rows whose col is one of values."""
+        codes, lookup = self._categories(col)
+        wanted = [lookup[v] for v in values if v in lookup]
+        if len(wanted) == 1:
+            return self._bitmap(col, wanted[0])
+        # Lookup table over codes; the extra last slot catches missing (-1)
+        table = np.zeros(len(lookup) + 1, dtype=bool)
+        table[wanted] = True
+        return table[codes]
+
+    def range(self, col: str, low=None, high=None) -> np.ndarray:
+        """Bitmap of rows with low <= col <= high; missing values never match."""
+        order, values = self._rangeKeys(col)
+        if np.issubdtype(values.dtype, np.datetime64):
+            low = None if low is None else np.datetime64(pd.Timestamp(low))
+            high = None if high is None else np.datetime64(pd.Timestamp(high))
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        stop = len(values) if high is None else np.searchsorted(values, high, side="right")
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[order[start:stop]] = True
+        return mask
+
+    def criterion(self, col: str, value) -> np.ndarray:
+        """
+        Bitmap for one criterion.
+
+        A Range (see between) or slice selects an inclusive range; a list,
+        set, tuple, array or Series selects membership; anything else
+        selects equality.
+        """
+        if isinstance(value, Range):
+            return self.range(col, value.low, value.high)
+        if isinstance(value, slice):
+            return self.range(col, value.start, value.stop)
+        if isinstance(value, (list, set, frozenset, tuple, np.ndarray, pd.Series, pd.Index)):
+            return self.isin(col, value)
+        return self.equal(col, value)
+
+    def select(self, criteria: Optional[Dict] = None, **filters) -> Selection:
+        """
+        Rows matching every criterion.
+
+        Columns with spaces (e.g. "Acq Date") go in criteria; the rest can
+        also be given as keywords. Criteria on columns the frame lacks are
+        ignored.
+
+        Args:
+            criteria: Column to criterion mapping
+            **filters: More criteria by column name
+
+        Returns:
+            Selection of the matching rows
+        """
+        mask = np.ones(self.rows, dtype=bool)
+        for col, value in {**(criteria or {}), **filters}.items():
+            if col in self.meta_df.columns:
+                mask &= self.criterion(col, value)
+        return Selection(self.meta_df, mask)
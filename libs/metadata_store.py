@@ -0,0 +1,193 @@
+"""
+Unified typed metadata store.
+Loads every Balanced_Meta_{seq}w_{cond}.csv (and optionally the full ADNI
+export) once into a single frame with compact dtypes, persists it as
+Parquet and serves per sequence/condition views from memory.
+"""
+
+import pickle
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .config import ACQ_DATE_FORMAT, METADATA_STORE, STORE_CATEGORICAL_COLUMNS, TEMP_META_DIR
+
+BALANCED_META_PATTERN = re.compile(r"^Balanced_Meta_(?P<seq>[^_]+)w_(?P<cond>[^_.]+)\.csv$")
+
+# Source label of rows from the full ADNI export
+EXPORT_SOURCE = "export"
+
+
+class MemoryReport(NamedTuple):
+    """Deep memory use of the loaded metadata before and after typing."""
+
+    rows: int
+    raw_bytes: int
+    typed_bytes: int
+
+    def summary(self) -> str:
+        saved = 1 - self.typed_bytes / self.raw_bytes if self.raw_bytes else 0.0
+        return (f"{self.rows} metadata rows: {self.raw_bytes / 1e6:.2f} MB as loaded -> "
+                f"{self.typed_bytes / 1e6:.2f} MB typed ({saved:.0%} smaller)")
+
+
+def parseDates(values: pd.Series) -> pd.Series:
+    """
+    Parse dates in ACQ_DATE_FORMAT, falling back to format inference for the rest.
+
+    Each distinct string is parsed once; scan dates repeat a lot.
+    """
+    codes, uniques = pd.factorize(values)
+    unique = pd.Series(uniques, dtype=object)
+    parsed = pd.to_datetime(unique, format=ACQ_DATE_FORMAT, errors="coerce")
+    retry = parsed.isna() & unique.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(unique[retry], format="mixed", errors="coerce")
+    result = parsed.to_numpy()[codes]
+    result[codes < 0] = np.datetime64("NaT")
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def typeMetadata(meta_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert metadata columns to compact dtypes.
+
+    STORE_CATEGORICAL_COLUMNS become categoricals, Age a nullable integer
+    (rounded) and Acq Date a datetime. Values that do not parse become
+    missing.
+
+    Args:
+        meta_df: Metadata DataFrame as read from CSV
+
+    Returns:
+        Typed copy of meta_df
+    """
+    typed = meta_df.copy()
+    for col in STORE_CATEGORICAL_COLUMNS:
+        if col in typed.columns:
+            typed[col] = typed[col].astype("category")
+    if "Age" in typed.columns:
+        typed["Age"] = pd.to_numeric(typed["Age"], errors="coerce").round().astype("Int16")
+    if "Acq Date" in typed.columns:
+        typed["Acq Date"] = parseDates(typed["Acq Date"])
+    return typed
+
+
+def _sourceFiles(meta_dir, export=None) -> List[Tuple[Path, str, Optional[str], Optional[str]]]:
+    """(path, source, seq, cond) of every CSV that goes into the store."""
+    files = []
+    for path in sorted(Path(meta_dir).glob("Balanced_Meta_*.csv")):
+        m = BALANCED_META_PATTERN.match(path.name)
+        if m:
+            files.append((path, path.stem, m["seq"], m["cond"]))
+    if export is not None:
+        files.append((Path(export), EXPORT_SOURCE, None, None))
+    return files
+
+
+class MetadataStore:
+    """All metadata in one typed frame, with views by sequence and condition."""
+
+    def __init__(self, frame: pd.DataFrame, report: Optional[MemoryReport] = None):
+        self.frame = frame
+        self.report = report
+        self._columns: Dict[str, List[str]] = frame.attrs.get("columns", {})
+        self._positions = {
+            key: positions
+            for key, positions in frame.groupby("source", observed=True, sort=False).indices.items()
+        }
+
+    @classmethod
+    def build(cls, meta_dir=TEMP_META_DIR, export=None) -> "MetadataStore":
+        """
+        Read and type every Balanced_Meta CSV in meta_dir.
+
+        Args:
+            meta_dir: Directory of the Balanced_Meta_{seq}w_{cond}.csv files
+            export: Optional path of the full ADNI metadata export
+
+        Returns:
+            MetadataStore with a MemoryReport of the typing
+        """
+        frames = []
+        columns = {}
+        for path, source, seq, cond in _sourceFiles(meta_dir, export):
+            df = pd.read_csv(path, dtype=object)
+            df = df.drop(columns=[c for c in df.columns if c.startswith("Unnamed: ")])
+            columns[source] = list(df.columns)
+            df["seq"] = seq
+            df["cond"] = cond
+            df["source"] = source
+            frames.append(df)
+        if not frames:
+            raise FileNotFoundError(f"No Balanced_Meta CSVs found in {meta_dir}")
+        raw = pd.concat(frames, ignore_index=True)
+        raw_bytes = int(raw.memory_usage(deep=True).sum())
+        frame = typeMetadata(raw)
+        frame.attrs["columns"] = columns
+        report = MemoryReport(len(frame), raw_bytes, int(frame.memory_usage(deep=True).sum()))
+        return cls(frame, report)
+
+    @classmethod
+    def load(cls, path=METADATA_STORE) -> "MetadataStore":
+        """Load a store written by save(), from Parquet or its pickle fallback."""
+        path = Path(path)
+        if path.suffix == ".parquet" and path.exists():
+            return cls(pd.read_parquet(path))
+        with open(path.with_suffix(".pkl"), "rb") as f:
+            return cls(pickle.load(f))
+
+    def save(self, path=METADATA_STORE) -> Path:
+        """
+        Persist the store as Parquet, or as a pickle when pyarrow is missing.
+
+        Returns:
+            Path that was written
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.frame.to_parquet(path, index=False)
+            stale = path.with_suffix(".pkl")
+        except ImportError:
+            stale, path = path, path.with_suffix(".pkl")
+            print(f"Warning: pyarrow is not installed (pip install -r requirements.txt); "
+                  f"saving the metadata store as {path} instead of Parquet")
+            with open(path, "wb") as f:
+                pickle.dump(self.frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if stale.exists():
+            stale.unlink()
+        return path
+
+    @property
+    def combinations(self) -> List[Tuple[str, str]]:
+        """(seq, cond) pairs present in the store."""
+        pairs = self.frame[["seq", "cond"]].dropna().drop_duplicates()
+        return sorted((str(s), str(c)) for s, c in pairs.itertuples(index=False))
+
+    def _rows(self, source: str) -> pd.DataFrame:
+        if source not in self._positions:
+            raise KeyError(f"No metadata for {source} in the store")
+        rows = self.frame.iloc[self._positions[source]]
+        columns = self._columns.get(source) or [c for c in rows.columns if c not in ("seq", "cond", "source")]
+        return rows[columns].reset_index(drop=True)
+
+    def view(self, seq: str, cond: str) -> pd.DataFrame:
+        """
+        Rows of Balanced_Meta_{seq}w_{cond}.csv in file order, with its columns.
+
+        Row positions match the CSV, so the view can stand in for
+        loadMetadata(csv) in the move functions.
+        """
+        return self._rows(f"Balanced_Meta_{seq}w_{cond}")
+
+    def export(self) -> pd.DataFrame:
+        """Rows of the full ADNI export, if one was loaded."""
+        return self._rows(EXPORT_SOURCE)
+
+    def memoryUsage(self) -> int:
+        """Deep memory use of the typed frame in bytes."""
+        return int(self.frame.memory_usage(deep=True).sum())
+
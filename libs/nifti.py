@@ -0,0 +1,415 @@
+"""
+Header-only NIfTI-1 inspection.
+Reads the 348-byte header of .nii and .nii.gz files (decompressing only the
+first few KB of gzipped volumes), scans whole stage directories in a thread
+pool and flags volumes whose geometry differs from the rest.
+"""
+
+import gzip
+import os
+import re
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .config import DEFAULT_HEADER_WORKERS, NIFTI_ANY_PATTERN
+from .inventory import walkFiles
+from .parsing import parseFilenames
+
+NIFTI_HEADER_SIZE = 348
+
+# NIfTI-1 datatype codes and the numpy dtypes they map to
+NIFTI_DTYPES = {
+    2: "uint8",
+    4: "int16",
+    8: "int32",
+    16: "float32",
+    32: "complex64",
+    64: "float64",
+    256: "int8",
+    512: "uint16",
+    768: "uint32",
+    1024: "int64",
+    1280: "uint64",
+}
+
+HEADER_COLUMNS = [
+    "path", "ndim", "shape", "datatype", "dtype", "bitpix", "voxel_size", "vox_offset",
+    "scl_slope", "scl_inter", "qform_code", "sform_code", "affine", "magic", "endian", "error",
+]
+
+FLAG_COLUMNS = ["bad_shape", "bad_voxel_size", "bad_datatype", "bad_offset", "bad_affine"]
+
+# Compressed bytes read per attempt when looking for the header of a .nii.gz
+GZIP_PROBE = 4096
+
+
+def _readRaw(path: str) -> bytes:
+    """Return the first NIFTI_HEADER_SIZE bytes of a volume, gunzipping as little as possible."""
+    with open(path, "rb") as f:
+        if not path.endswith(".gz"):
+            return f.read(NIFTI_HEADER_SIZE)
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        out = b""
+        while len(out) < NIFTI_HEADER_SIZE:
+            chunk = d.unconsumed_tail or f.read(GZIP_PROBE)
+            if not chunk:
+                break
+            out += d.decompress(chunk, NIFTI_HEADER_SIZE - len(out))
+        return out
+
+
+def _qformAffine(quatern, offset, pixdim) -> np.ndarray:
+    b, c, d = quatern
+    a = np.sqrt(max(0.0, 1.0 - (b * b + c * c + d * d)))
+    rotation = np.array([
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - b * b - c * c],
+    ])
+    qfac = -1.0 if pixdim[0] < 0 else 1.0
+    affine = np.eye(4)
+    affine[:3, :3] = rotation * np.array([pixdim[1], pixdim[2], pixdim[3] * qfac])
+    affine[:3, 3] = offset
+    return affine
+
+
+def parseNiftiHeader(raw: bytes) -> Dict:
+    """
+    Decode a NIfTI-1 header.
+
+    Args:
+        raw: The first 348 bytes of the volume
+
+    Returns:
+        Dict with the HEADER_COLUMNS fields except path and error
+
+    Raises:
+        ValueError: If raw is not a NIfTI-1 header
+    """
+    if len(raw) < NIFTI_HEADER_SIZE:
+        raise ValueError("file is shorter than a NIfTI-1 header")
+    if struct.unpack_from("<i", raw, 0)[0] == NIFTI_HEADER_SIZE:
+        e = "<"
+    elif struct.unpack_from(">i", raw, 0)[0] == NIFTI_HEADER_SIZE:
+        e = ">"
+    else:
+        raise ValueError("not a NIfTI-1 header")
+
+    dim = struct.unpack_from(e + "8h", raw, 40)
+    datatype, bitpix = struct.unpack_from(e + "2h", raw, 70)
+    pixdim = struct.unpack_from(e + "8f", raw, 76)
+    vox_offset, scl_slope, scl_inter = struct.unpack_from(e + "3f", raw, 108)
+    qform_code, sform_code = struct.unpack_from(e + "2h", raw, 252)
+    quatern = struct.unpack_from(e + "3f", raw, 256)
+    qoffset = struct.unpack_from(e + "3f", raw, 268)
+    srow = struct.unpack_from(e + "12f", raw, 280)
+    magic = raw[344:348].rstrip(b"\x00").decode("ascii", errors="replace")
+
+    ndim = dim[0]
+    if not 1 <= ndim <= 7:
+        raise ValueError(f"invalid dim[0] = {ndim}")
+
+    if sform_code > 0:
+        affine = np.eye(4)
+        affine[:3, :] = np.array(srow).reshape(3, 4)
+    elif qform_code > 0:
+        affine = _qformAffine(quatern, qoffset, pixdim)
+    else:
+        affine = np.diag([pixdim[1], pixdim[2], pixdim[3], 1.0])
+
+    return {
+        "ndim": ndim,
+        "shape": tuple(int(n) for n in dim[1:1 + ndim]),
+        "datatype": datatype,
+        "dtype": NIFTI_DTYPES.get(datatype),
+        "bitpix": bitpix,
+        "voxel_size": tuple(round(float(v), 6) for v in pixdim[1:1 + min(ndim, 3)]),
+        "vox_offset": float(vox_offset),
+        "scl_slope": float(scl_slope),
+        "scl_inter": float(scl_inter),
+        "qform_code": qform_code,
+        "sform_code": sform_code,
+        "affine": affine,
+        "magic": magic,
+        "endian": e,
+    }
+
+
+def readNiftiHeader(path) -> Dict:
+    """
+    Read the header of one .nii or .nii.gz volume.
+
+    Args:
+        path: Volume path
+
+    Returns:
+        Header dict (see parseNiftiHeader) with "path" and "error" added;
+        unreadable files carry only path and error
+    """
+    path = str(path)
+    try:
+        header = parseNiftiHeader(_readRaw(path))
+    except (OSError, ValueError, zlib.error, struct.error) as e:
+        return {"path": path, "error": str(e)}
+    header["path"] = path
+    header["error"] = None
+    return header
+
+
+def readNiftiHeaders(files: Iterable, workers: int = DEFAULT_HEADER_WORKERS) -> pd.DataFrame:
+    """
+    Read many headers in a thread pool.
+
+    Args:
+        files: Volume paths
+        workers: Reader threads
+
+    Returns:
+        DataFrame with HEADER_COLUMNS, in input order
+    """
+    paths = [str(f) for f in files]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="nifti") as pool:
+        rows = list(pool.map(readNiftiHeader, paths, chunksize=256))
+    return pd.DataFrame(rows, columns=HEADER_COLUMNS)
+
+
+def niftiHeaderBytes(
+    shape: Tuple[int, ...],
+    dtype,
+    affine: np.ndarray,
+    xyzt_units: int = 2
+) -> bytes:
+    """
+    Build a little-endian single-file NIfTI-1 header with an empty extension block.
+
+    The affine is stored as sform (code 1, scanner coordinates); voxel sizes
+    are taken from the lengths of its columns. Data starts right after the
+    returned bytes, at vox_offset 352.
+
+    Args:
+        shape: Data shape, up to 7 dimensions
+        dtype: Numpy dtype of the data (must be in NIFTI_DTYPES)
+        affine: 4x4 voxel-to-world matrix
+        xyzt_units: Unit code (2 = millimetres)
+
+    Returns:
+        352 bytes: the header plus the 4-byte extension flag
+    """
+    codes = {name: code for code, name in NIFTI_DTYPES.items()}
+    dtype = np.dtype(dtype)
+    if dtype.name not in codes:
+        raise ValueError(f"dtype {dtype} cannot be stored in NIfTI-1")
+    affine = np.asarray(affine, dtype=float)
+    voxel = np.sqrt((affine[:3, :3] ** 2).sum(axis=0))
+    raw = bytearray(NIFTI_HEADER_SIZE + 4)
+    struct.pack_into("<i", raw, 0, NIFTI_HEADER_SIZE)
+    struct.pack_into("<8h", raw, 40, len(shape), *shape, *[1] * (7 - len(shape)))
+    struct.pack_into("<2h", raw, 70, codes[dtype.name], dtype.itemsize * 8)
+    struct.pack_into("<8f", raw, 76, 1.0, *voxel, *[1.0] * 4)
+    struct.pack_into("<3f", raw, 108, NIFTI_HEADER_SIZE + 4, 1.0, 0.0)
+    raw[123] = xyzt_units
+    struct.pack_into("<2h", raw, 252, 0, 1)
+    struct.pack_into("<12f", raw, 280, *affine[:3, :].ravel())
+    raw[344:348] = b"n+1\x00"
+    return bytes(raw)
+
+
+def niftiDtype(header: Dict) -> np.dtype:
+    """
+    Numpy dtype of the voxel data, in the byte order of the file.
+
+    Raises:
+        ValueError: If the datatype code has no numpy equivalent
+    """
+    name = NIFTI_DTYPES.get(header["datatype"])
+    if name is None:
+        raise ValueError(f"unsupported NIfTI datatype {header['datatype']}")
+    return np.dtype(name).newbyteorder(header["endian"])
+
+
+def scaleVoxels(data: np.ndarray, slope: float, inter: float, dtype=np.float32) -> np.ndarray:
+    """
+    Voxel values as dtype with scl_slope/scl_inter applied.
+
+    A slope of 0 (or missing) means the values are stored unscaled, as the
+    NIfTI-1 standard specifies.
+
+    Args:
+        data: Stored voxel values (e.g. from loadVolume)
+        slope: scl_slope from the header
+        inter: scl_inter from the header
+        dtype: Output dtype
+
+    Returns:
+        In-memory array of the scaled values
+    """
+    slope = 0.0 if slope is None or not np.isfinite(slope) else float(slope)
+    inter = 0.0 if inter is None or not np.isfinite(inter) else float(inter)
+    out = np.asarray(data, dtype=dtype)
+    if slope not in (0.0, 1.0) or inter != 0.0:
+        out = (out * dtype(slope or 1.0) + dtype(inter)).astype(dtype, copy=False)
+    return out
+
+
+def loadVolume(path, header: Optional[Dict] = None) -> np.ndarray:
+    """
+    Voxel data of one volume as an array indexed [x, y, z, ...].
+
+    Uncompressed files are memory-mapped from vox_offset, so nothing is read
+    until the array is accessed; .nii.gz files are decompressed into memory.
+    Values are returned as stored, without scl_slope/scl_inter applied.
+
+    Args:
+        path: Volume path
+        header: Header from readNiftiHeader (read when omitted)
+
+    Returns:
+        Array of the header's shape (a read-only memmap for .nii)
+
+    Raises:
+        ValueError: If the header cannot be read or the data is truncated
+    """
+    path = str(path)
+    header = header or readNiftiHeader(path)
+    if isinstance(header.get("error"), str):
+        raise ValueError(header["error"])
+    dtype = niftiDtype(header)
+    shape = header["shape"]
+    offset = int(header["vox_offset"])
+    if not path.endswith(".gz"):
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape, order="F")
+    with gzip.open(path, "rb") as f:
+        raw = f.read()
+    count = int(np.prod(shape))
+    if len(raw) < offset + count * dtype.itemsize:
+        raise ValueError(f"{path} is truncated")
+    return np.frombuffer(raw, dtype=dtype, count=count, offset=offset).reshape(shape, order="F")
+
+
+def _modal(values: pd.Series):
+    """Most common value of a column holding tuples or scalars."""
+    values = values.dropna()
+    keys = values.map(repr)
+    if keys.empty:
+        return None
+    return values[keys == keys.value_counts().index[0]].iloc[0]
+
+
+def flagOutliers(
+    headers: pd.DataFrame,
+    by: Optional[List[str]] = None,
+    voxel_tolerance: float = 0.01,
+    affine_tolerance: float = 0.05
+) -> pd.DataFrame:
+    """
+    Flag volumes whose geometry differs from the majority.
+
+    Each volume is compared with the most common shape, voxel size, datatype
+    and affine of its group. A volume is flagged when its shape or datatype
+    differ, its voxel size differs by more than voxel_tolerance (relative),
+    its vox_offset lies inside the header, or its affine is not finite,
+    singular, or has a different orientation or a scale that differs by more
+    than affine_tolerance (relative).
+
+    Args:
+        headers: DataFrame from readNiftiHeaders
+        by: Columns to group by before comparing (e.g. ["seq", "cond"])
+        voxel_tolerance: Allowed relative voxel size deviation
+        affine_tolerance: Allowed relative deviation of the affine's scale
+
+    Returns:
+        Copy of headers with FLAG_COLUMNS and an "outlier" column added
+    """
+    out = headers.copy()
+    for col in FLAG_COLUMNS:
+        out[col] = False
+    readable = out["error"].isna()
+    groups = out[readable].groupby(by, sort=False).groups.values() if by else [out.index[readable]]
+
+    for index in groups:
+        if len(index) == 0:
+            continue
+        group = out.loc[index]
+        shape = _modal(group["shape"])
+        voxel = np.array(_modal(group["voxel_size"]) or (), dtype=float)
+        datatype = _modal(group["datatype"])
+        affines = np.stack(group["affine"].to_numpy())
+        ref = np.median(affines, axis=0)
+        ref_det = np.linalg.det(ref[:3, :3])
+
+        out.loc[index, "bad_shape"] = group["shape"].map(lambda s: s != shape)
+        out.loc[index, "bad_datatype"] = group["datatype"] != datatype
+        out.loc[index, "bad_voxel_size"] = group["voxel_size"].map(
+            lambda v: len(v) != len(voxel) or not np.allclose(v, voxel, rtol=voxel_tolerance))
+        dets = np.linalg.det(affines[:, :3, :3])
+        finite = np.isfinite(affines).all(axis=(1, 2))
+        scale = np.abs(dets) / abs(ref_det) if ref_det else np.full(len(dets), np.nan)
+        bad_affine = (~finite) | (dets == 0) | (np.sign(dets) != np.sign(ref_det)) \
+            | ~(np.abs(scale - 1) <= affine_tolerance)
+        out.loc[index, "bad_affine"] = bad_affine
+
+    out["bad_offset"] = readable & ~(out["vox_offset"] >= NIFTI_HEADER_SIZE + 4)
+    out["outlier"] = ~readable | out[FLAG_COLUMNS].any(axis=1)
+    return out
+
+
+def joinMetadata(headers: pd.DataFrame, meta_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Attach metadata to header rows by the image ID parsed from each filename.
+
+    Args:
+        headers: DataFrame with a path column
+        meta_df: Metadata DataFrame with "Image Data ID"
+
+    Returns:
+        headers with the subject/image parsed from the name, the position of
+        the matching metadata row as "row" and its columns (NaN where no row
+        matches)
+    """
+    parsed, _ = parseFilenames(headers["path"], "")
+    ids = parsed.set_index("path")[["subject", "image"]]
+    out = headers.join(ids, on="path")
+    meta = meta_df.copy()
+    meta["row"] = np.arange(len(meta))
+    meta["image"] = meta["Image Data ID"].astype(str).str.replace(r"^[Ii]", "", regex=True)
+    meta = meta.drop_duplicates("image")
+    return out.merge(meta, on="image", how="left")
+
+
+def scanNiftiHeaders(
+    root,
+    pattern: str = NIFTI_ANY_PATTERN,
+    meta_df: Optional[pd.DataFrame] = None,
+    workers: int = DEFAULT_HEADER_WORKERS,
+    by: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Read, flag and optionally join the headers of every volume under a stage directory.
+
+    Paths of the form {root}/{seq}/{cond}/... get seq and cond columns.
+
+    Args:
+        root: Stage directory such as ./final
+        pattern: Glob pattern of volumes
+        meta_df: Optional metadata joined by image ID
+        workers: Reader threads
+        by: Grouping for flagOutliers (default: seq when present)
+
+    Returns:
+        Header DataFrame with flags and, if given, metadata columns
+    """
+    headers = readNiftiHeaders(walkFiles(root, pattern), workers)
+    rel = headers["path"].map(lambda p: os.path.relpath(p, root))
+    parts = rel.str.split(re.escape(os.sep), regex=True)
+    headers["seq"] = parts.map(lambda p: p[0] if len(p) > 2 else None)
+    headers["cond"] = parts.map(lambda p: p[1] if len(p) > 2 else None)
+    if by is None and headers["seq"].notna().all() and len(headers):
+        by = ["seq"]
+    headers = flagOutliers(headers, by)
+    if meta_df is not None:
+        headers = joinMetadata(headers, meta_df)
+    return headers
@@ -0,0 +1,108 @@
+"""
+ADNI filename parsing.
+Extracts subject, series and image IDs from names such as
+ADNI_002_S_0001_MR_MPRAGE_br_raw_20070329110738780_1_S29096_I41124.nii
+with one precompiled regular expression per filename divider.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+import pandas as pd
+
+from .config import FILENAME_DIVIDERS
+
+PARSED_COLUMNS = ["path", "subject", "series", "image", "extension"]
+
+
+def _buildPattern(divider: str) -> "re.Pattern":
+    return re.compile(
+        r"ADNI_(?P<subject>.+?)_MR.*?" + re.escape(divider)
+        + r".*_S(?P<series>\d+)_I(?P<image>\d+)"
+        r"(?P<extension>\.nii\.gz|\.nii|\.dcm)?$"
+    )
+
+
+# Precompiled patterns for the dividers listed in config
+PATTERNS = {divider: _buildPattern(divider) for divider in FILENAME_DIVIDERS.values()}
+
+
+@lru_cache(maxsize=None)
+def getPattern(divider: str) -> "re.Pattern":
+    """
+    Get the compiled filename pattern for a divider.
+
+    Args:
+        divider: Divider string in filename (e.g. "raw_", "br_", "Br_")
+
+    Returns:
+        Compiled regular expression with subject/series/image/extension groups
+    """
+    return PATTERNS.get(divider) or _buildPattern(divider)
+
+
+class ParsedName:
+    """IDs parsed from a single ADNI filename."""
+
+    __slots__ = ("path", "subject", "series", "image", "extension")
+
+    def __init__(self, path: str, subject: str, series: str, image: str, extension: str):
+        self.path = path
+        self.subject = subject
+        self.series = series
+        self.image = image
+        self.extension = extension
+
+    @property
+    def key(self) -> str:
+        """Join key in "subject-Iimage" format."""
+        return f"{self.subject}-I{self.image}"
+
+    def __repr__(self):
+        return (f"ParsedName(subject={self.subject!r}, series={self.series!r}, "
+                f"image={self.image!r}, extension={self.extension!r})")
+
+
+def parseFilename(path, divider: str = "raw_") -> Optional[ParsedName]:
+    """
+    Parse a single ADNI file path.
+
+    Args:
+        path: File path or name
+        divider: Divider string in filename to parse IDs
+
+    Returns:
+        ParsedName, or None when the name does not follow the ADNI layout
+    """
+    path = str(path)
+    m = getPattern(divider).search(os.path.basename(path))
+    if m is None:
+        return None
+    return ParsedName(path, m["subject"], m["series"], m["image"], m["extension"] or "")
+
+
+def parseFilenames(paths: Iterable, divider: str = "raw_") -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Parse many ADNI file paths at once into columnar form.
+
+    Args:
+        paths: Iterable of file paths
+        divider: Divider string in filename to parse IDs
+
+    Returns:
+        Tuple of (DataFrame with path/subject/series/image/extension columns,
+        list of paths that could not be parsed)
+    """
+    paths = pd.Series([str(p) for p in paths], dtype=object)
+    if paths.empty:
+        return pd.DataFrame(columns=PARSED_COLUMNS), []
+
+    names = paths.map(os.path.basename)
+    parsed = names.str.extract(getPattern(divider))
+    ok = parsed["subject"].notna()
+
+    parsed.insert(0, "path", paths)
+    parsed["extension"] = parsed["extension"].fillna("")
+    rejects = paths[~ok].tolist()
+    return parsed[ok].reset_index(drop=True), rejects
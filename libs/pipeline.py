@@ -0,0 +1,83 @@
+"""
+Shared state for running pipeline steps in one process.
+A PipelineContext holds the loaded metadata, the file inventory and the copy
+executor so consecutive steps reuse them instead of rebuilding them.
+"""
+
+import argparse
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import pandas as pd
+
+from .executor import CopyExecutor, executorFromArgs
+from .inventory import Inventory, inventoryFromArgs
+from .metadata import loadMetadata
+
+
+class PipelineContext:
+    """Resources shared by in-process pipeline steps."""
+
+    def __init__(self, executor: CopyExecutor, inventory: Optional[Inventory] = None):
+        self.executor = executor
+        self.inventory = inventory
+        self._metadata: Dict[Tuple[str, int, int], pd.DataFrame] = {}
+
+    @classmethod
+    def fromArgs(cls, args: argparse.Namespace) -> "PipelineContext":
+        """Build a context from parsed executor and inventory arguments."""
+        return cls(executorFromArgs(args), inventoryFromArgs(args))
+
+    def loadMetadata(self, csv_path) -> pd.DataFrame:
+        """
+        Load a metadata CSV once per run.
+
+        Entries are keyed on path, mtime and size, so a CSV rewritten by an
+        earlier step (e.g. To-Be-Preprocessed_*) is reloaded.
+
+        Args:
+            csv_path: Path to the metadata CSV
+
+        Returns:
+            Metadata DataFrame
+        """
+        csv_path = Path(csv_path)
+        st = csv_path.stat()
+        key = (os.path.abspath(csv_path), st.st_mtime_ns, st.st_size)
+        if key not in self._metadata:
+            self._metadata[key] = loadMetadata(csv_path)
+        return self._metadata[key]
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        if self.inventory is not None:
+            self.inventory.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+@contextmanager
+def stepResources(args: argparse.Namespace, context: Optional[PipelineContext] = None):
+    """
+    Yield the (executor, inventory) pair for a script step.
+
+    Uses the shared context when the step runs in-process, otherwise builds
+    both from the script's own arguments and releases them afterwards.
+    """
+    if context is not None:
+        yield context.executor, context.inventory
+        return
+    with PipelineContext.fromArgs(args) as own:
+        yield own.executor, own.inventory
+
+
+def stepMetadata(csv_path, context: Optional[PipelineContext] = None) -> pd.DataFrame:
+    """Load step metadata through the shared context when there is one."""
+    if context is not None:
+        return context.loadMetadata(csv_path)
+    return loadMetadata(csv_path)
@@ -0,0 +1,293 @@
+"""
+Dry-run copy plans.
+A CopyPlanner takes the place of the CopyExecutor in the move functions and
+writes every copy they would make to a plan table (source, destination,
+bytes, metadata row, reason) instead of copying. Plans can be reviewed,
+split into shards and executed later with scripts/execute_plan.py.
+"""
+
+import csv
+import io
+import os
+import shutil
+import zlib
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+import pandas as pd
+
+from .config import DEFAULT_MATERIALIZE, DEFAULT_THROUGHPUT_MBPS
+from .executor import CopyExecutor, CopyStats
+from .manifest import CopyManifest
+
+PLAN_COLUMNS = ["src", "dst", "bytes", "row", "reason"]
+
+# Planned rows are appended to the plan file in batches of this size
+FLUSH_EVERY = 256
+
+
+class PlanStats(NamedTuple):
+    """Totals of a batch of planned copies."""
+
+    files: int
+    bytes: int
+    estimate: float
+    throughput: float
+    measured: bool
+    errors: List[Tuple[str, str, str]]
+
+    def summary(self) -> str:
+        source = "measured" if self.measured else "assumed"
+        return (f"Planned {self.files} files ({self.bytes / 1e9:.2f} GB), "
+                f"estimated {self.estimate:.1f}s at {self.throughput / 1e6:.1f} MB/s ({source}), "
+                f"errors: {len(self.errors)}")
+
+
+def _workingCsv(plan_path: Path) -> Path:
+    """CSV the planner appends to; Parquet plans are converted from it at the end."""
+    if plan_path.suffix == ".parquet":
+        return plan_path.with_name(plan_path.name + ".csv")
+    return plan_path
+
+
+def estimateSeconds(nbytes: int, manifest: Optional[CopyManifest] = None,
+                    mode: str = DEFAULT_MATERIALIZE) -> Tuple[float, float, bool]:
+    """
+    Estimate how long copying nbytes takes.
+
+    Uses the throughput measured by earlier runs in the same materialize mode
+    (stored in the manifest) and falls back to config.DEFAULT_THROUGHPUT_MBPS.
+
+    Args:
+        nbytes: Bytes to copy
+        manifest: Manifest holding measured throughput
+        mode: Materialize mode the plan will be executed with
+
+    Returns:
+        Tuple of (seconds, bytes per second, whether the rate was measured)
+    """
+    rate = manifest.throughput(mode) if manifest is not None else None
+    measured = rate is not None
+    if not measured:
+        rate = DEFAULT_THROUGHPUT_MBPS * 1e6
+    return nbytes / rate, rate, measured
+
+
+class CopyPlanner:
+    """
+    Drop-in replacement for CopyExecutor that records copies instead of making them.
+
+    Rows are appended to the plan's CSV as they are submitted, so planning a
+    multi-million-file build keeps memory flat. With append=True the rows go
+    to the end of an existing plan, which lets several steps or processes
+    share one plan file (run_pipeline.py creates it once up front).
+    """
+
+    def __init__(
+        self,
+        plan_path,
+        append: bool = False,
+        materialize: str = DEFAULT_MATERIALIZE,
+        manifest: Optional[CopyManifest] = None
+    ):
+        self.plan_path = Path(plan_path)
+        self.append = append
+        self.materialize = materialize
+        self.manifest = manifest
+        self._csv = _workingCsv(self.plan_path)
+        self._csv.parent.mkdir(parents=True, exist_ok=True)
+        flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if append else os.O_TRUNC)
+        self._fd = os.open(self._csv, flags, 0o644)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = 0
+        if os.fstat(self._fd).st_size == 0:
+            self._writer.writerow(PLAN_COLUMNS)
+            self._flush()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._files = 0
+        self._bytes = 0
+        self._errors = []
+
+    def _flush(self) -> None:
+        # One write per batch on an O_APPEND descriptor keeps rows from
+        # concurrent writers intact
+        data = self._buffer.getvalue().encode("utf-8")
+        if data:
+            os.write(self._fd, data)
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._pending = 0
+
+    def prepareDir(self, path) -> None:
+        """Nothing is created while planning; execute_plan.py makes the directories."""
+
+    def submit(self, src, dst, row: Optional[int] = None, reason: str = "") -> None:
+        """
+        Record a planned copy of src to dst.
+
+        Paths are stored absolute, so the plan can be executed from any
+        working directory.
+
+        Args:
+            src: Source file path
+            dst: Destination file path
+            row: Metadata row position behind the copy
+            reason: Why the file is staged
+        """
+        src, dst = os.path.abspath(str(src)), os.path.abspath(str(dst))
+        try:
+            size = os.stat(src).st_size
+        except OSError as e:
+            self._errors.append((src, dst, str(e)))
+            size = None
+        self._writer.writerow([src, dst, size, row, reason])
+        self._files += 1
+        self._bytes += size or 0
+        self._pending += 1
+        if self._pending >= FLUSH_EVERY:
+            self._flush()
+
+    def wait(self) -> PlanStats:
+        """
+        Write out pending rows.
+
+        Returns:
+            PlanStats for the copies planned since the previous wait()
+        """
+        self._flush()
+        estimate, rate, measured = estimateSeconds(self._bytes, self.manifest, self.materialize)
+        stats = PlanStats(self._files, self._bytes, estimate, rate, measured, self._errors)
+        self._reset()
+        return stats
+
+    def shutdown(self) -> None:
+        if self._fd is not None:
+            self._flush()
+            os.close(self._fd)
+            self._fd = None
+            if not self.append:
+                finalizePlan(self.plan_path, self.manifest, self.materialize)
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+def planMetaDir(plan_path) -> Path:
+    """
+    Directory for metadata a planned step hands to later steps ("{plan}.meta").
+
+    A dry run writes its To-Be-Preprocessed exports here instead of TempMeta/,
+    so later planned steps read what this run would have exported, never an
+    export left by an earlier real run.
+    """
+    plan_path = Path(plan_path)
+    return plan_path.with_name(plan_path.name + ".meta")
+
+
+def startPlan(plan_path) -> None:
+    """Create an empty plan that CopyPlanner(append=True) instances add to."""
+    working = _workingCsv(Path(plan_path))
+    working.parent.mkdir(parents=True, exist_ok=True)
+    with open(working, "w", newline="") as f:
+        csv.writer(f).writerow(PLAN_COLUMNS)
+    shutil.rmtree(planMetaDir(plan_path), ignore_errors=True)
+
+
+def readPlan(plan_path) -> pd.DataFrame:
+    """
+    Load a plan written by CopyPlanner.
+
+    Args:
+        plan_path: Plan file (.csv or .parquet)
+
+    Returns:
+        Plan DataFrame with PLAN_COLUMNS
+    """
+    plan_path = Path(plan_path)
+    if plan_path.suffix == ".parquet":
+        return pd.read_parquet(plan_path)
+    return pd.read_csv(plan_path, dtype={"src": str, "dst": str, "reason": str},
+                       keep_default_na=False, na_values={"bytes": [""], "row": [""]})
+
+
+def finalizePlan(plan_path, manifest: Optional[CopyManifest] = None,
+                 mode: str = DEFAULT_MATERIALIZE) -> PlanStats:
+    """
+    Complete a plan file and print its totals.
+
+    Parquet plans are converted from their working CSV and the CSV is
+    removed; without pyarrow or fastparquet the CSV is kept instead.
+
+    Args:
+        plan_path: Plan file given to the planner
+        manifest: Manifest holding measured throughput for the estimate
+        mode: Materialize mode the plan will be executed with
+
+    Returns:
+        PlanStats over the whole plan
+    """
+    plan_path = Path(plan_path)
+    working = _workingCsv(plan_path)
+    plan_df = readPlan(working)
+    if working != plan_path:
+        try:
+            plan_df.to_parquet(plan_path, index=False)
+        except ImportError:
+            print(f"Warning: writing a Parquet plan needs pyarrow or fastparquet; "
+                  f"the plan is kept as {working}")
+            plan_path = working
+        else:
+            working.unlink()
+    total = int(plan_df["bytes"].fillna(0).sum())
+    estimate, rate, measured = estimateSeconds(total, manifest, mode)
+    stats = PlanStats(len(plan_df), total, estimate, rate, measured, [])
+    print(f"Plan written to {plan_path}: {stats.summary()}")
+    return stats
+
+
+def shardPlan(plan_df: pd.DataFrame, index: int, count: int) -> pd.DataFrame:
+    """
+    Select one shard of a plan.
+
+    Rows are assigned by a CRC32 of the destination path, so every machine
+    computes the same split and all copies into one file land in one shard.
+
+    Args:
+        plan_df: Plan DataFrame
+        index: Shard number, 0 <= index < count
+        count: Total number of shards
+
+    Returns:
+        The rows of the plan belonging to the shard
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Shard {index} is out of range for {count} shards")
+    buckets = plan_df["dst"].map(lambda dst: zlib.crc32(dst.encode("utf-8")) % count)
+    return plan_df[buckets.to_numpy() == index]
+
+
+def executePlan(plan_df: pd.DataFrame, executor: CopyExecutor) -> CopyStats:
+    """
+    Run the copies of a plan on an executor.
+
+    Args:
+        plan_df: Plan DataFrame (or a shard of one)
+        executor: CopyExecutor to run the copies
+
+    Returns:
+        CopyStats of the executed copies
+    """
+    for parent in plan_df["dst"].map(lambda dst: os.path.dirname(dst)).unique():
+        if parent:
+            executor.prepareDir(parent)
+    for src, dst in zip(plan_df["src"], plan_df["dst"]):
+        executor.submit(src, dst)
+    return executor.wait()
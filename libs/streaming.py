@@ -0,0 +1,143 @@
+"""
+Streaming scan -> parse -> match stages for the move functions.
+The directory walk and filename parsing run in their own threads and hand
+work on through bounded queues, so copying starts as soon as the first
+matches are found and memory stays flat regardless of tree size.
+"""
+
+import queue
+import threading
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Set, Tuple
+import numpy as np
+import pandas as pd
+
+from .config import STREAM_CHUNK_SIZE, STREAM_QUEUE_SIZE
+from .matching import buildMetaIndex
+from .parsing import parseFilenames
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(iterable: Iterable, maxsize: int = STREAM_QUEUE_SIZE) -> Iterator:
+    """
+    Run an iterable in a background thread, buffering at most maxsize items.
+
+    Exceptions raised by the iterable are re-raised in the consumer. If the
+    consumer stops early, the producer thread stops at its next item.
+
+    Args:
+        iterable: Source of items
+        maxsize: Queue bound between producer and consumer
+
+    Returns:
+        Iterator over the same items
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failed(e))
+        else:
+            put(_DONE)
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def chunked(iterable: Iterable, size: int = STREAM_CHUNK_SIZE) -> Iterator[List]:
+    """Group an iterable into lists of at most size items."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class StreamMatcher:
+    """
+    Join a stream of files against metadata rows on "subject-Iimage".
+
+    Only the metadata index and the set of matched row positions are kept;
+    files are counted as they pass and never collected.
+    """
+
+    def __init__(self, meta_df: pd.DataFrame, divider: str = "raw_", chunk_size: int = STREAM_CHUNK_SIZE):
+        self.rows = len(meta_df)
+        self.divider = divider
+        self.chunk_size = chunk_size
+        self.index = buildMetaIndex(meta_df)
+        self.scanned = 0
+        self.rejected = 0
+        self.matched: Set[int] = set()
+
+    def _matchChunks(self, files: Iterable) -> Iterator[List[Tuple[int, Path]]]:
+        for chunk in chunked(files, self.chunk_size):
+            parsed, rejects = parseFilenames(chunk, self.divider)
+            self.scanned += len(chunk)
+            self.rejected += len(rejects)
+            keys = parsed["subject"] + "-I" + parsed["image"]
+            hits = []
+            for key, path in zip(keys, parsed["path"]):
+                for j in self.index.get(key, ()):
+                    hits.append((j, Path(path)))
+                    self.matched.add(j)
+            if hits:
+                yield hits
+
+    def matches(self, files: Iterable) -> Iterator[Tuple[int, Path]]:
+        """
+        Stream (row position, file) pairs as files arrive.
+
+        The walk and the parse/match stage each run in a prefetch thread.
+
+        Args:
+            files: Iterable of file paths, typically from inventory.iterFiles
+
+        Returns:
+            Iterator of (metadata row position, file path) pairs
+        """
+        for hits in prefetch(self._matchChunks(prefetch(files, self.chunk_size))):
+            yield from hits
+
+    def unmatched(self) -> List[int]:
+        """Row positions that no streamed file matched (valid once the stream is drained)."""
+        return np.flatnonzero(self.unmatchedMask()).tolist()
+
+    def unmatchedMask(self) -> np.ndarray:
+        """Boolean mask over the metadata rows that no streamed file matched."""
+        mask = np.ones(self.rows, dtype=bool)
+        mask[list(self.matched)] = False
+        return mask
@@ -4,9 +4,12 @@ Utility functions for ADNI data processing.
 
 import os
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 import pandas as pd
 
+from .config import NIFTI_ANY_PATTERN
+from .inventory import Inventory, walkFiles
+
 
 def validate_directory_structure(base_path: str) -> Dict[str, bool]:
     """
@@ -56,13 +59,14 @@ def ensure_output_directories(base_path: str) -> None:
         print(f"✓ Ensured directory: {dir_path}")
 
 
-def count_files_in_directory(path: str, pattern: str = "**/*") -> int:
+def count_files_in_directory(path: str, pattern: str = "**/*", inventory: Optional[Inventory] = None) -> int:
     """
     Count files in directory matching pattern.
     
     Args:
         path: Directory path
         pattern: Glob pattern (default: all files)
+        inventory: Optional file Inventory queried instead of globbing
         
     Returns:
         Count of matching files
@@ -70,15 +74,18 @@ def count_files_in_directory(path: str, pattern: str = "**/*") -> int:
     dir_path = Path(path)
     if not dir_path.exists():
         return 0
-    return len(list(dir_path.glob(pattern)))
+    if inventory is not None:
+        return inventory.count(dir_path, pattern)
+    return sum(1 for _ in walkFiles(dir_path, pattern))
 
 
-def get_directory_summary(base_path: str) -> Dict[str, int]:
+def get_directory_summary(base_path: str, inventory: Optional[Inventory] = None) -> Dict[str, int]:
     """
     Get summary of file counts in key directories.
     
     Args:
         base_path: Base directory path
+        inventory: Optional file Inventory queried instead of globbing
         
     Returns:
         Dictionary with directory names and file counts
@@ -86,13 +93,13 @@ def get_directory_summary(base_path: str) -> Dict[str, int]:
     base = Path(base_path)
     
     directories = {
-        "3T (Raw)": count_files_in_directory(base / "3T", "**/*.nii"),
-        "DICOM": count_files_in_directory(base / "DICOM", "**/*.dcm"),
-        "Preprocessed Old": count_files_in_directory(base / "preprocessed_old", "**/*.nii"),
-        "Preprocessed": count_files_in_directory(base / "preprocessed", "**/*.nii"),
-        "TempData": count_files_in_directory(base / "TempData", "**/*.nii"),
-        "2Convert": count_files_in_directory(base / "2convert", "**/*.dcm"),
-        "Final": count_files_in_directory(base / "final", "**/*.nii"),
+        "3T (Raw)": count_files_in_directory(base / "3T", NIFTI_ANY_PATTERN, inventory),
+        "DICOM": count_files_in_directory(base / "DICOM", "**/*.dcm", inventory),
+        "Preprocessed Old": count_files_in_directory(base / "preprocessed_old", NIFTI_ANY_PATTERN, inventory),
+        "Preprocessed": count_files_in_directory(base / "preprocessed", NIFTI_ANY_PATTERN, inventory),
+        "TempData": count_files_in_directory(base / "TempData", NIFTI_ANY_PATTERN, inventory),
+        "2Convert": count_files_in_directory(base / "2convert", "**/*.dcm", inventory),
+        "Final": count_files_in_directory(base / "final", NIFTI_ANY_PATTERN, inventory),
     }
     
     return directories
@@ -145,12 +152,13 @@ def validate_metadata_csv(csv_path: str, required_columns: List[str] = None) ->
         return False
 
 
-def print_pipeline_status(base_path: str) -> None:
+def print_pipeline_status(base_path: str, inventory: Optional[Inventory] = None) -> None:
     """
     Print pipeline status and statistics.
     
     Args:
         base_path: Base directory path
+        inventory: Optional file Inventory queried instead of globbing
     """
     print("\n" + "="*70)
     print("ADNI Data Processing Pipeline Status")
@@ -165,7 +173,7 @@ def print_pipeline_status(base_path: str) -> None:
     
     # File counts
     print("\nFile Counts:")
-    summary = get_directory_summary(base_path)
+    summary = get_directory_summary(base_path, inventory)
     for name, count in summary.items():
         print(f"  {name}: {count}")
     
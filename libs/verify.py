@@ -0,0 +1,114 @@
+"""
+Checksum verification of staged copies.
+Hashes the source and destination of every copy recorded in the manifest
+on a thread pool and stores both checksums there. File checksums are cached
+by size and mtime, so repeated verifications only rehash what changed.
+"""
+
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .checksum import hashFiles
+from .config import CHECKSUM_CHUNK_SIZE, DEFAULT_HASH_WORKERS
+from .manifest import CopyManifest
+
+
+class VerifyResult(NamedTuple):
+    """Outcome of verifying recorded copies."""
+
+    checked: int
+    hashed: int
+    cached: int
+    mismatched: List[Tuple[str, str]]
+    failed: List[Tuple[str, str, str]]
+
+    def summary(self) -> str:
+        return (f"Verified {self.checked} copies: {len(self.mismatched)} mismatched, "
+                f"{len(self.failed)} missing or unreadable; hashed {self.hashed} files, "
+                f"{self.cached} checksums reused")
+
+
+def _stat(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def verifyCopies(
+    manifest: CopyManifest,
+    roots: Optional[Iterable] = None,
+    workers: int = DEFAULT_HASH_WORKERS,
+    chunk_size: int = CHECKSUM_CHUNK_SIZE,
+    use_mmap: bool = False,
+    rehash: bool = False
+) -> VerifyResult:
+    """
+    Verify that every recorded destination matches its source byte for byte.
+
+    A file is only hashed when the manifest has no checksum for it at its
+    current size and mtime (or when rehash is set). A destination that is a
+    hardlink or symlink of its source shares the source's checksum without
+    being read again.
+
+    Args:
+        manifest: CopyManifest with the recorded copies
+        roots: Only verify destinations below these directories (all when None)
+        workers: Number of hashing threads
+        chunk_size: Read size in bytes
+        use_mmap: Hash from memory maps instead of read() calls
+        rehash: Ignore cached checksums
+
+    Returns:
+        VerifyResult
+    """
+    entries = manifest.entries(list(roots) if roots else None)
+    cache = {} if rehash else manifest.loadHashes()
+
+    stats: Dict[str, os.stat_result] = {}
+    failed = []
+    pairs = []
+    for src, dst in entries:
+        src_stat, dst_stat = _stat(src), _stat(dst)
+        if src_stat is None or dst_stat is None:
+            failed.append((src, dst, "source missing" if src_stat is None else "destination missing"))
+            continue
+        stats[src] = src_stat
+        stats[dst] = dst_stat
+        pairs.append((src, dst))
+
+    def key(path: str) -> Tuple[int, int]:
+        return stats[path].st_size, stats[path].st_mtime_ns
+
+    def sameFile(a: str, b: str) -> bool:
+        return (stats[a].st_dev, stats[a].st_ino) == (stats[b].st_dev, stats[b].st_ino)
+
+    checksums = {}
+    todo = set()
+    for src, dst in pairs:
+        for path in (src, dst) if not sameFile(src, dst) else (src,):
+            cached = cache.get(path)
+            if cached is not None and cached[:2] == key(path):
+                checksums[path] = cached[2]
+            else:
+                todo.add(path)
+
+    hashed = hashFiles(sorted(todo), workers, chunk_size, use_mmap=use_mmap)
+    manifest.storeHashes([(path, *key(path), digest) for path, digest in hashed.items() if digest])
+    checksums.update(hashed)
+
+    results = []
+    mismatched = []
+    for src, dst in pairs:
+        src_sum = checksums.get(src)
+        dst_sum = src_sum if sameFile(src, dst) else checksums.get(dst)
+        if src_sum is None or dst_sum is None:
+            failed.append((src, dst, "could not be read"))
+            continue
+        ok = src_sum == dst_sum and stats[src].st_size == stats[dst].st_size
+        if not ok:
+            mismatched.append((src, dst))
+        results.append((dst, src_sum, dst_sum, ok))
+    manifest.recordVerification(results)
+
+    return VerifyResult(len(entries), len(hashed), len(checksums) - len(hashed), mismatched, failed)
@@ -0,0 +1,209 @@
+"""
+Consolidated volume store for final/.
+Packs the volumes of one or all sequence/condition folders into a single
+fixed-shape .npy array with an index table, so training jobs can memory-map
+one file and take volumes by position instead of opening thousands of NIfTIs.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .config import CONDITIONS, DEFAULT_HEADER_WORKERS, NIFTI_ANY_PATTERN, SEQUENCES, TEMP_META_DIR
+from .inventory import walkFiles
+from .metadata import loadMetadata
+from .nifti import joinMetadata, loadVolume, readNiftiHeaders, scaleVoxels
+
+INDEX_COLUMNS = ["row", "subject", "image", "label", "seq", "cond", "path", "offset"]
+
+# Index table written next to each store
+INDEX_SUFFIX = ".index.csv"
+
+
+class PackResult(NamedTuple):
+    """Outcome of packing a store."""
+
+    index: pd.DataFrame
+    shape: Tuple[int, ...]
+    dtype: str
+    skipped: List[Tuple[str, str]]
+
+    def summary(self) -> str:
+        return (f"Packed {len(self.index)} volumes of shape {self.shape} ({self.dtype}), "
+                f"skipped {len(self.skipped)}")
+
+
+def indexPath(store_path) -> Path:
+    """Path of the index table belonging to a store file."""
+    store_path = Path(store_path)
+    return store_path.with_name(store_path.stem + INDEX_SUFFIX)
+
+
+def finalVolumes(
+    root,
+    seqs: List[str] = SEQUENCES,
+    conds: List[str] = CONDITIONS,
+    meta_dir=TEMP_META_DIR,
+    workers: int = DEFAULT_HEADER_WORKERS
+) -> pd.DataFrame:
+    """
+    List the volumes of {root}/{seq}/{cond} with their headers and metadata.
+
+    Each folder is joined to its Balanced_Meta_{seq}w_{cond}.csv by image ID;
+    label is the metadata Group, or the folder's condition when a volume has
+    no metadata row.
+
+    Args:
+        root: Stage directory such as ./final
+        seqs: Sequences to include
+        conds: Conditions to include
+        meta_dir: Directory of the Balanced_Meta CSVs
+        workers: Header reading threads
+
+    Returns:
+        DataFrame of headers with seq, cond, row, subject, image and label
+    """
+    frames = []
+    for seq in seqs:
+        for cond in conds:
+            folder = Path(root) / seq / cond
+            if not folder.exists():
+                continue
+            headers = readNiftiHeaders(walkFiles(folder, NIFTI_ANY_PATTERN), workers)
+            headers["seq"] = seq
+            headers["cond"] = cond
+            meta_csv = Path(meta_dir) / f"Balanced_Meta_{seq}w_{cond}.csv"
+            if meta_csv.exists():
+                headers = joinMetadata(headers, loadMetadata(str(meta_csv)))
+            else:
+                headers = joinMetadata(headers, pd.DataFrame({"Image Data ID": pd.Series(dtype=str)}))
+            if "Group" in headers:
+                headers["label"] = headers["Group"].astype(object).where(headers["Group"].notna(), cond)
+            else:
+                headers["label"] = cond
+            frames.append(headers)
+    if not frames:
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def packVolumes(
+    volumes: pd.DataFrame,
+    out_path,
+    dtype: Optional[str] = None,
+    workers: int = DEFAULT_HEADER_WORKERS
+) -> PackResult:
+    """
+    Write volumes into one contiguous (N, *shape) .npy file plus its index.
+
+    The store takes the most common shape; volumes with another shape or an
+    unreadable header are skipped. Values keep their stored type unless a
+    volume has scl_slope/scl_inter scaling, in which case the store is
+    float32 and the scaling is applied. Volumes are laid out C-contiguously
+    in [x, y, z] order. The store is written to a temporary file and renamed.
+
+    Args:
+        volumes: DataFrame from finalVolumes
+        out_path: Store path (.npy)
+        dtype: Force the store dtype
+        workers: Threads loading and writing volumes
+
+    Returns:
+        PackResult with the index table that was written
+    """
+    out_path = Path(out_path)
+    readable = volumes[volumes["error"].isna()] if len(volumes) else volumes
+    skipped = [(r.path, r.error) for r in volumes[~volumes.index.isin(readable.index)].itertuples()]
+    if readable.empty:
+        raise ValueError("No readable volumes to pack")
+
+    shape = readable["shape"].value_counts().index[0]
+    same = readable["shape"] == shape
+    skipped += [(r.path, f"shape {r.shape} != {shape}") for r in readable[~same].itertuples()]
+    keep = readable[same].reset_index(drop=True)
+
+    slopes = keep["scl_slope"].fillna(0)
+    scaled = ~slopes.isin([0.0, 1.0]) | (keep["scl_inter"].fillna(0) != 0)
+    if dtype is None:
+        dtype = "float32" if scaled.any() else keep["dtype"].value_counts().index[0]
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.stem + ".part.npy")
+    store = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=(len(keep), *shape))
+
+    def fill(i: int) -> None:
+        header = keep.iloc[i].to_dict()
+        data = loadVolume(header["path"], header)
+        if scaled.iloc[i]:
+            data = scaleVoxels(data, header["scl_slope"], header["scl_inter"])
+        store[i] = data
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pack") as pool:
+            list(pool.map(fill, range(len(keep))))
+        store.flush()
+        volume_bytes = store[0].nbytes if len(keep) else 0
+        offsets = store.offset + np.arange(len(keep), dtype=np.int64) * volume_bytes
+        del store
+        os.replace(tmp, out_path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+    index = pd.DataFrame({
+        "row": keep["row"].astype("Int64"),
+        "subject": keep["subject"],
+        "image": keep["image"],
+        "label": keep["label"],
+        "seq": keep["seq"],
+        "cond": keep["cond"],
+        "path": keep["path"],
+        "offset": offsets,
+    }, columns=INDEX_COLUMNS)
+    index.to_csv(indexPath(out_path), index=False)
+    return PackResult(index, tuple(shape), str(np.dtype(dtype)), skipped)
+
+
+class VolumeStore:
+    """Read-only view of a packed store; volumes are zero-copy memmap views."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.volumes = np.load(self.path, mmap_mode="r")
+        self.index = pd.read_csv(indexPath(self.path), dtype={"subject": str, "image": str})
+        if len(self.index) != len(self.volumes):
+            raise ValueError(f"{self.path} holds {len(self.volumes)} volumes but its index lists {len(self.index)}")
+        self._positions = {image: i for i, image in enumerate(self.index["image"])}
+
+    def __len__(self) -> int:
+        return len(self.volumes)
+
+    def __getitem__(self, i) -> np.ndarray:
+        """Volume(s) by position; slices and index arrays are supported."""
+        return self.volumes[i]
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Shape of a single volume."""
+        return self.volumes.shape[1:]
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.index["label"].to_numpy()
+
+    def byImage(self, image) -> np.ndarray:
+        """Volume for an image ID, with or without the leading "I"."""
+        return self.volumes[self._positions[str(image).lstrip("Ii")]]
+
+    def select(self, seq: Optional[str] = None, cond: Optional[str] = None) -> np.ndarray:
+        """Positions of the volumes from one sequence and/or condition."""
+        mask = np.ones(len(self.index), dtype=bool)
+        if seq is not None:
+            mask &= (self.index["seq"] == seq).to_numpy()
+        if cond is not None:
+            mask &= (self.index["cond"] == cond).to_numpy()
+        return np.flatnonzero(mask)
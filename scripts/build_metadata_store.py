@@ -0,0 +1,51 @@
+"""
+Build the unified typed metadata store from all Balanced_Meta CSVs.
+Prints the memory used by the metadata before and after typing and the
+number of rows per sequence/condition.
+
+Usage:
+    python build_metadata_store.py
+    python build_metadata_store.py --export ./data/ADNI_full_export.csv
+    python build_metadata_store.py --meta-dir ./TempMeta --output ./outputs/metadata.parquet
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.config import METADATA_STORE, TEMP_META_DIR
+from libs.metadata_store import MetadataStore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the typed metadata store"
+    )
+    parser.add_argument("--meta-dir", type=str, default=str(TEMP_META_DIR),
+                        help="Directory of the Balanced_Meta CSVs")
+    parser.add_argument("--export", type=str,
+                        help="Full ADNI metadata export to include")
+    parser.add_argument("--output", type=str, default=str(METADATA_STORE),
+                        help="Store path (.parquet)")
+
+    args = parser.parse_args(argv)
+
+    try:
+        store = MetadataStore.build(args.meta_dir, args.export)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(store.report.summary())
+    for seq, cond in store.combinations:
+        print(f"  {seq}w-{cond}: {len(store.view(seq, cond))} rows")
+    if args.export:
+        print(f"  export: {len(store.export())} rows")
+    print(f"Store saved to {store.save(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,7 +12,7 @@ import argparse
 import sys
 from pathlib import Path
 
-sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from libs.utils import (
     validate_directory_structure,
@@ -20,6 +20,7 @@ from libs.utils import (
     print_pipeline_status,
     list_available_metadata,
 )
+from libs.inventory import addInventoryArguments, inventoryFromArgs
 
 
 def main():
@@ -30,6 +31,7 @@ def main():
         "--path", type=str, default=".",
         help="Base path to ADNI-processing directory"
     )
+    addInventoryArguments(parser)
     
     args = parser.parse_args()
     base_path = Path(args.path)
@@ -43,7 +45,12 @@ def main():
     ensure_output_directories(str(base_path))
     
     # Print status
-    print_pipeline_status(str(base_path))
+    inventory = inventoryFromArgs(args)
+    try:
+        print_pipeline_status(str(base_path), inventory)
+    finally:
+        if inventory is not None:
+            inventory.close()
     
     return 0
 
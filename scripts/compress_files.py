@@ -0,0 +1,61 @@
+"""
+Compress staged NIfTI files to .nii.gz, or decompress them again.
+Compression is block-parallel across worker processes and writes standard
+gzip; decompression runs one file per worker.
+
+Usage:
+    python compress_files.py
+    python compress_files.py --root ./final --workers 8 --level 6
+    python compress_files.py --root ./final --decompress
+    python compress_files.py --root ./final --remove-input
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.compression import compressTrees, decompressTrees
+from libs.config import DEFAULT_COMPRESS_WORKERS, GZIP_BLOCK_SIZE, GZIP_LEVEL
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compress staged NIfTI files with parallel gzip"
+    )
+    parser.add_argument("--root", type=str, action="append",
+                        help="Directory to process (repeatable, default: ./final and ./preprocessed)")
+    parser.add_argument("--decompress", action="store_true",
+                        help="Turn .nii.gz files back into .nii")
+    parser.add_argument("--workers", type=int, default=DEFAULT_COMPRESS_WORKERS,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--level", type=int, default=GZIP_LEVEL, choices=range(1, 10),
+                        metavar="1-9", help="gzip compression level")
+    parser.add_argument("--block-mb", type=int, default=GZIP_BLOCK_SIZE >> 20,
+                        help="Uncompressed block size per worker task in MB")
+    parser.add_argument("--remove-input", action="store_true",
+                        help="Delete the input files once their outputs are written "
+                             "(compressed copies then no longer match the manifest)")
+
+    args = parser.parse_args(argv)
+    roots = args.root or ["./final", "./preprocessed"]
+
+    if args.decompress:
+        print(f"Decompressing .nii.gz files in {', '.join(roots)}...")
+        stats = decompressTrees(roots, workers=args.workers, keep=not args.remove_input)
+    else:
+        print(f"Compressing .nii files in {', '.join(roots)}...")
+        stats = compressTrees(roots, workers=args.workers, level=args.level,
+                              block_size=max(1, args.block_mb) << 20, keep=not args.remove_input)
+
+    print(stats.summary())
+    for path, error in stats.errors[:10]:
+        print(f"  ✗ {path}: {error}")
+    if len(stats.errors) > 10:
+        print(f"  ... and {len(stats.errors) - 10} more")
+    return 0 if not stats.errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Replace byte-identical staged files with a single stored copy.
+
+Usage:
+    python dedup_files.py --root ./preprocessed --root ./final
+    python dedup_files.py --root ./final --mode manifest --workers 16
+    python dedup_files.py --root ./final --dry-run
+    python dedup_files.py --restore
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.config import DEDUP_MODES, DEFAULT_HASH_WORKERS, MANIFEST_DB
+from libs.dedup import dedupTrees, restoreDuplicates
+from libs.manifest import CopyManifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Deduplicate staged files by content hash"
+    )
+    parser.add_argument("--root", type=str, action="append",
+                        help="Directory to deduplicate (repeatable, default: ./preprocessed and ./final)")
+    parser.add_argument("--pattern", type=str, default="**/*.nii*",
+                        help="Glob pattern of files to consider")
+    parser.add_argument("--mode", type=str, default="hardlink", choices=DEDUP_MODES,
+                        help="Keep duplicates as hardlinks, or delete them and record them in the manifest")
+    parser.add_argument("--workers", type=int, default=DEFAULT_HASH_WORKERS,
+                        help="Number of hashing threads")
+    parser.add_argument("--manifest", type=str, default=str(MANIFEST_DB),
+                        help="SQLite manifest used by --mode manifest")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report duplicates without changing any file")
+    parser.add_argument("--restore", action="store_true",
+                        help="Recreate the files removed by --mode manifest")
+
+    args = parser.parse_args(argv)
+    manifest = CopyManifest(args.manifest)
+
+    try:
+        if args.restore:
+            count = restoreDuplicates(manifest)
+            print(f"✓ Restored {count} files")
+            return 0
+
+        roots = args.root or ["./preprocessed", "./final"]
+        print(f"Scanning {', '.join(roots)} for duplicates ({args.pattern})...")
+        result = dedupTrees(roots, args.mode, manifest, args.pattern, args.workers, args.dry_run)
+    finally:
+        manifest.close()
+
+    duplicates = sum(len(g.paths) - 1 for g in result.groups)
+    print(f"Duplicate groups: {len(result.groups)}, duplicate files: {duplicates}")
+    for path, reason in result.skipped[:10]:
+        print(f"  ✗ {path}: {reason}")
+    if len(result.skipped) > 10:
+        print(f"  ... and {len(result.skipped) - 10} more skipped")
+
+    action = "Would save" if args.dry_run else "Saved"
+    if result.report.empty:
+        print("No duplicates to remove")
+    else:
+        print(f"\n{'Seq':<6} {'Cond':<6} {'Files':>8} {'GB':>10}")
+        for row in result.report.itertuples(index=False):
+            print(f"{row.seq:<6} {row.cond:<6} {row.duplicates:>8} {row.bytes_saved / 1e9:>10.3f}")
+        total = result.report["bytes_saved"].sum()
+        print(f"\n✓ {action} {total / 1e9:.3f} GB in {len(result.replaced)} files ({args.mode})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Execute a copy plan written by a dry run (--plan).
+A plan can be split into shards so that several machines each run part of it.
+
+Usage:
+    python execute_plan.py outputs/plan.csv
+    python execute_plan.py outputs/plan.parquet --shard 0/4 --workers 16 --resume
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.executor import addExecutorArguments, executorFromArgs, printStats
+from libs.plan import estimateSeconds, executePlan, readPlan, shardPlan
+
+
+def parse_shard(value):
+    """Parse "i/n" into (i, n)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected INDEX/COUNT, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard {value} is out of range")
+    return index, count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Execute a copy plan produced with --plan"
+    )
+    parser.add_argument("plan_file", metavar="plan", type=str,
+                        help="Plan file (.csv or .parquet)")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1),
+                        help="Run only shard INDEX of COUNT, e.g. 0/4")
+    addExecutorArguments(parser, planning=False)
+
+    args = parser.parse_args(argv)
+
+    plan_path = Path(args.plan_file)
+    if not plan_path.exists():
+        print(f"Error: Plan not found at {plan_path}")
+        return 1
+
+    plan_df = readPlan(plan_path)
+    index, count = args.shard
+    shard = shardPlan(plan_df, index, count)
+
+    executor = executorFromArgs(args)
+    try:
+        total = int(shard["bytes"].fillna(0).sum())
+        estimate, rate, measured = estimateSeconds(total, executor.manifest, args.materialize)
+        print(f"Plan: {len(plan_df)} copies, shard {index}/{count}: {len(shard)} copies "
+              f"({total / 1e9:.2f} GB), estimated {estimate:.1f}s")
+        stats = executePlan(shard, executor)
+    finally:
+        executor.shutdown()
+
+    printStats(stats)
+    return 1 if stats.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
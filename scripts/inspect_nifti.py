@@ -0,0 +1,86 @@
+"""
+Validate staged NIfTI volumes from their headers alone.
+Reads shape, voxel size, datatype, vox_offset and affine of every volume,
+joins them to the metadata by image ID and flags volumes that differ from
+the rest of their sequence.
+
+Usage:
+    python inspect_nifti.py
+    python inspect_nifti.py --root ./final --meta ./TempMeta/Balanced_Meta_T1w_AD.csv
+    python inspect_nifti.py --root ./final --by seq --by cond --workers 32
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.config import DEFAULT_HEADER_WORKERS, NIFTI_ANY_PATTERN, OUTPUT_DIR, TEMP_META_DIR
+from libs.metadata import loadMetadata
+from libs.nifti import FLAG_COLUMNS, scanNiftiHeaders
+
+
+def load_meta(meta_paths):
+    """Load the given metadata CSVs, or every Balanced_Meta CSV in TempMeta."""
+    paths = [Path(p) for p in meta_paths] if meta_paths else sorted(TEMP_META_DIR.glob("Balanced_Meta_*.csv"))
+    frames = [loadMetadata(str(p)) for p in paths if p.exists()]
+    if not frames:
+        return None
+    return pd.concat([df.astype({c: "object" for c in df.select_dtypes("category")}) for df in frames],
+                     ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check NIfTI headers of staged volumes and flag outliers"
+    )
+    parser.add_argument("--root", type=str, default="./final",
+                        help="Stage directory to scan")
+    parser.add_argument("--pattern", type=str, default=NIFTI_ANY_PATTERN,
+                        help="Glob pattern of volumes")
+    parser.add_argument("--meta", type=str, action="append",
+                        help="Metadata CSV to join (repeatable, default: TempMeta/Balanced_Meta_*.csv)")
+    parser.add_argument("--by", type=str, action="append",
+                        help="Column to group by when finding outliers (repeatable, default: seq)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_HEADER_WORKERS,
+                        help="Number of header reading threads")
+    parser.add_argument("--output", type=str, default=str(OUTPUT_DIR / "nifti_headers.csv"),
+                        help="CSV report of all headers")
+
+    args = parser.parse_args(argv)
+
+    if not Path(args.root).exists():
+        print(f"Error: Directory not found at {args.root}")
+        return 1
+
+    meta_df = load_meta(args.meta)
+    print(f"Reading NIfTI headers in {args.root}...")
+    headers = scanNiftiHeaders(args.root, args.pattern, meta_df, args.workers, args.by)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    headers.drop(columns="affine").to_csv(output, index=False)
+
+    outliers = headers[headers["outlier"]]
+    unreadable = headers["error"].notna().sum()
+    print(f"Read {len(headers)} headers: {len(outliers)} outliers, {unreadable} unreadable")
+    for col in FLAG_COLUMNS:
+        if headers[col].any():
+            print(f"  {col}: {int(headers[col].sum())}")
+    if meta_df is not None and "Image Data ID" in headers:
+        print(f"  without metadata: {int(headers['Image Data ID'].isna().sum())}")
+    for row in outliers.head(10).itertuples():
+        reason = row.error if isinstance(row.error, str) else \
+            ", ".join(c for c in FLAG_COLUMNS if getattr(row, c))
+        print(f"  ✗ {row.path}: {reason}")
+    if len(outliers) > 10:
+        print(f"  ... and {len(outliers) - 10} more")
+    print(f"Report saved to {output}")
+    return 0 if outliers.empty else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,9 +14,12 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from libs.file_operations import freemove
+from libs.executor import addExecutorArguments
+from libs.inventory import addInventoryArguments
+from libs.pipeline import stepResources
 
 
-def main():
+def main(argv=None, context=None):
     parser = argparse.ArgumentParser(
         description="Move final preprocessed files using pattern matching"
     )
@@ -28,25 +31,30 @@ def main():
                         help="Source directory")
     parser.add_argument("--target", type=str, default="./final",
                         help="Target directory")
-    parser.add_argument("--pattern", type=str, default="**/*wm*.nii",
+    parser.add_argument("--pattern", type=str, default="**/*wm*.{nii,nii.gz}",
                         help="File glob pattern to match")
     parser.add_argument("--tesla", type=int, default=3,
                         help="Tesla field strength")
+    addExecutorArguments(parser)
+    addInventoryArguments(parser)
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Move files
     print(f"Moving {args.seq}w-{args.cond} files from {args.source} to {args.target}")
     print(f"Using pattern: {args.pattern}")
     
-    count = freemove(
-        source_path=args.source,
-        target_path=args.target,
-        seq=args.seq,
-        cond=args.cond,
-        tesla=args.tesla,
-        file_format=args.pattern
-    )
+    with stepResources(args, context) as (executor, inventory):
+        count = freemove(
+            source_path=args.source,
+            target_path=args.target,
+            seq=args.seq,
+            cond=args.cond,
+            tesla=args.tesla,
+            file_format=args.pattern,
+            executor=executor,
+            inventory=inventory
+        )
     
     print(f"\n✓ Successfully moved {count} files to {args.target}/{args.seq}/{args.cond}/")
     return 0
@@ -9,17 +9,20 @@ Usage:
 import argparse
 import sys
 from pathlib import Path
-import pandas as pd
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from libs.file_operations import movePreprocessed
 from libs.metadata import exportCSV
-from libs.config import TEMP_META_DIR
+from libs.plan import planMetaDir
+from libs.executor import addExecutorArguments
+from libs.inventory import addInventoryArguments
+from libs.pipeline import stepMetadata, stepResources
+from libs.config import DEFAULT_META_FORMAT, META_EXPORT_FORMATS, TEMP_META_DIR
 
 
-def main():
+def main(argv=None, context=None):
     parser = argparse.ArgumentParser(
         description="Move preprocessed files to target directory"
     )
@@ -33,8 +36,13 @@ def main():
                         help="Tesla field strength")
     parser.add_argument("--divider", type=str, default="raw_",
                         help="Divider string in filename")
+    parser.add_argument("--meta-format", type=str, default=DEFAULT_META_FORMAT,
+                        choices=list(META_EXPORT_FORMATS),
+                        help="File format of the exported To-Be-Preprocessed metadata")
+    addExecutorArguments(parser)
+    addInventoryArguments(parser)
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Load metadata
     meta_csv = TEMP_META_DIR / f"Balanced_Meta_{args.seq}w_{args.cond}.csv"
@@ -42,26 +50,33 @@ def main():
         print(f"Error: Metadata file not found at {meta_csv}")
         return 1
     
-    meta_df = pd.read_csv(meta_csv)
+    meta_df = stepMetadata(meta_csv, context)
     print(f"Loaded metadata with {len(meta_df)} records")
     
     # Move files
     print(f"\nMoving preprocessed {args.seq}w-{args.cond} files...")
-    meta_dict, meta_nums = movePreprocessed(
-        meta_df=meta_df,
-        path=args.path,
-        seq=args.seq,
-        cond=args.cond,
-        tesla=args.tesla,
-        divider=args.divider
-    )
+    with stepResources(args, context) as (executor, inventory):
+        unprocessed_df, meta_nums = movePreprocessed(
+            meta_df=meta_df,
+            path=args.path,
+            seq=args.seq,
+            cond=args.cond,
+            tesla=args.tesla,
+            divider=args.divider,
+            executor=executor,
+            inventory=inventory
+        )
     
-    # Export unprocessed files list
-    if meta_dict["Image Data ID"]:
-        unprocessed_df = exportCSV(
-            meta_dict,
+    # Export unprocessed files list; a dry run exports next to its plan
+    # (even when empty) so the planned move_to_preprocess step reads it
+    planning = bool(getattr(args, "plan", None))
+    if planning or len(unprocessed_df):
+        output_dir = planMetaDir(args.plan) if planning else TEMP_META_DIR
+        exportCSV(
+            unprocessed_df,
             title=f"To-Be-Preprocessed_{args.seq}w_{args.cond}",
-            output_dir=str(TEMP_META_DIR)
+            output_dir=str(output_dir),
+            fmt=args.meta_format
         )
         print(f"\nExported {len(unprocessed_df)} unprocessed files to metadata")
     
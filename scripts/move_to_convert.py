@@ -10,15 +10,17 @@ Usage:
 import argparse
 import sys
 from pathlib import Path
-import pandas as pd
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from libs.file_operations import move2convert
+from libs.executor import addExecutorArguments
+from libs.inventory import addInventoryArguments
+from libs.pipeline import stepMetadata, stepResources
 from libs.config import TEMP_META_DIR
 
 
-def main():
+def main(argv=None, context=None):
     parser = argparse.ArgumentParser(
         description="Move DICOM files to conversion queue"
     )
@@ -30,8 +32,10 @@ def main():
                         help="Source path with DICOM files")
     parser.add_argument("--tesla", type=int, default=3,
                         help="Tesla field strength")
+    addExecutorArguments(parser)
+    addInventoryArguments(parser)
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Load metadata
     meta_csv = TEMP_META_DIR / f"Balanced_Meta_{args.seq}w_{args.cond}.csv"
@@ -39,17 +43,20 @@ def main():
         print(f"Error: Metadata file not found at {meta_csv}")
         return 1
     
-    meta_df = pd.read_csv(meta_csv)
+    meta_df = stepMetadata(meta_csv, context)
     print(f"Loaded metadata with {len(meta_df)} records")
     
     # Move DICOM files
     print(f"\nMoving {args.seq}w-{args.cond} DICOM files to conversion queue...")
-    count = move2convert(
-        meta_df=meta_df,
-        seq=args.seq,
-        cond=args.cond,
-        tesla=args.tesla
-    )
+    with stepResources(args, context) as (executor, inventory):
+        count = move2convert(
+            meta_df=meta_df,
+            seq=args.seq,
+            cond=args.cond,
+            tesla=args.tesla,
+            executor=executor,
+            inventory=inventory
+        )
     
     print(f"\n✓ Moved {count} files to ./2convert/{args.seq}/{args.cond}/")
     return 0
@@ -10,15 +10,19 @@ Usage:
 import argparse
 import sys
 from pathlib import Path
-import pandas as pd
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from libs.file_operations import move2preprocess
+from libs.executor import addExecutorArguments
+from libs.inventory import addInventoryArguments
+from libs.metadata import findMetadata
+from libs.plan import planMetaDir
+from libs.pipeline import stepMetadata, stepResources
 from libs.config import TEMP_META_DIR
 
 
-def main():
+def main(argv=None, context=None):
     parser = argparse.ArgumentParser(
         description="Move unprocessed files to preprocessing queue"
     )
@@ -30,27 +34,34 @@ def main():
                         help="Source path with unprocessed files")
     parser.add_argument("--tesla", type=int, default=3,
                         help="Tesla field strength")
+    addExecutorArguments(parser)
+    addInventoryArguments(parser)
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
-    # Load metadata for unprocessed files
-    meta_csv = TEMP_META_DIR / f"To-Be-Preprocessed_{args.seq}w_{args.cond}.csv"
-    if not meta_csv.exists():
-        print(f"Error: Metadata file not found at {meta_csv}")
+    # Load metadata for unprocessed files; a dry run reads the export of the
+    # planned move_preprocessed_files step
+    meta_dir = planMetaDir(args.plan) if getattr(args, "plan", None) else TEMP_META_DIR
+    meta_csv = findMetadata(meta_dir, f"To-Be-Preprocessed_{args.seq}w_{args.cond}")
+    if meta_csv is None:
+        print(f"Error: No To-Be-Preprocessed_{args.seq}w_{args.cond} metadata found in {meta_dir}")
         print(f"Make sure to run move_preprocessed_files.py first")
         return 1
     
-    meta_df = pd.read_csv(meta_csv)
+    meta_df = stepMetadata(meta_csv, context)
     print(f"Loaded metadata with {len(meta_df)} records to preprocess")
     
     # Move files
     print(f"\nMoving {args.seq}w-{args.cond} files to preprocessing queue...")
-    count = move2preprocess(
-        meta_df=meta_df,
-        seq=args.seq,
-        cond=args.cond,
-        tesla=args.tesla
-    )
+    with stepResources(args, context) as (executor, inventory):
+        count = move2preprocess(
+            meta_df=meta_df,
+            seq=args.seq,
+            cond=args.cond,
+            tesla=args.tesla,
+            executor=executor,
+            inventory=inventory
+        )
     
     print(f"\n✓ Moved {count} files to ./TempData/{args.seq}/{args.cond}/")
     return 0
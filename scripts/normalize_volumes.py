@@ -0,0 +1,80 @@
+"""
+Normalize intensities and downsample SPM outputs into a stage next to final/.
+Each volume is z-scored or min-max scaled over the voxels above --threshold
+and block-mean downsampled by --factor, slab by slab on a process pool.
+
+Usage:
+    python normalize_volumes.py --seq T1 --cond AD
+    python normalize_volumes.py --seq T1 --cond AD --method minmax --factor 2
+    python normalize_volumes.py --seq T2 --cond CN --source ./final --target ./normalized --workers 8
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.config import (
+    DEFAULT_NORMALIZE_WORKERS,
+    NORMALIZE_CHUNK_SLICES,
+    NORMALIZE_METHODS,
+)
+from libs.intensity import processTree
+
+
+def main(argv=None, context=None):
+    parser = argparse.ArgumentParser(
+        description="Normalize and downsample NIfTI volumes"
+    )
+    parser.add_argument("--seq", type=str, required=True, choices=["T1", "T2"],
+                        help="MRI sequence")
+    parser.add_argument("--cond", type=str, required=True, choices=["AD", "CN", "MCI"],
+                        help="Condition")
+    parser.add_argument("--source", type=str, default="./processed",
+                        help="Source directory")
+    parser.add_argument("--target", type=str, default="./normalized",
+                        help="Target directory")
+    parser.add_argument("--pattern", type=str, default="**/*wm*.{nii,nii.gz}",
+                        help="File glob pattern to match")
+    parser.add_argument("--method", type=str, default="zscore", choices=NORMALIZE_METHODS,
+                        help="Intensity normalization over the masked voxels")
+    parser.add_argument("--factor", type=int, default=1,
+                        help="Integer block-mean downsampling factor")
+    parser.add_argument("--threshold", type=float, default=0.0,
+                        help="Voxels above this value form the mask")
+    parser.add_argument("--chunk-slices", type=int, default=NORMALIZE_CHUNK_SLICES,
+                        help="z-slices held in memory per volume")
+    parser.add_argument("--processes", type=int, default=DEFAULT_NORMALIZE_WORKERS,
+                        help="Worker processes (default: one per CPU)")
+
+    args = parser.parse_args(argv)
+
+    source = Path(args.source) / args.seq / args.cond
+    if not source.exists():
+        print(f"Error: Directory not found at {source}")
+        return 1
+
+    print(f"Normalizing {args.seq}w-{args.cond} volumes from {args.source} to {args.target} "
+          f"({args.method}, factor {args.factor})")
+    stats = processTree(
+        args.source, args.target, args.seq, args.cond,
+        pattern=args.pattern,
+        workers=args.processes,
+        method=args.method,
+        factor=max(1, args.factor),
+        threshold=args.threshold,
+        chunk_slices=args.chunk_slices
+    )
+
+    print(stats.summary())
+    for path, error in stats.errors[:10]:
+        print(f"  ✗ {path}: {error}")
+    if len(stats.errors) > 10:
+        print(f"  ... and {len(stats.errors) - 10} more")
+    print(f"\n✓ Output in {args.target}/{args.seq}/{args.cond}/")
+    return 0 if not stats.errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
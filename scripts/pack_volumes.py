@@ -0,0 +1,69 @@
+"""
+Pack the volumes in final/ into one memory-mappable array per selection.
+Writes {output}.npy with shape (N, x, y, z) and {output}.index.csv with the
+metadata row, subject, image ID, label and byte offset of each volume.
+
+Usage:
+    python pack_volumes.py --seq T1 --cond AD
+    python pack_volumes.py --seq all --cond all --output ./VolumeStore/all.npy
+    python pack_volumes.py --seq T2 --cond all --dtype float32 --workers 16
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.config import CONDITIONS, DEFAULT_HEADER_WORKERS, SEQUENCES, TEMP_META_DIR, VOLUME_STORE_DIR
+from libs.volume_store import finalVolumes, packVolumes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Pack final NIfTI volumes into a single memory-mapped store"
+    )
+    parser.add_argument("--seq", type=str, required=True, choices=SEQUENCES + ["all"],
+                        help="MRI sequence")
+    parser.add_argument("--cond", type=str, required=True, choices=CONDITIONS + ["all"],
+                        help="Condition")
+    parser.add_argument("--root", type=str, default="./final",
+                        help="Stage directory holding {seq}/{cond}/ volumes")
+    parser.add_argument("--meta-dir", type=str, default=str(TEMP_META_DIR),
+                        help="Directory of the Balanced_Meta CSVs")
+    parser.add_argument("--output", type=str,
+                        help="Store path (default: VolumeStore/{seq}_{cond}.npy)")
+    parser.add_argument("--dtype", type=str,
+                        help="Store dtype (default: the volumes' own, float32 if scaled)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_HEADER_WORKERS,
+                        help="Threads loading volumes")
+
+    args = parser.parse_args(argv)
+
+    seqs = SEQUENCES if args.seq == "all" else [args.seq]
+    conds = CONDITIONS if args.cond == "all" else [args.cond]
+    output = Path(args.output) if args.output else VOLUME_STORE_DIR / f"{args.seq}_{args.cond}.npy"
+
+    print(f"Indexing volumes in {args.root} for {', '.join(seqs)} / {', '.join(conds)}...")
+    volumes = finalVolumes(args.root, seqs, conds, args.meta_dir, args.workers)
+    if volumes.empty:
+        print(f"Error: No volumes found in {args.root}")
+        return 1
+
+    try:
+        result = packVolumes(volumes, output, args.dtype, args.workers)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(result.summary())
+    for path, reason in result.skipped[:10]:
+        print(f"  ✗ {path}: {reason}")
+    if len(result.skipped) > 10:
+        print(f"  ... and {len(result.skipped) - 10} more")
+    print(f"Store saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,9 @@ Usage:
     python run_pipeline.py --config config.yaml
     python run_pipeline.py --seq T1 --cond AD --step all
     python run_pipeline.py --seq T1 --cond AD --step move_preprocessed
+    python run_pipeline.py --seq T1 --cond AD --mode subprocess
+    python run_pipeline.py --seq all --cond all --parallel 3
+    python run_pipeline.py --seq all --cond all --plan outputs/plan.csv
 """
 
 import argparse
@@ -15,79 +18,103 @@ from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from libs.config import OUTPUT_DIR, LOG_DIR
+from libs.config import OUTPUT_DIR, LOG_DIR, SEQUENCES, CONDITIONS, DEFAULT_PARALLEL_COMBINATIONS
+from libs.config import DEFAULT_META_FORMAT, META_EXPORT_FORMATS
+from libs.executor import addExecutorArguments
+from libs.inventory import addInventoryArguments
+from libs.manifest import CopyManifest
+from libs.pipeline import PipelineContext
+from libs.plan import finalizePlan, startPlan
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+import importlib.util
+import os
 import subprocess
+import time
 
 
-def run_step(step_name, script_path, args_dict):
-    """Run a pipeline step."""
-    print(f"\n{'='*70}")
-    print(f"Step: {step_name}")
-    print(f"{'='*70}")
-    
-    cmd = ["python", str(script_path)]
+def build_argv(args_dict):
+    """Turn a step's argument dict into a command-line argument list."""
+    argv = []
     for key, value in args_dict.items():
-        if value:
-            cmd.extend([f"--{key}", str(value)])
-    
-    try:
-        result = subprocess.run(cmd, check=True, capture_output=False)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Error in {step_name}: {e}")
-        return False
+        if value is True:
+            argv.append(f"--{key}")
+        elif value:
+            argv.extend([f"--{key}", str(value)])
+    return argv
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="ADNI Data Processing Pipeline"
-    )
-    parser.add_argument("--seq", type=str, choices=["T1", "T2"],
-                        help="MRI sequence to process")
-    parser.add_argument("--cond", type=str, choices=["AD", "CN", "MCI"],
-                        help="Condition to process")
-    parser.add_argument("--step", type=str, 
-                        choices=["all", "move_preprocessed", "move_to_preprocess", 
-                                 "move_to_convert", "move_final"],
-                        default="all",
-                        help="Which step(s) to run")
-    parser.add_argument("--old-path", type=str, default="./preprocessed_old",
-                        help="Path to old preprocessed files")
-    parser.add_argument("--source-path", type=str, default="./processed",
-                        help="Path to processed files")
-    parser.add_argument("--target-path", type=str, default="./final",
-                        help="Path for final output")
-    
-    args = parser.parse_args()
-    
-    if not args.seq or not args.cond:
-        print("Error: --seq and --cond are required")
-        return 1
-    
-    # Create output and log directories
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+def load_script(script_path):
+    """Import a step script as a module without running it."""
+    spec = importlib.util.spec_from_file_location(f"step_{script_path.stem}", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_step(step_name, script_path, args_dict, context=None):
+    """
+    Run a pipeline step.
     
-    # Log file
-    log_file = LOG_DIR / f"pipeline_{args.seq}_{args.cond}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    With a PipelineContext the script's main() is called in this process and
+    shares the context's metadata, inventory and copy executor; otherwise the
+    script runs in its own python subprocess.
     
+    Returns:
+        Exit code of the step
+    """
     print(f"\n{'='*70}")
-    print(f"ADNI Data Processing Pipeline")
-    print(f"Sequence: {args.seq}, Condition: {args.cond}")
-    print(f"Log file: {log_file}")
+    print(f"Step: {step_name}")
     print(f"{'='*70}")
     
-    base_args = {"seq": args.seq, "cond": args.cond}
-    scripts_dir = Path(__file__).parent
+    argv = build_argv(args_dict)
     
-    # Define pipeline steps
+    if context is None:
+        # Relay the child's output through print() so fan-out prefixes apply
+        env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+        with subprocess.Popen([sys.executable, str(script_path)] + argv, env=env, text=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
+            for line in proc.stdout:
+                print(line, end="")
+        code = proc.returncode
+    else:
+        try:
+            code = load_script(script_path).main(argv, context=context) or 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print(f"✗ Exception in {step_name}: {e!r}")
+            code = 1
+    
+    if code != 0:
+        print(f"✗ Error in {step_name}: exit code {code}")
+    return code
+
+
+def expand_combinations(seq, cond):
+    """Expand "all" into every configured sequence/condition pair."""
+    seqs = SEQUENCES if seq == "all" else [seq]
+    conds = CONDITIONS if cond == "all" else [cond]
+    return [(s, c) for s in seqs for c in conds]
+
+
+def build_steps(args, seq, cond):
+    """Define the pipeline steps for one sequence/condition."""
+    base_args = {
+        "seq": seq, "cond": cond,
+        "workers": args.workers, "materialize": args.materialize,
+        "manifest": args.manifest, "resume": args.resume, "checksum": args.checksum,
+        "inventory": args.inventory, "no-inventory": args.no_inventory,
+        "plan": args.plan, "plan-append": args.plan_append,
+    }
+    scripts_dir = Path(__file__).parent
     steps = []
     
     if args.step == "all" or args.step == "move_preprocessed":
         steps.append((
             "Move Preprocessed Files",
             scripts_dir / "move_preprocessed_files.py",
-            {**base_args, "path": args.old_path}
+            {**base_args, "path": args.old_path, "meta-format": args.meta_format}
         ))
     
     if args.step == "all" or args.step == "move_to_preprocess":
@@ -111,27 +138,209 @@ def main():
             {**base_args, "source": args.source_path, "target": args.target_path}
         ))
     
+    # Not part of "all": writes new volumes instead of staging copies
+    if args.step == "normalize":
+        steps.append((
+            "Normalize and Downsample Volumes",
+            scripts_dir / "normalize_volumes.py",
+            {"seq": seq, "cond": cond, "source": args.source_path, "target": args.normalized_path}
+        ))
+    
+    return steps
+
+
+def run_combination(args, seq, cond):
+    """
+    Run the selected steps for one sequence/condition.
+    
+    Returns:
+        List of (step name, exit code, seconds)
+    """
+    log_file = LOG_DIR / f"pipeline_{seq}_{cond}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    
+    print(f"\n{'='*70}")
+    print(f"ADNI Data Processing Pipeline")
+    print(f"Sequence: {seq}, Condition: {cond}")
+    print(f"Log file: {log_file}")
+    print(f"{'='*70}")
+    
     # Execute steps
-    completed = 0
-    failed = 0
+    context = PipelineContext.fromArgs(args) if args.mode == "inprocess" else None
+    results = []
     
-    for step_name, script_path, step_args in steps:
-        if run_step(step_name, script_path, step_args):
-            completed += 1
-        else:
-            failed += 1
+    try:
+        for step_name, script_path, step_args in build_steps(args, seq, cond):
+            start = time.perf_counter()
+            code = run_step(step_name, script_path, step_args, context)
+            results.append((step_name, code, time.perf_counter() - start))
+    finally:
+        if context is not None:
+            context.close()
+    
+    failed = sum(1 for _, code, _ in results if code != 0)
     
     # Summary
     print(f"\n{'='*70}")
-    print(f"Pipeline Summary")
+    print(f"Pipeline Summary ({args.mode})")
     print(f"{'='*70}")
-    print(f"Completed: {completed}")
+    for step_name, code, elapsed in results:
+        status = "✓" if code == 0 else "✗"
+        print(f"  {status} {step_name:<40} exit {code:<3} {elapsed:8.1f}s")
+    print(f"Completed: {len(results) - failed}")
     print(f"Failed: {failed}")
     print(f"Log file: {log_file}")
     print(f"{'='*70}\n")
     
-    return 0 if failed == 0 else 1
+    return results
+
+
+class PrefixWriter:
+    """Text stream that prefixes every complete line before writing it."""
+    
+    def __init__(self, stream, prefix):
+        self.stream = stream
+        self.prefix = prefix
+        self._buffer = ""
+    
+    def write(self, text):
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        if lines:
+            self.stream.write("".join(f"{self.prefix}{line}\n" for line in lines))
+            self.stream.flush()
+        return len(text)
+    
+    def flush(self):
+        if self._buffer:
+            self.stream.write(f"{self.prefix}{self._buffer}\n")
+            self._buffer = ""
+        self.stream.flush()
+
+
+def run_combination_prefixed(args, seq, cond):
+    """Process-pool entry point: run one combination with prefixed output."""
+    writer = PrefixWriter(sys.stdout, f"[{seq}w-{cond}] ")
+    with redirect_stdout(writer), redirect_stderr(writer):
+        try:
+            return run_combination(args, seq, cond)
+        except Exception as e:
+            print(f"✗ Combination failed: {e!r}")
+            return [("(setup)", 1, 0.0)]
+        finally:
+            writer.flush()
+
 
+def print_fanout_summary(combinations, outcomes):
+    """Print one table covering every sequence/condition combination."""
+    print(f"\n{'='*70}")
+    print("Fan-out Summary")
+    print(f"{'='*70}")
+    print(f"  {'Combination':<12} {'Status':<8} {'Steps OK':>8} {'Failed':>7} {'Seconds':>9}")
+    for seq, cond in combinations:
+        results = outcomes.get((seq, cond))
+        if results is None:
+            print(f"  {seq + 'w-' + cond:<12} {'crashed':<8} {'-':>8} {'-':>7} {'-':>9}")
+            continue
+        failed = sum(1 for _, code, _ in results if code != 0)
+        elapsed = sum(t for _, _, t in results)
+        status = "ok" if failed == 0 else "failed"
+        print(f"  {seq + 'w-' + cond:<12} {status:<8} {len(results) - failed:>8} {failed:>7} {elapsed:>9.1f}")
+    print(f"{'='*70}\n")
+
+
+def finish_plan(args):
+    """Total up (and convert) the shared plan of a dry run."""
+    if not args.plan:
+        return
+    manifest = CopyManifest(args.manifest)
+    try:
+        finalizePlan(args.plan, manifest, args.materialize)
+    finally:
+        manifest.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ADNI Data Processing Pipeline"
+    )
+    parser.add_argument("--seq", type=str, choices=SEQUENCES + ["all"],
+                        help="MRI sequence to process (or all)")
+    parser.add_argument("--cond", type=str, choices=CONDITIONS + ["all"],
+                        help="Condition to process (or all)")
+    parser.add_argument("--step", type=str, 
+                        choices=["all", "move_preprocessed", "move_to_preprocess", 
+                                 "move_to_convert", "move_final", "normalize"],
+                        default="all",
+                        help="Which step(s) to run")
+    parser.add_argument("--old-path", type=str, default="./preprocessed_old",
+                        help="Path to old preprocessed files")
+    parser.add_argument("--source-path", type=str, default="./processed",
+                        help="Path to processed files")
+    parser.add_argument("--target-path", type=str, default="./final",
+                        help="Path for final output")
+    parser.add_argument("--normalized-path", type=str, default="./normalized",
+                        help="Path for normalized volumes (--step normalize)")
+    parser.add_argument("--meta-format", type=str, default=DEFAULT_META_FORMAT,
+                        choices=list(META_EXPORT_FORMATS),
+                        help="File format of exported To-Be-Preprocessed metadata")
+    parser.add_argument("--mode", type=str, choices=["inprocess", "subprocess"],
+                        default="inprocess",
+                        help="Run steps as in-process calls sharing state, or as isolated subprocesses")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL_COMBINATIONS,
+                        help="Maximum number of seq/cond combinations run at once")
+    addExecutorArguments(parser)
+    addInventoryArguments(parser)
+    
+    args = parser.parse_args()
+    
+    if not args.seq or not args.cond:
+        print("Error: --seq and --cond are required")
+        return 1
+    
+    # Create output and log directories
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # A dry run: every step appends to one plan created here
+    if args.plan:
+        startPlan(args.plan)
+        args.plan_append = True
+    
+    # Clear the manifest once up front rather than before every step
+    if args.force and not args.plan:
+        manifest = CopyManifest(args.manifest)
+        manifest.clear()
+        manifest.close()
+        args.force = False
+    
+    combinations = expand_combinations(args.seq, args.cond)
+    if len(combinations) == 1:
+        seq, cond = combinations[0]
+        results = run_combination(args, seq, cond)
+        finish_plan(args)
+        return 0 if all(code == 0 for _, code, _ in results) else 1
+    
+    # Fan out: every combination runs isolated in its own worker process
+    parallel = max(1, min(args.parallel, len(combinations)))
+    print(f"Running {len(combinations)} combinations with {parallel} in parallel")
+    outcomes = {}
+    with ProcessPoolExecutor(max_workers=parallel) as pool:
+        futures = {
+            pool.submit(run_combination_prefixed, args, seq, cond): (seq, cond)
+            for seq, cond in combinations
+        }
+        for future in as_completed(futures):
+            seq, cond = futures[future]
+            try:
+                outcomes[(seq, cond)] = future.result()
+            except Exception as e:
+                print(f"[{seq}w-{cond}] ✗ Worker failed: {e!r}")
+                outcomes[(seq, cond)] = None
+    
+    print_fanout_summary(combinations, outcomes)
+    finish_plan(args)
+    ok = all(res is not None and all(code == 0 for _, code, _ in res) for res in outcomes.values())
+    return 0 if ok else 1
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Verify staged copies against their sources by checksum.
+Checksums are stored in the copy manifest; later runs only rehash files
+whose size or mtime changed.
+
+Usage:
+    python verify_files.py
+    python verify_files.py --root ./preprocessed --root ./final --workers 16
+    python verify_files.py --mmap --chunk-mb 16 --rehash
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.config import CHECKSUM_CHUNK_SIZE, DEFAULT_HASH_WORKERS, MANIFEST_DB
+from libs.manifest import CopyManifest
+from libs.verify import verifyCopies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Verify staged files against their sources"
+    )
+    parser.add_argument("--root", type=str, action="append",
+                        help="Only verify copies below this directory (repeatable, default: all)")
+    parser.add_argument("--manifest", type=str, default=str(MANIFEST_DB),
+                        help="SQLite manifest of completed copies")
+    parser.add_argument("--workers", type=int, default=DEFAULT_HASH_WORKERS,
+                        help="Number of hashing threads")
+    parser.add_argument("--chunk-mb", type=int, default=CHECKSUM_CHUNK_SIZE >> 20,
+                        help="Read size per hash update in MB")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Hash from memory maps instead of buffered reads")
+    parser.add_argument("--rehash", action="store_true",
+                        help="Ignore stored checksums and hash every file again")
+
+    args = parser.parse_args(argv)
+
+    if not Path(args.manifest).exists():
+        print(f"Error: Manifest not found at {args.manifest}")
+        return 1
+
+    manifest = CopyManifest(args.manifest)
+    try:
+        result = verifyCopies(
+            manifest,
+            roots=args.root,
+            workers=args.workers,
+            chunk_size=max(1, args.chunk_mb) << 20,
+            use_mmap=args.mmap,
+            rehash=args.rehash
+        )
+    finally:
+        manifest.close()
+
+    print(result.summary())
+    for src, dst in result.mismatched[:10]:
+        print(f"  ✗ mismatch: {src} -> {dst}")
+    for src, dst, reason in result.failed[:10]:
+        print(f"  ✗ {reason}: {src} -> {dst}")
+    problems = len(result.mismatched) + len(result.failed)
+    if problems > 20:
+        print(f"  ... {problems} problems in total")
+    return 0 if problems == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())